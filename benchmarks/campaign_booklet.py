@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Compare rendering the sheets of a campaign one by one, as all_sheets, with
+rendering them in a single booklet.
+
+    python benchmarks/campaign_booklet.py [--viewpoints 50]
+
+Sheets are rendered in the current process, without cache. Data is created in a
+transaction rolled back at the end, the database of the `test_opp` project must
+be migrated.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_opp.settings")
+
+import django  # NOQA
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # NOQA
+from django.contrib.gis.geos import Point  # NOQA
+from django.core.files import File  # NOQA
+from django.core.files.storage import default_storage  # NOQA
+from django.db import transaction  # NOQA
+from django.test.utils import override_settings  # NOQA
+from django.utils import timezone  # NOQA
+from geostore import GeometryTypes  # NOQA
+from geostore.models import Feature, Layer  # NOQA
+
+from terra_opp.models import Campaign, Picture, Viewpoint  # NOQA
+from terra_opp.sheets import render_booklet, render_sheets  # NOQA
+
+BASE_URL = "http://localhost/"
+PLACEHOLDER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "terra_opp",
+    "tests",
+    "placeholder.jpg",
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_campaign(count):
+    layer = Layer.objects.create(name="benchmark", geom_type=GeometryTypes.Point)
+    UserModel = get_user_model()
+    owner = UserModel.objects.create(
+        **{UserModel.USERNAME_FIELD: "benchmark@opp.example"}
+    )
+    campaign = Campaign.objects.create(
+        label="Benchmark",
+        start_date=timezone.now().date(),
+        owner=owner,
+        assignee=owner,
+    )
+    with open(PLACEHOLDER, "rb") as f:
+        # Saved once, shared by all pictures
+        name = default_storage.save("pictures/benchmark.jpg", File(f))
+    for index in range(count):
+        feature = Feature.objects.create(
+            layer=layer, geom=Point(0, 0, srid=4326), properties={}
+        )
+        viewpoint = Viewpoint.objects.create(label=f"Benchmark {index}", point=feature)
+        Picture.objects.bulk_create(
+            Picture(
+                owner=owner,
+                viewpoint=viewpoint,
+                state=Picture.ACCEPTED,
+                date=timezone.datetime(year, 1, 1, tzinfo=timezone.utc),
+                file=name,
+            )
+            for year in (2000, 2020)
+        )
+        campaign.viewpoints.add(viewpoint)
+    return campaign
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--viewpoints", type=int, default=50)
+    args = parser.parse_args()
+
+    cases = {
+        "per sheet": lambda campaign: sum(
+            len(content)
+            for _, content in render_sheets(campaign.viewpoints.all(), BASE_URL)
+        ),
+        "booklet": lambda campaign: len(render_booklet(campaign, BASE_URL)),
+    }
+
+    try:
+        with transaction.atomic(), override_settings(
+            TROPP_PDF_CACHE=False, TROPP_PDF_PROCESSES=0
+        ):
+            campaign = create_campaign(args.viewpoints)
+            # Create the picture renditions before measuring
+            render_booklet(campaign, BASE_URL)
+            print(f"{'path':<12}{'total (s)':>12}{'bytes':>12}")
+            for name, render in cases.items():
+                start = time.perf_counter()
+                size = render(campaign)
+                duration = time.perf_counter() - start
+                print(f"{name:<12}{duration:>12.2f}{size:>12}")
+            picture = Picture.objects.filter(viewpoint__campaigns=campaign).first()
+            picture.file.delete_all_created_images()
+            picture.file.delete(save=False)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
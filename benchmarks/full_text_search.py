@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Compare the previous SearchFilter of viewpoints with the full text search, on
+synthetic viewpoints.
+
+    python benchmarks/full_text_search.py [--viewpoints 100000]
+
+Data is created in a transaction rolled back at the end, the database of the
+`test_opp` project must be migrated.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_opp.settings")
+
+import django  # NOQA
+
+django.setup()
+
+from django.conf import settings  # NOQA
+from django.contrib.gis.geos import Point  # NOQA
+from django.db import connection, transaction  # NOQA
+from geostore import GeometryTypes  # NOQA
+from geostore.models import Feature, Layer  # NOQA
+from rest_framework.filters import OrderingFilter, SearchFilter  # NOQA
+from rest_framework.request import Request  # NOQA
+from rest_framework.test import APIRequestFactory  # NOQA
+
+from terra_opp.filters import FullTextSearchFilter, RankedOrderingFilter  # NOQA
+from terra_opp.models import Viewpoint  # NOQA
+
+WORDS = (
+    "église château moulin fontaine lavoir pont rivière port plage falaise "
+    "forêt colline vallée marché place mairie école gare usine carrière "
+    "chemin route avenue boulevard quai jardin parc étang canal écluse"
+).split()
+
+
+class Rollback(Exception):
+    pass
+
+
+class LegacyView:
+    search_fields = ("label", "id")
+    ordering = ["-created_at"]
+
+
+class FullTextView:
+    search_exact_fields = ("id",)
+    ordering = ["-created_at"]
+
+
+def create_viewpoints(count, batch_size=5000):
+    layer = Layer.objects.create(name="benchmark", geom_type=GeometryTypes.Point)
+    random.seed(0)
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        features = Feature.objects.bulk_create(
+            Feature(layer=layer, geom=Point(0, 0, srid=4326), properties={})
+            for _ in range(size)
+        )
+        Viewpoint.objects.bulk_create(
+            Viewpoint(label=" ".join(random.sample(WORDS, 4)), point=feature)
+            for feature in features
+        )
+    # Labels only, as signals aren't sent by bulk_create
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE terra_opp_viewpoint "
+            "SET search_vector = setweight(to_tsvector(%s, label), 'A')",
+            [settings.TROPP_SEARCH_CONFIG],
+        )
+        cursor.execute("ANALYZE terra_opp_viewpoint")
+
+
+def measure(backends, view, terms, repeat, page_size=100):
+    factory = APIRequestFactory()
+    request = Request(factory.get("/", {"search": terms}))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        queryset = Viewpoint.objects.all()
+        for backend in backends:
+            queryset = backend().filter_queryset(request, queryset, view)
+        count = queryset.count()
+        list(queryset[:page_size])
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--viewpoints", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = {
+        "SearchFilter": ((SearchFilter, OrderingFilter), LegacyView()),
+        "full text": ((FullTextSearchFilter, RankedOrderingFilter), FullTextView()),
+    }
+    searches = ("eglise", "moulin rivière", "chat", "12345")
+
+    try:
+        with transaction.atomic():
+            print(f"Creating {args.viewpoints} viewpoints...")
+            create_viewpoints(args.viewpoints)
+            print(f"{'search':<18}{'backend':<16}{'median (ms)':>14}{'results':>10}")
+            for terms in searches:
+                for name, (backends, view) in cases.items():
+                    duration, count = measure(backends, view, terms, args.repeat)
+                    print(f"{terms:<18}{name:<16}{duration * 1000:>14.1f}{count:>10}")
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Compare rendering viewpoint sheets one by one, fetching and parsing their
+stylesheet each time, with the shared SheetRenderer.
+
+    python benchmarks/pdf_sheets.py [--sheets 20] [--base-url URL]
+
+The linked stylesheet is fetched from the base URL, http://localhost:8000/ by
+default, where `runserver` should serve static files. Data is created in a
+transaction rolled back at the end, the database of the
+`test_opp` project must be migrated.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_opp.settings")
+
+import django  # NOQA
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # NOQA
+from django.contrib.gis.geos import Point  # NOQA
+from django.core.files import File  # NOQA
+from django.db import transaction  # NOQA
+from django.template import loader  # NOQA
+from django.utils import timezone  # NOQA
+from geostore import GeometryTypes  # NOQA
+from geostore.models import Feature, Layer  # NOQA
+
+from terra_opp.models import Picture, Viewpoint  # NOQA
+from terra_opp.renderers import render_pdf  # NOQA
+from terra_opp.sheets import SHEET_TEMPLATE, SheetRenderer, get_sheet_context  # NOQA
+
+PLACEHOLDER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "terra_opp",
+    "tests",
+    "placeholder.jpg",
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_viewpoint():
+    layer = Layer.objects.create(name="benchmark", geom_type=GeometryTypes.Point)
+    feature = Feature.objects.create(
+        layer=layer, geom=Point(0, 0, srid=4326), properties={}
+    )
+    viewpoint = Viewpoint.objects.create(label="Benchmark", point=feature)
+    UserModel = get_user_model()
+    owner = UserModel.objects.create(
+        **{UserModel.USERNAME_FIELD: "benchmark@opp.example"}
+    )
+    with open(PLACEHOLDER, "rb") as f:
+        for year in (2000, 2020):
+            Picture.objects.create(
+                owner=owner,
+                viewpoint=viewpoint,
+                state=Picture.ACCEPTED,
+                date=timezone.datetime(year, 1, 1, tzinfo=timezone.utc),
+                file=File(f, name="placeholder.jpg"),
+            )
+    return viewpoint
+
+
+def per_sheet(viewpoint, base_url):
+    context = get_sheet_context(viewpoint)
+    html = loader.get_template(SHEET_TEMPLATE).render(context)
+    return render_pdf(html, base_url)
+
+
+def shared(viewpoint, renderer):
+    return renderer.write_pdf(renderer.render_html(viewpoint))
+
+
+def measure(render, sheets):
+    timings, size = [], 0
+    for _ in range(sheets):
+        start = time.perf_counter()
+        size = len(render())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sheets", type=int, default=20)
+    parser.add_argument("--base-url", default="http://localhost:8000/")
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            viewpoint = create_viewpoint()
+            renderer = SheetRenderer(args.base_url)
+            cases = {
+                "per sheet": lambda: per_sheet(viewpoint, args.base_url),
+                "SheetRenderer": lambda: shared(viewpoint, renderer),
+            }
+            # Create the picture renditions before measuring
+            shared(viewpoint, renderer)
+            print(f"{'path':<16}{'median by sheet (ms)':>22}{'bytes':>10}")
+            for name, render in cases.items():
+                duration, size = measure(render, args.sheets)
+                print(f"{name:<16}{duration * 1000:>22.1f}{size:>10}")
+            for picture in viewpoint.pictures.all():
+                picture.file.delete_all_created_images()
+                picture.file.delete(save=False)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Compare downloading every viewpoint with the spatial filters of the viewpoint
+API, on a synthetic observatory layer.
+
+    python benchmarks/spatial_filters.py [--points 100000]
+
+Data is created in a transaction rolled back at the end, the database of the
+`test_opp` project must be migrated.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_opp.settings")
+
+import django  # NOQA
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # NOQA
+from django.contrib.gis.geos import Point  # NOQA
+from django.db import connection, transaction  # NOQA
+from geostore import GeometryTypes  # NOQA
+from geostore.models import Feature, Layer  # NOQA
+from rest_framework.test import APIRequestFactory, force_authenticate  # NOQA
+
+from terra_opp.models import Viewpoint  # NOQA
+from terra_opp.views import ViewpointViewSet  # NOQA
+
+# Around France
+XMIN, YMIN, XMAX, YMAX = -4.5, 42.5, 7.5, 51
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_observatory(points, batch_size=5000):
+    layer = Layer.objects.create(name="benchmark", geom_type=GeometryTypes.Point)
+    random.seed(0)
+    for start in range(0, points, batch_size):
+        size = min(batch_size, points - start)
+        features = Feature.objects.bulk_create(
+            Feature(
+                layer=layer,
+                geom=Point(
+                    random.uniform(XMIN, XMAX), random.uniform(YMIN, YMAX), srid=4326
+                ),
+                properties={},
+            )
+            for _ in range(size)
+        )
+        Viewpoint.objects.bulk_create(
+            Viewpoint(label=f"Viewpoint {start + i}", point=feature, active=True)
+            for i, feature in enumerate(features)
+        )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def measure(view, user, params, repeat):
+    factory = APIRequestFactory()
+    timings = []
+    for _ in range(repeat):
+        request = factory.get("/api/viewpoints/", params)
+        force_authenticate(request, user=user)
+        start = time.perf_counter()
+        response = view(request)
+        response.render()
+        timings.append(time.perf_counter() - start)
+    assert response.status_code == 200, response.content
+    return statistics.median(timings), len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    view = ViewpointViewSet.as_view({"get": "list"})
+    cases = {
+        "all viewpoints": {"page_size": args.points},
+        "in_bbox (city)": {"in_bbox": "5.2,43.2,5.6,43.4", "page_size": args.points},
+        "dist 10km": {"point": "5.37,43.3", "dist": 10000, "page_size": args.points},
+        "nearest 50": {"point": "5.37,43.3", "nearest": 50, "page_size": 50},
+    }
+
+    try:
+        with transaction.atomic():
+            print(f"Creating {args.points} viewpoints...")
+            create_observatory(args.points)
+            user = get_user_model().objects.create(
+                email="benchmark@example.com", is_superuser=True
+            )
+            print(f"{'case':<20}{'median (ms)':>14}{'size (kB)':>12}")
+            for name, params in cases.items():
+                duration, size = measure(view, user, params, args.repeat)
+                print(f"{name:<20}{duration * 1000:>14.1f}{size / 1024:>12.1f}")
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,10 @@ class TerraOppConfig(PermissionRegistrationMixin, AppConfig):
         for name in dir(defaults):
             dj_settings.setdefault(name, getattr(defaults, name))
 
+        from .sheets import start_executor
+
+        start_executor()
+
         try:
             opp_layer = models.Layer.objects.get(id=settings.TROPP_OBSERVATORY_LAYER_PK)
         except models.Layer.DoesNotExist:
@@ -0,0 +1,131 @@
+import datetime
+import platform
+import statistics
+import time
+
+import django
+from django.db.models import Count
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .instrumentation import QueryRecorder
+from .models import Campaign, Picture, Viewpoint
+
+# Endpoints to measure, as (name, url name, detail object, query parameters).
+# The detail object is "viewpoint" or "campaign", the ones with most pictures.
+ENDPOINTS = (
+    ("viewpoints list", "viewpoint-list", None, {}),
+    ("viewpoints last page", "viewpoint-list", None, {"page": "last"}),
+    ("viewpoints search", "viewpoint-list", None, {"search": "moulin"}),
+    (
+        "viewpoints by dates",
+        "viewpoint-list",
+        None,
+        {"date_from": "2010-01-01", "date_to": "2015-12-31"},
+    ),
+    ("viewpoints by city", "viewpoint-list", None, {"city": "Commune 1"}),
+    ("viewpoints active", "viewpoint-active", None, {}),
+    ("viewpoints filters", "viewpoint-filters", None, {}),
+    ("viewpoints facets", "viewpoint-facets", None, {}),
+    ("viewpoints geojson", "viewpoint-geojson", None, {}),
+    ("viewpoint detail", "viewpoint-detail", "viewpoint", {}),
+    ("viewpoint pdf", "viewpoint-pdf", "viewpoint", {}),
+    ("viewpoint zip", "viewpoint-zip-pictures", "viewpoint", {}),
+    ("pictures list", "picture-list", None, {}),
+    ("campaigns list", "campaign-list", None, {}),
+    ("campaign detail", "campaign-detail", "campaign", {}),
+    ("campaign sheets", "campaign-all-sheets", "campaign", {}),
+    ("photographers list", "photographer-list", None, {}),
+)
+
+
+def get_detail_objects():
+    """Objects of detail endpoints, with most pictures or viewpoints"""
+    return {
+        "viewpoint": Viewpoint.objects.annotate(count=Count("pictures"))
+        .order_by("-count")
+        .first(),
+        "campaign": Campaign.objects.annotate(count=Count("viewpoints"))
+        .order_by("-count")
+        .first(),
+    }
+
+
+def read_content(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Benchmark:
+    """
+    Time the API endpoints in process, as the given user. Each run has its own
+    query parameter, so no cached response is measured.
+    """
+
+    def __init__(self, user, repeat=5, host="localhost", only=None):
+        self.client = APIClient(HTTP_HOST=host)
+        self.client.force_authenticate(user)
+        self.repeat = repeat
+        self.only = only
+
+    def get_endpoints(self):
+        objects = get_detail_objects()
+        for name, url_name, detail, params in ENDPOINTS:
+            if self.only and not any(pattern in name for pattern in self.only):
+                continue
+            if detail is None:
+                yield name, reverse(f"terra_opp:{url_name}"), params
+            elif objects[detail] is not None:
+                url = reverse(f"terra_opp:{url_name}", args=[objects[detail].pk])
+                yield name, url, params
+
+    def measure(self, url, params):
+        timings, queries, db_timings = [], [], []
+        for run in range(self.repeat):
+            with QueryRecorder() as recorder:
+                start = time.perf_counter()
+                response = self.client.get(url, {**params, "_benchmark": run})
+                size = read_content(response)
+                timings.append(time.perf_counter() - start)
+            queries.append(len(recorder))
+            db_timings.append(recorder.duration)
+        return {
+            "url": url,
+            "params": params,
+            "status": response.status_code,
+            "bytes": size,
+            "median_ms": statistics.median(timings) * 1000,
+            "min_ms": min(timings) * 1000,
+            "max_ms": max(timings) * 1000,
+            "db_ms": statistics.median(db_timings) * 1000,
+            "queries": max(queries),
+        }
+
+    def run(self):
+        """:return: the results by endpoint name, with the size of the data"""
+        return {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "django": django.get_version(),
+            "python": platform.python_version(),
+            "repeat": self.repeat,
+            "dataset": {
+                "viewpoints": Viewpoint.objects.count(),
+                "pictures": Picture.objects.count(),
+                "campaigns": Campaign.objects.count(),
+            },
+            "endpoints": {
+                name: self.measure(url, params)
+                for name, url, params in self.get_endpoints()
+            },
+        }
+
+
+def compare(results, previous):
+    """Ratio of the median duration of each endpoint to a previous run"""
+    ratios = {}
+    for name, result in results["endpoints"].items():
+        before = previous.get("endpoints", {}).get(name)
+        if before and before["median_ms"]:
+            ratios[name] = result["median_ms"] / before["median_ms"]
+    return ratios
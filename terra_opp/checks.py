@@ -1,7 +1,10 @@
-from django.core.checks import Warning, Error, register
+from django.core.checks import Tags, Warning, Error, register
 from django.conf import settings
 from geostore import models
-from django.db.utils import ProgrammingError
+from django.db.utils import OperationalError, ProgrammingError
+
+from .indexes import get_uncovered_properties
+from .response_cache import is_cache_shared
 
 
 @register()
@@ -75,3 +78,40 @@ def check_installed_apps(app_configs, **kwargs):
             )
         )
     return errors
+
+
+@register(Tags.database)
+def check_property_indexes(app_configs, **kwargs):
+    errors = []
+    try:
+        uncovered = get_uncovered_properties()
+    except (OperationalError, ProgrammingError):
+        # Database not initialized ?
+        return errors
+    for key in uncovered:
+        errors.append(
+            Warning(
+                f"Searchable property '{key}' is not indexed",
+                hint="Create its index with ./manage.py opp_sync_property_indexes",
+                obj=None,
+                id="terra_opp.W001",
+            )
+        )
+    return errors
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    errors = []
+    if settings.TROPP_RESPONSE_CACHE_SHARED is None and not is_cache_shared():
+        errors.append(
+            Warning(
+                "The default cache is not shared by server processes, responses "
+                "are neither cached nor validated",
+                hint="Use a shared cache, such as Redis or Memcached, or set "
+                "TROPP_RESPONSE_CACHE_SHARED",
+                obj=None,
+                id="terra_opp.W002",
+            )
+        )
+    return errors
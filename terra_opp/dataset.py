@@ -0,0 +1,236 @@
+import datetime
+import io
+import random
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from geostore import GeometryTypes
+from geostore.models import Feature, Layer
+from PIL import Image
+
+from .facets import rebuild_facets
+from .models import Campaign, City, Picture, Theme, Viewpoint
+from .photographers import rebuild_photographers
+from .search import rebuild_search_vectors
+
+WORDS = (
+    "église château moulin fontaine lavoir pont rivière port plage falaise "
+    "forêt colline vallée marché place mairie école gare usine carrière "
+    "chemin route avenue boulevard quai jardin parc étang canal écluse"
+).split()
+
+THEME_CATEGORIES = ("paysage", "patrimoine", "urbanisme", "agriculture")
+
+# Bounds of the random viewpoints, as (min x, min y, max x, max y)
+EXTENT = (-4.5, 43.0, 7.5, 50.5)
+
+PLACEHOLDERS_PATH = "pictures/opp_dataset"
+
+
+def create_placeholders(count=4, size=(32, 24)):
+    """Save tiny JPEG images in the storage, shared by the generated pictures"""
+    names = []
+    for index in range(count):
+        color = tuple(64 * index % 256 for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new("RGB", size, color).save(buffer, format="JPEG")
+        name = f"{PLACEHOLDERS_PATH}/placeholder_{index}.jpg"
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        names.append(name)
+    return names
+
+
+def get_layer():
+    if settings.TROPP_OBSERVATORY_LAYER_PK:
+        layer = Layer.objects.filter(pk=settings.TROPP_OBSERVATORY_LAYER_PK).first()
+        if layer is not None:
+            return layer
+    return Layer.objects.get_or_create(
+        name="opp_dataset", defaults={"geom_type": GeometryTypes.Point}
+    )[0]
+
+
+def get_photographers(count):
+    UserModel = get_user_model()
+    return [
+        UserModel.objects.get_or_create(
+            **{UserModel.USERNAME_FIELD: f"photographer{index}@opp.example"}
+        )[0]
+        for index in range(count)
+    ]
+
+
+def get_properties(rng):
+    """Values of the searchable properties of a viewpoint"""
+    properties = {}
+    for key, field in settings.TROPP_SEARCHABLE_PROPERTIES.items():
+        if field["type"] == "many":
+            value = rng.sample(WORDS[:8], rng.randint(1, 3))
+        elif field["type"] == "single":
+            value = rng.choice(WORDS[:8])
+        else:
+            value = " ".join(rng.sample(WORDS, 3))
+        properties[field["json_key"]] = value
+    return properties
+
+
+class DatasetGenerator:
+    """
+    Bulk create an observatory of synthetic viewpoints and pictures.
+
+    Signals aren't sent by bulk_create, so the denormalized data is rebuilt once
+    everything is created.
+    """
+
+    def __init__(
+        self,
+        viewpoints=1000,
+        pictures_per_viewpoint=10,
+        cities=100,
+        themes=20,
+        campaigns=10,
+        campaign_size=50,
+        photographers=10,
+        batch_size=1000,
+        seed=0,
+    ):
+        self.viewpoints = viewpoints
+        self.pictures_per_viewpoint = pictures_per_viewpoint
+        self.cities = cities
+        self.themes = themes
+        self.campaigns = campaigns
+        self.campaign_size = campaign_size
+        self.photographers = photographers
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+
+    def generate(self):
+        """:return: the number of created objects by model name"""
+        self.layer = get_layer()
+        self.files = create_placeholders()
+        self.users = get_photographers(max(self.photographers, 1))
+        city_list = City.objects.bulk_create(
+            City(label=f"Commune {index}") for index in range(self.cities)
+        )
+        theme_list = Theme.objects.bulk_create(
+            Theme(
+                label=f"Thème {index}",
+                category=self.rng.choice(THEME_CATEGORIES),
+            )
+            for index in range(self.themes)
+        )
+
+        created = {"viewpoints": 0, "pictures": 0}
+        viewpoint_ids = []
+        for start in range(0, self.viewpoints, self.batch_size):
+            size = min(self.batch_size, self.viewpoints - start)
+            viewpoints = self.create_viewpoints(size, city_list, theme_list)
+            created["pictures"] += self.create_pictures(viewpoints)
+            created["viewpoints"] += len(viewpoints)
+            viewpoint_ids.extend(viewpoint.pk for viewpoint in viewpoints)
+
+        created["campaigns"] = self.create_campaigns(viewpoint_ids)
+        created["cities"] = len(city_list)
+        created["themes"] = len(theme_list)
+
+        Viewpoint.objects.update_last_accepted_pictures()
+        rebuild_facets()
+        rebuild_search_vectors()
+        rebuild_photographers()
+        return created
+
+    def create_viewpoints(self, count, cities, themes):
+        rng = self.rng
+        features = Feature.objects.bulk_create(
+            Feature(
+                layer=self.layer,
+                geom=Point(
+                    rng.uniform(EXTENT[0], EXTENT[2]),
+                    rng.uniform(EXTENT[1], EXTENT[3]),
+                    srid=4326,
+                ),
+                properties={},
+            )
+            for _ in range(count)
+        )
+        viewpoints = Viewpoint.objects.bulk_create(
+            Viewpoint(
+                label=" ".join(rng.sample(WORDS, 3)).capitalize(),
+                point=feature,
+                city=rng.choice(cities) if cities else None,
+                properties=get_properties(rng),
+                active=rng.random() < 0.8,
+            )
+            for feature in features
+        )
+        if themes:
+            Through = Viewpoint.themes.through
+            Through.objects.bulk_create(
+                Through(viewpoint_id=viewpoint.pk, theme_id=theme.pk)
+                for viewpoint in viewpoints
+                for theme in rng.sample(themes, rng.randint(1, min(3, len(themes))))
+            )
+        return viewpoints
+
+    def create_pictures(self, viewpoints):
+        rng = self.rng
+        now = timezone.now()
+        observatory_id = settings.TROPP_OBSERVATORY_ID or ""
+        pictures = []
+        for viewpoint in viewpoints:
+            # Spread over the last 20 years, in chronological order
+            dates = sorted(
+                now - datetime.timedelta(days=rng.uniform(0, 20 * 365))
+                for _ in range(self.pictures_per_viewpoint)
+            )
+            for index, date in enumerate(dates, start=1):
+                # Same identifier as Picture.get_identifier, when it fits
+                identifier = f"{observatory_id}0{viewpoint.pk:03}{index:02}"
+                pictures.append(
+                    Picture(
+                        owner=rng.choice(self.users),
+                        viewpoint=viewpoint,
+                        state=rng.choices(
+                            (Picture.ACCEPTED, Picture.SUBMITTED, Picture.DRAFT),
+                            weights=(90, 5, 5),
+                        )[0],
+                        file=rng.choice(self.files),
+                        date=date,
+                        identifier=identifier if len(identifier) <= 10 else "",
+                    )
+                )
+        Picture.objects.bulk_create(pictures, batch_size=self.batch_size)
+        return len(pictures)
+
+    def create_campaigns(self, viewpoint_ids):
+        rng = self.rng
+        size = min(self.campaign_size, len(viewpoint_ids))
+        Through = Campaign.viewpoints.through
+        for index in range(self.campaigns if size else 0):
+            owner, assignee = rng.choice(self.users), rng.choice(self.users)
+            campaign = Campaign.objects.create(
+                label=f"Campagne {index}",
+                start_date=timezone.now().date()
+                - datetime.timedelta(days=rng.randint(0, 5 * 365)),
+                owner=owner,
+                assignee=assignee,
+                state=rng.choice((Campaign.STARTED, Campaign.CLOSED)),
+            )
+            campaign_viewpoints = rng.sample(viewpoint_ids, size)
+            Through.objects.bulk_create(
+                Through(campaign_id=campaign.pk, viewpoint_id=viewpoint_id)
+                for viewpoint_id in campaign_viewpoints
+            )
+            # Latest picture of each viewpoint is the one taken for the campaign
+            for viewpoint_id in campaign_viewpoints:
+                Picture.objects.filter(
+                    pk__in=Picture.objects.filter(viewpoint_id=viewpoint_id)
+                    .order_by("-date")
+                    .values("pk")[:1]
+                ).update(campaign=campaign, owner=assignee)
+        return self.campaigns if size else 0
@@ -0,0 +1,244 @@
+import json
+from collections import Counter, defaultdict
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import ViewpointFacet, ViewpointFacetEntry
+
+CITIES = "cities"
+THEMES = "themes"
+PHOTOGRAPHERS = "photographers"
+
+# Facets listing every label of their model, even without viewpoints
+LABEL_FACETS = {CITIES: "City", THEMES: "Theme"}
+
+
+def get_property_facets():
+    """Searchable properties listed by the filters, by facet name"""
+    return {
+        key: field
+        for key, field in settings.TROPP_SEARCHABLE_PROPERTIES.items()
+        if field["type"] in ("single", "many")
+    }
+
+
+def encode_value(value):
+    """Single values are indexed as JSON, to be listed with their type"""
+    return json.dumps(value, sort_keys=True)
+
+
+def get_value_sort_key(value):
+    """Sort single values as PostgreSQL sorts JSON: strings, numbers, booleans"""
+    if isinstance(value, str):
+        return 0, value, ""
+    if isinstance(value, bool):
+        return 2, value, ""
+    if isinstance(value, (int, float)):
+        return 1, value, ""
+    return 3, 0, encode_value(value)
+
+
+def get_viewpoint_values(viewpoint):
+    """Return the set of (facet, value) of a viewpoint"""
+    values = set()
+    for key, field in get_property_facets().items():
+        value = viewpoint.properties.get(field["json_key"])
+        if value is None:
+            continue
+        if field["type"] == "many":
+            if not isinstance(value, list):
+                value = [value]
+            values.update((key, str(item)) for item in value if item is not None)
+        else:
+            values.add((key, encode_value(value)))
+
+    if viewpoint.city and viewpoint.city.label:
+        values.add((CITIES, viewpoint.city.label))
+    values.update(
+        (THEMES, theme.label) for theme in viewpoint.themes.all() if theme.label
+    )
+    values.update(
+        (PHOTOGRAPHERS, str(owner_id))
+        for owner_id in {picture.owner_id for picture in viewpoint.pictures.all()}
+    )
+    return values
+
+
+def _get_viewpoints(apps, viewpoint_ids=None):
+    Viewpoint = apps.get_model("terra_opp", "Viewpoint")
+    queryset = Viewpoint.objects.select_related("city").prefetch_related(
+        "themes", "pictures"
+    )
+    if viewpoint_ids is not None:
+        queryset = queryset.filter(pk__in=viewpoint_ids)
+    return queryset
+
+
+def _ensure_label_facets(apps):
+    ViewpointFacet = apps.get_model("terra_opp", "ViewpointFacet")
+    existing = set(
+        ViewpointFacet.objects.filter(facet__in=LABEL_FACETS).values_list(
+            "facet", "value"
+        )
+    )
+    missing = set()
+    for facet, model_name in LABEL_FACETS.items():
+        model = apps.get_model("terra_opp", model_name)
+        labels = model.objects.exclude(label="").values_list("label", flat=True)
+        missing.update((facet, label) for label in labels)
+    ViewpointFacet.objects.bulk_create(
+        ViewpointFacet(facet=facet, value=value) for facet, value in missing - existing
+    )
+
+
+def _prune_facets(apps):
+    """Remove facets without viewpoints, but existing cities and themes"""
+    ViewpointFacet = apps.get_model("terra_opp", "ViewpointFacet")
+    queryset = ViewpointFacet.objects.filter(count__lte=0)
+    for facet, model_name in LABEL_FACETS.items():
+        model = apps.get_model("terra_opp", model_name)
+        queryset = queryset.exclude(
+            facet=facet, value__in=model.objects.values("label")
+        )
+    queryset.delete()
+
+
+def refresh_viewpoint_facets(*viewpoint_ids):
+    """
+    Count the values of the given viewpoints again, removing values of the deleted
+    ones. Only the differences with their previous values are applied to counts,
+    with the viewpoints and their entries locked.
+    """
+    if not viewpoint_ids:
+        return
+
+    with transaction.atomic():
+        # Refreshes of the same viewpoints wait for each other, so that their
+        # values are read and applied by one of them at a time
+        viewpoints = _get_viewpoints(global_apps, viewpoint_ids)
+        list(
+            viewpoints.model.objects.select_for_update()
+            .filter(pk__in=viewpoint_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        new_values = {
+            viewpoint.pk: get_viewpoint_values(viewpoint) for viewpoint in viewpoints
+        }
+        entries = ViewpointFacetEntry.objects.select_for_update().filter(
+            viewpoint_id__in=viewpoint_ids
+        )
+        old_entries = defaultdict(dict)
+        for pk, viewpoint_id, facet, value in entries.values_list(
+            "pk", "viewpoint_id", "facet", "value"
+        ):
+            old_entries[viewpoint_id][facet, value] = pk
+
+        deltas = Counter()
+        removed = []
+        added = []
+        for viewpoint_id in set(viewpoint_ids):
+            old = old_entries[viewpoint_id]
+            new = new_values.get(viewpoint_id, set())
+            for facet, value in old.keys() - new:
+                deltas[facet, value] -= 1
+                removed.append(old[facet, value])
+            for facet, value in new - old.keys():
+                deltas[facet, value] += 1
+                added.append(
+                    ViewpointFacetEntry(
+                        viewpoint_id=viewpoint_id, facet=facet, value=value
+                    )
+                )
+        ViewpointFacetEntry.objects.filter(pk__in=removed).delete()
+        ViewpointFacetEntry.objects.bulk_create(added)
+
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        keys = sorted(deltas)
+        # Created first, without conflicts with concurrent saves, then counted
+        ViewpointFacet.objects.bulk_create(
+            [ViewpointFacet(facet=facet, value=value) for facet, value in keys],
+            ignore_conflicts=True,
+        )
+        for facet, value in keys:
+            ViewpointFacet.objects.filter(facet=facet, value=value).update(
+                count=F("count") + deltas[facet, value]
+            )
+        if any(delta < 0 for delta in deltas.values()):
+            _prune_facets(global_apps)
+
+
+def refresh_label_facets():
+    """Add facets of new cities and themes, remove the ones of deleted ones"""
+    with transaction.atomic():
+        _ensure_label_facets(global_apps)
+        _prune_facets(global_apps)
+
+
+def rebuild_facets(apps=global_apps):
+    """Count the values of all viewpoints"""
+    ViewpointFacet = apps.get_model("terra_opp", "ViewpointFacet")
+    ViewpointFacetEntry = apps.get_model("terra_opp", "ViewpointFacetEntry")
+
+    with transaction.atomic():
+        ViewpointFacetEntry.objects.all().delete()
+        ViewpointFacet.objects.all().delete()
+
+        counts = Counter()
+        entries = []
+        for viewpoint in _get_viewpoints(apps):
+            for facet, value in get_viewpoint_values(viewpoint):
+                counts[facet, value] += 1
+                entries.append(
+                    ViewpointFacetEntry(
+                        viewpoint_id=viewpoint.pk, facet=facet, value=value
+                    )
+                )
+        ViewpointFacetEntry.objects.bulk_create(entries, batch_size=1000)
+        ViewpointFacet.objects.bulk_create(
+            (
+                ViewpointFacet(facet=facet, value=value, count=count)
+                for (facet, value), count in counts.items()
+            ),
+            batch_size=1000,
+        )
+        _ensure_label_facets(apps)
+
+
+def _group_facets(rows):
+    facets = defaultdict(list)
+    for facet, value, count in rows:
+        facets[facet].append((value, count))
+
+    for key, field in get_property_facets().items():
+        if field["type"] == "many":
+            facets[key].sort(key=lambda item: item[0].lower())
+        else:
+            facets[key] = sorted(
+                ((json.loads(value), count) for value, count in facets[key]),
+                key=lambda item: get_value_sort_key(item[0]),
+            )
+    return facets
+
+
+def get_facets():
+    """Return lists of (value, count) by facet, read from the index"""
+    return _group_facets(ViewpointFacet.objects.values_list("facet", "value", "count"))
+
+
+def count_facets(viewpoints):
+    """
+    Return lists of (value, count) by facet of the given viewpoints queryset,
+    counted by a single grouped query on their entries.
+    """
+    return _group_facets(
+        ViewpointFacetEntry.objects.filter(
+            viewpoint_id__in=viewpoints.order_by().values("pk")
+        )
+        .values_list("facet", "value")
+        .annotate(count=Count("pk"))
+        .order_by("facet", "value")
+    )
@@ -1,12 +1,25 @@
+import math
+import operator
+import re
+from functools import reduce
 from pprint import pformat
 
 import coreapi
 import coreschema
 from django.conf import settings
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Point, Polygon
+from django.contrib.gis.measure import D
 from django.contrib.postgres.fields.jsonb import KeyTextTransform
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, F, FloatField, Func, Lookup, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
 from django_filters import FilterSet
+from django_filters.constants import EMPTY_VALUES
 from django_filters.rest_framework import filters
-from rest_framework.filters import BaseFilterBackend
+from rest_framework.filters import BaseFilterBackend, OrderingFilter, SearchFilter
 from url_filter.integrations.drf import DjangoFilterBackend
 from rest_framework.exceptions import APIException
 
@@ -19,8 +32,37 @@ class BadFilter(APIException):
     default_code = "bad_filter"
 
 
+class SearchableKeyTextTransform(KeyTextTransform):
+    """Text of a JSON property, the expression of its index"""
+
+
+@SearchableKeyTextTransform.register_lookup
+class ILikeContains(Lookup):
+    """
+    Case insensitive containment with ILIKE, unlike `icontains` which uses UPPER()
+    and can't be answered by a trigram index on the bare expression.
+    """
+
+    lookup_name = "ilike_contains"
+
+    def get_db_prep_lookup(self, value, connection):
+        return "%s", [f"%{connection.ops.prep_for_like_query(value)}%"]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", lhs_params + rhs_params
+
+
+# Annotation of the viewpoints searched on text properties with `ranking`
+TEXT_SIMILARITY = "text_similarity"
+# Annotation of the results of a full text search
+SEARCH_RANK = "search_rank"
+
+
 class JsonFilterBackend(BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
+        similarities = []
         for key, field in settings.TROPP_SEARCHABLE_PROPERTIES.items():
             search_key = f'properties__{field["json_key"]}'
             if field["type"] == "many":
@@ -29,15 +71,33 @@ class JsonFilterBackend(BaseFilterBackend):
                 search_item = request.GET.get(search_key)
             if search_item:
                 if field["type"] == "text":
-                    # Full text search
+                    # Full text search, answered by the trigram index of the property
+                    expression = SearchableKeyTextTransform(
+                        field["json_key"], "properties"
+                    )
+                    queryset = queryset.annotate(**{key: expression}).filter(
+                        **{f"{key}__ilike_contains": search_item}
+                    )
+                    if field.get("ranking"):
+                        similarities.append(TrigramSimilarity(expression, search_item))
+                elif field["type"] == "single":
+                    # Search on value, answered by the B-tree index of the property
                     queryset = queryset.annotate(
-                        **{key: KeyTextTransform(field["json_key"], "properties")}
-                    ).filter(**{f"{key}__icontains": search_item})
+                        **{
+                            key: SearchableKeyTextTransform(
+                                field["json_key"], "properties"
+                            )
+                        }
+                    ).filter(**{key: search_item})
                 else:
-                    # Search on element
+                    # Search on elements, answered by the GIN index of the property
                     queryset = queryset.filter(
                         **{f"{search_key}__contains": search_item}
                     )
+        if similarities:
+            queryset = queryset.annotate(
+                **{TEXT_SIMILARITY: reduce(operator.add, similarities)}
+            )
         return queryset
 
     def get_schema_fields(self, view):
@@ -62,14 +122,275 @@ class JsonFilterBackend(BaseFilterBackend):
         return super().get_schema_fields(view)
 
 
+# Shortest length of a degree of latitude, in meters
+METERS_PER_DEGREE = 110574
+
+
+def meters_to_degrees(distance, latitude):
+    """
+    Return a distance in degrees covering at least `distance` meters in every
+    direction around the given latitude, to search on geographic geometries.
+    """
+    furthest_latitude = abs(latitude) + distance / METERS_PER_DEGREE
+    if furthest_latitude >= 90:
+        return 360
+    return distance / (METERS_PER_DEGREE * math.cos(math.radians(furthest_latitude)))
+
+
+class KNNDistance(Func):
+    """
+    PostGIS `<->` operator, ordering on it is answered by the GiST index. On
+    geographic coordinates, it's a distance in degrees.
+    """
+
+    arg_joiner = " <-> "
+    template = "%(expressions)s"
+    output_field = FloatField()
+
+
+class SpatialFilterBackend(BaseFilterBackend):
+    """
+    Filter viewpoints on their point geometry, with WGS84 coordinates:
+
+    - `in_bbox=xmin,ymin,xmax,ymax` keeps viewpoints inside the box
+    - `dist=meters&point=x,y` keeps viewpoints around the point
+    - `nearest=N&point=x,y` keeps the N nearest viewpoints, ordered by distance
+    """
+
+    geom_field = "point__geom"
+    max_nearest = 1000
+
+    @staticmethod
+    def _parse_floats(request, param, size):
+        try:
+            values = [float(value) for value in request.GET[param].split(",")]
+        except ValueError:
+            values = []
+        if len(values) != size:
+            raise BadFilter(f"{param} expects {size} comma separated numbers")
+        return values
+
+    def _parse_point(self, request):
+        if "point" not in request.GET:
+            raise BadFilter("A point is required")
+        return Point(*self._parse_floats(request, "point", 2), srid=4326)
+
+    def filter_queryset(self, request, queryset, view):
+        if "in_bbox" in request.GET:
+            bbox = Polygon.from_bbox(self._parse_floats(request, "in_bbox", 4))
+            bbox.srid = 4326
+            queryset = queryset.filter(**{f"{self.geom_field}__intersects": bbox})
+
+        if "dist" in request.GET:
+            point = self._parse_point(request)
+            (dist,) = self._parse_floats(request, "dist", 1)
+            # The indexed search in degrees is larger than the distance in meters
+            degrees = meters_to_degrees(dist, point.y)
+            queryset = queryset.filter(
+                **{
+                    f"{self.geom_field}__dwithin": (point, degrees),
+                    f"{self.geom_field}__distance_lte": (point, D(m=dist)),
+                }
+            )
+
+        if "nearest" in request.GET:
+            point = self._parse_point(request)
+            try:
+                nearest = int(request.GET["nearest"])
+            except ValueError:
+                nearest = 0
+            if not 0 < nearest <= self.max_nearest:
+                raise BadFilter(
+                    f"nearest expects a number from 1 to {self.max_nearest}"
+                )
+
+            queryset = self._filter_nearest(queryset, point, nearest)
+
+        return queryset
+
+    def _filter_nearest(self, queryset, point, nearest):
+        """
+        Keep the `nearest` viewpoints in meters. The `<->` order answered by the
+        index is in degrees, so it only finds candidates: the true nearest ones
+        are within the spherical distance of the furthest candidate, where they
+        are searched again with the index and ordered by that distance.
+        """
+        candidates = queryset.model._default_manager.filter(
+            pk__in=queryset.order_by().values("pk")
+        )
+        distance = Distance(self.geom_field, point)
+        knn_distance = KNNDistance(
+            self.geom_field, Value(point, output_field=GeometryField(srid=4326))
+        )
+        radius = max(
+            candidates.order_by(knn_distance)
+            .annotate(distance=distance)
+            .values_list("distance", flat=True)[:nearest],
+            default=None,
+        )
+        if radius is None:
+            return queryset.none()
+
+        degrees = meters_to_degrees(radius.m, point.y)
+        nearest_ids = list(
+            candidates.filter(**{f"{self.geom_field}__dwithin": (point, degrees)})
+            .order_by(distance, "pk")
+            .values_list("pk", flat=True)[:nearest]
+        )
+        return (
+            queryset.filter(pk__in=nearest_ids)
+            .annotate(distance=distance)
+            .order_by("distance", "pk")
+        )
+
+    def get_schema_fields(self, view):
+        super().get_schema_fields(view)
+        return [
+            coreapi.Field(
+                name="in_bbox",
+                required=False,
+                location="query",
+                schema=coreschema.String(
+                    title="Bounding box",
+                    description="xmin,ymin,xmax,ymax in WGS84",
+                ),
+            ),
+            coreapi.Field(
+                name="point",
+                required=False,
+                location="query",
+                schema=coreschema.String(
+                    title="Point",
+                    description="x,y in WGS84, center of dist and nearest filters",
+                ),
+            ),
+            coreapi.Field(
+                name="dist",
+                required=False,
+                location="query",
+                schema=coreschema.Number(
+                    title="Distance",
+                    description="Maximum distance to the point, in meters",
+                ),
+            ),
+            coreapi.Field(
+                name="nearest",
+                required=False,
+                location="query",
+                schema=coreschema.Integer(
+                    title="Nearest",
+                    description="Number of viewpoints nearest to the point",
+                ),
+            ),
+        ]
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Search the words starting with the `search` terms in the `search_vector_field`
+    of the view, ranking the results. Only the `search_vector_weights` of the
+    vector are searched, all of them by default. Terms can also match exactly one
+    of its `search_exact_fields`, or all be contained in one of its
+    `search_contains_fields`.
+    """
+
+    def get_search_query(self, terms, weights=""):
+        words = re.findall(r"[^\W_]+", " ".join(terms))
+        if not words:
+            return None
+        return SearchQuery(
+            " & ".join(f"{word}:*{weights}" for word in words),
+            config=settings.TROPP_SEARCH_CONFIG,
+            search_type="raw",
+        )
+
+    @staticmethod
+    def get_exact_values(field, terms):
+        values = []
+        for term in terms:
+            try:
+                values.append(field.to_python(term))
+            except ValidationError:
+                pass
+        return values
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        query = self.get_search_query(terms, getattr(view, "search_vector_weights", ""))
+        if query is None:
+            return queryset
+
+        vector_field = getattr(view, "search_vector_field", "search_vector")
+        condition = Q(**{vector_field: query})
+        for name in getattr(view, "search_exact_fields", ()):
+            values = self.get_exact_values(queryset.model._meta.get_field(name), terms)
+            if values:
+                condition |= Q(**{f"{name}__in": values})
+        for name in getattr(view, "search_contains_fields", ()):
+            condition |= reduce(
+                operator.and_, (Q(**{f"{name}__icontains": term}) for term in terms)
+            )
+        rank = Coalesce(
+            SearchRank(F(vector_field), query), Value(0.0, output_field=FloatField())
+        )
+        return queryset.filter(condition).annotate(**{SEARCH_RANK: rank})
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """
+    Order results by their rank in a full text search, or by their similarity to
+    the searched text properties, first, unless an ordering is asked.
+    """
+
+    rank_annotations = (SEARCH_RANK, TEXT_SIMILARITY)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not request.query_params.get(self.ordering_param):
+            ordering = [
+                *(
+                    f"-{name}"
+                    for name in self.rank_annotations
+                    if name in queryset.query.annotations
+                ),
+                *(ordering or []),
+            ]
+        return ordering
+
+
+def has_multivalued_joins(queryset):
+    """Whether the queryset joins a relation which may repeat its rows"""
+    return any(
+        getattr(join.join_field, "one_to_many", False)
+        or getattr(join.join_field, "many_to_many", False)
+        for join in queryset.query.alias_map.values()
+    )
+
+
+class PictureExistsFilter(filters.DateFilter):
+    """
+    Keep viewpoints having a picture matching the lookup on `field_name`, with a
+    correlated EXISTS rather than a join repeating viewpoints by picture.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        lookup = f"{self.field_name}__{self.lookup_expr}"
+        pictures = Picture.objects.filter(viewpoint=OuterRef("pk"), **{lookup: value})
+        # Annotated first to be filtered on with Django < 3.0
+        alias = f"_has_picture_{self.field_name}_{self.lookup_expr}"
+        return qs.annotate(**{alias: Exists(pictures)}).filter(**{alias: True})
+
+
 class ViewpointFilterSet(FilterSet):
     id = filters.CharFilter(field_name="id", lookup_expr="exact")
     city = filters.CharFilter(field_name="city__label", lookup_expr="exact")
     themes = filters.CharFilter(field_name="themes__label", lookup_expr="exact")
     city_id = filters.CharFilter(field_name="city", lookup_expr="exact")
     themes_id = filters.CharFilter(field_name="themes", lookup_expr="exact")
-    date_from = filters.DateFilter(field_name="pictures__date", lookup_expr="gte")
-    date_to = filters.DateFilter(field_name="pictures__date", lookup_expr="lte")
+    date_from = PictureExistsFilter(field_name="date", lookup_expr="gte")
+    date_to = PictureExistsFilter(field_name="date", lookup_expr="lte")
     last_picture = filters.DateFilter(
         field_name="last_accepted_picture_date", lookup_expr="lte"
     )
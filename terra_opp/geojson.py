@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import json
+
+from django.db import transaction
+from versatileimagefield.serializers import VersatileImageFieldSerializer
+
+from .models import PublicFeatureCollection, PublicViewpointFeature, Viewpoint
+
+COLLECTION_PK = 1
+
+
+def get_public_viewpoints():
+    """Viewpoints shown to anonymous users by the active listing"""
+    return Viewpoint.objects.with_accepted_pictures().filter(active=True)
+
+
+def get_thumbnail_url(picture):
+    sizes = VersatileImageFieldSerializer("terra_opp").to_representation(picture.file)
+    return sizes.get("thumbnail")
+
+
+def build_feature(viewpoint):
+    """Return the GeoJSON Feature of a viewpoint, as a string"""
+    return json.dumps(
+        {
+            "type": "Feature",
+            "id": viewpoint.pk,
+            "geometry": json.loads(viewpoint.point.geom.geojson),
+            "properties": {
+                "label": viewpoint.label,
+                "city": viewpoint.city.label if viewpoint.city else None,
+                "picture": get_thumbnail_url(viewpoint.last_accepted_picture),
+            },
+        },
+        separators=(",", ":"),
+    )
+
+
+def mark_public_collection_stale():
+    PublicFeatureCollection.objects.filter(pk=COLLECTION_PK).update(stale=True)
+
+
+def refresh_public_features(*viewpoint_ids):
+    """
+    Build the features of the given viewpoints again, all of them if no id is
+    given, and mark the collection as stale. Viewpoints that are not public any
+    more lose their feature.
+    """
+    viewpoints = get_public_viewpoints().select_related(
+        "point", "city", "last_accepted_picture"
+    )
+    features = PublicViewpointFeature.objects.all()
+    if viewpoint_ids:
+        viewpoints = viewpoints.filter(pk__in=viewpoint_ids)
+        features = features.filter(viewpoint__in=viewpoint_ids)
+
+    new_features = [
+        PublicViewpointFeature(viewpoint=viewpoint, geojson=build_feature(viewpoint))
+        for viewpoint in viewpoints
+    ]
+    with transaction.atomic():
+        features.delete()
+        PublicViewpointFeature.objects.bulk_create(new_features)
+        mark_public_collection_stale()
+
+
+def get_public_collection():
+    """Return the up to date PublicFeatureCollection, rebuilding it if stale"""
+    collection = PublicFeatureCollection.objects.filter(
+        pk=COLLECTION_PK, stale=False
+    ).first()
+    if collection is not None:
+        return collection
+
+    with transaction.atomic():
+        # Concurrent requests wait for the first one to rebuild the collection
+        (
+            collection,
+            created,
+        ) = PublicFeatureCollection.objects.select_for_update().get_or_create(
+            pk=COLLECTION_PK
+        )
+        if created:
+            # Features were never built
+            refresh_public_features()
+        elif not collection.stale:
+            return collection
+
+        features = PublicViewpointFeature.objects.order_by("viewpoint").values_list(
+            "geojson", flat=True
+        )
+        content = '{"type":"FeatureCollection","features":[%s]}' % ",".join(
+            features.iterator()
+        )
+        content = content.encode()
+        etag = hashlib.sha256(content).hexdigest()
+        if etag != collection.etag:
+            collection.version += 1
+        collection.content = gzip.compress(content)
+        collection.etag = etag
+        collection.stale = False
+        collection.save()
+    return collection
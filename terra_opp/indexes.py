@@ -0,0 +1,97 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Viewpoint
+
+# Indexes of searchable properties are managed by this module, by their name
+INDEX_PREFIX = "terra_opp_prop_"
+
+# Index of each type of searchable property, on the expression filtered by
+# JsonFilterBackend
+INDEX_KINDS = {
+    # ILIKE on the text of the property
+    "text": ("trgm", "gin ((properties ->> %s) gin_trgm_ops)"),
+    # Equality of the text of the property
+    "single": ("btree", "btree ((properties ->> %s))"),
+    # Containment of the items of the property
+    "many": ("gin", "gin ((properties -> %s) jsonb_path_ops)"),
+}
+
+
+def get_index_name(key, kind):
+    name = f"{INDEX_PREFIX}{kind}_{re.sub(r'[^a-z0-9_]', '_', key.lower())}"
+    if len(name) > connection.ops.max_name_length():
+        digest = hashlib.md5(key.encode()).hexdigest()[:8]
+        name = f"{name[: connection.ops.max_name_length() - 9]}_{digest}"
+    return name
+
+
+def get_property_indexes():
+    """
+    Return the statements creating the indexes of TROPP_SEARCHABLE_PROPERTIES, by
+    index name, as (property key, sql, params).
+    """
+    table = connection.ops.quote_name(Viewpoint._meta.db_table)
+    indexes = {}
+    for key, field in settings.TROPP_SEARCHABLE_PROPERTIES.items():
+        if field["type"] not in INDEX_KINDS:
+            continue
+        kind, expression = INDEX_KINDS[field["type"]]
+        name = get_index_name(key, kind)
+        indexes[name] = (
+            key,
+            f"CREATE INDEX {{concurrently}} {connection.ops.quote_name(name)} "
+            f"ON {table} USING {expression}",
+            [field["json_key"]],
+        )
+    return indexes
+
+
+def get_existing_indexes():
+    """Names of the indexes of searchable properties in the database"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s "
+            "AND indexname LIKE %s",
+            [Viewpoint._meta.db_table, f"{INDEX_PREFIX}%"],
+        )
+        return {name for name, in cursor.fetchall()}
+
+
+def get_uncovered_properties():
+    """Keys of the searchable properties without their index in the database"""
+    existing = get_existing_indexes()
+    covered = {
+        key for name, (key, *_) in get_property_indexes().items() if name in existing
+    }
+    return [key for key in settings.TROPP_SEARCHABLE_PROPERTIES if key not in covered]
+
+
+def sync_property_indexes(drop=False, concurrently=False):
+    """
+    Create the missing indexes of searchable properties, and drop the ones of
+    properties which are not configured any more if `drop` is true.
+
+    Indexes are created without locking writes if `concurrently` is true, which
+    can't be done in a transaction.
+
+    :return: the names of created and dropped indexes
+    """
+    indexes = get_property_indexes()
+    existing = get_existing_indexes()
+    created = sorted(indexes.keys() - existing)
+    dropped = sorted(existing - indexes.keys()) if drop else []
+
+    concurrently = "CONCURRENTLY" if concurrently else ""
+    with connection.cursor() as cursor:
+        for name in created:
+            _, sql, params = indexes[name]
+            cursor.execute(sql.format(concurrently=concurrently), params)
+        for name in dropped:
+            cursor.execute(
+                f"DROP INDEX {concurrently} {connection.ops.quote_name(name)}"
+            )
+    return created, dropped
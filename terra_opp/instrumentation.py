@@ -0,0 +1,90 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """
+    Record the SQL and the duration of the queries run on every database while
+    used as a context manager, whatever DEBUG is.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        """Total time of the queries, in seconds"""
+        return sum(duration for sql, duration in self.queries)
+
+    @property
+    def repeated(self):
+        """Number of runs by SQL run more than once, with any parameters"""
+        counts = Counter(sql for sql, duration in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+
+class QueryInstrumentationMixin:
+    """
+    Record the queries of each action when TROPP_QUERY_INSTRUMENTATION is true,
+    reported in a Server-Timing header and logged. Repeated SQL, usually a query
+    by row, and actions running more queries than their `query_budgets` are
+    logged as warnings.
+
+    Queries run while a streamed response is sent aren't recorded.
+    """
+
+    # Most queries expected by action
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        if not settings.TROPP_QUERY_INSTRUMENTATION:
+            return super().dispatch(request, *args, **kwargs)
+
+        with QueryRecorder() as recorder:
+            response = super().dispatch(request, *args, **kwargs)
+        self.report_queries(recorder, response)
+        return response
+
+    def report_queries(self, recorder, response):
+        name = f"{self.__class__.__name__}.{self.action}"
+        milliseconds = recorder.duration * 1000
+        timing = f'db;dur={milliseconds:.1f};desc="{len(recorder)} queries"'
+        if response.has_header("Server-Timing"):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+
+        logger.info("%s: %d queries in %.1fms", name, len(recorder), milliseconds)
+        for sql, count in recorder.repeated.items():
+            logger.warning("%s: query run %d times: %s", name, count, sql)
+        budget = self.query_budgets.get(self.action)
+        if budget is not None and len(recorder) > budget:
+            logger.warning(
+                "%s: %d queries, over its budget of %d", name, len(recorder), budget
+            )
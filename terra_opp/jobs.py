@@ -0,0 +1,163 @@
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import PdfJob
+from .sheets import render_sheet
+
+logger = logging.getLogger(__name__)
+
+
+def render_viewpoint_pdf(viewpoint, base_url):
+    """PDF sheet of a viewpoint, as the pdf action of its viewset"""
+    return render_sheet(viewpoint, base_url)
+
+
+def enqueue_pdf_job(viewpoint, base_url, owner=None):
+    """
+    Return the unfinished job of the viewpoint sheet requested by the same user,
+    or a new one.
+    """
+    job = (
+        PdfJob.objects.filter(
+            viewpoint=viewpoint,
+            owner=owner,
+            base_url=base_url,
+            state__in=(PdfJob.PENDING, PdfJob.RUNNING),
+        )
+        .order_by("created_at")
+        .first()
+    )
+    if job is None:
+        job = PdfJob.objects.create(viewpoint=viewpoint, owner=owner, base_url=base_url)
+    return job
+
+
+def claim_job():
+    """
+    Mark the oldest pending job as running, rows locked by other workers are
+    skipped.
+
+    :return: the claimed job, or None
+    """
+    with transaction.atomic():
+        job = (
+            PdfJob.objects.select_for_update(skip_locked=True)
+            .filter(state=PdfJob.PENDING)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.state = PdfJob.RUNNING
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["state", "started_at", "attempts"])
+    return job
+
+
+def run_job(job):
+    try:
+        content = render_viewpoint_pdf(job.viewpoint, job.base_url)
+    except Exception as exc:
+        logger.exception("PDF job %s failed", job.pk)
+        job.error = str(exc)
+        if job.attempts < settings.TROPP_PDF_JOB_MAX_ATTEMPTS:
+            job.state = PdfJob.PENDING
+        else:
+            job.state = PdfJob.FAILED
+    else:
+        job.file.save(
+            f"viewpoint_{job.viewpoint_id}_{job.pk}.pdf",
+            ContentFile(content),
+            save=False,
+        )
+        job.error = ""
+        job.state = PdfJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["file", "error", "state", "finished_at"])
+    return job
+
+
+def fail_job(job, exc):
+    """
+    Mark a job whose result could not be saved as failed, the job or its
+    viewpoint may have been deleted meanwhile.
+    """
+    if job.file:
+        job.file.delete(save=False)
+    job.state = PdfJob.FAILED
+    job.error = str(exc)
+    job.finished_at = timezone.now()
+    PdfJob.objects.filter(pk=job.pk).update(
+        state=job.state, error=job.error, finished_at=job.finished_at
+    )
+
+
+def requeue_stale_jobs():
+    """
+    Give jobs running for longer than TROPP_PDF_JOB_TIMEOUT, whose worker
+    probably died, to another worker.
+    """
+    started_before = timezone.now() - datetime.timedelta(
+        seconds=settings.TROPP_PDF_JOB_TIMEOUT
+    )
+    stale = PdfJob.objects.filter(state=PdfJob.RUNNING, started_at__lt=started_before)
+    failed = stale.filter(attempts__gte=settings.TROPP_PDF_JOB_MAX_ATTEMPTS).update(
+        state=PdfJob.FAILED, error="Timeout", finished_at=timezone.now()
+    )
+    return stale.update(state=PdfJob.PENDING) + failed
+
+
+def purge_expired_jobs():
+    """Delete jobs finished for longer than TROPP_PDF_JOB_EXPIRATION and files"""
+    finished_before = timezone.now() - datetime.timedelta(
+        seconds=settings.TROPP_PDF_JOB_EXPIRATION
+    )
+    expired = PdfJob.objects.filter(
+        state__in=(PdfJob.DONE, PdfJob.FAILED), finished_at__lt=finished_before
+    )
+    count = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
+
+
+def run_worker(once=False, sleep=1.0, max_jobs=None):
+    """
+    Render pending jobs until stopped, or until there is none left if `once` is
+    true.
+
+    :return: the number of processed jobs
+    """
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        # Connections dropped or expired while idle are replaced
+        close_old_connections()
+        requeue_stale_jobs()
+        job = claim_job()
+        if job is None:
+            purge_expired_jobs()
+            if once:
+                break
+            time.sleep(sleep)
+            continue
+        try:
+            run_job(job)
+        except Exception as exc:
+            logger.exception("PDF job %s could not be saved", job.pk)
+            try:
+                fail_job(job, exc)
+            except Exception:
+                logger.exception("PDF job %s could not be marked failed", job.pk)
+        logger.info("PDF job %s: %s", job.pk, job.state)
+        processed += 1
+    return processed
@@ -0,0 +1,70 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+
+from terra_opp.benchmark import Benchmark, compare
+
+
+class Command(BaseCommand):
+    help = "Time the API endpoints and write the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--user",
+            help="Username of the user making requests, the first superuser "
+            "by default",
+        )
+        parser.add_argument("--host", default="localhost", help="HTTP Host header")
+        parser.add_argument(
+            "--only",
+            action="append",
+            help="Only measure endpoints with this text in their name",
+        )
+        parser.add_argument("-o", "--output", help="File to write results to")
+        parser.add_argument("--compare", help="Results of a previous run to compare to")
+
+    def get_user(self, username):
+        UserModel = get_user_model()
+        if username:
+            try:
+                return UserModel.objects.get_by_natural_key(username)
+            except UserModel.DoesNotExist:
+                raise CommandError(f"User {username} does not exist")
+        user = UserModel.objects.filter(is_superuser=True).order_by("pk").first()
+        if user is None:
+            raise CommandError("No superuser found, use --user")
+        return user
+
+    def handle(self, *args, **options):
+        benchmark = Benchmark(
+            self.get_user(options["user"]),
+            repeat=options["repeat"],
+            host=options["host"],
+            only=options["only"],
+        )
+        results = benchmark.run()
+
+        ratios = {}
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                ratios = compare(results, json.load(f))
+
+        self.stdout.write(
+            f"{'endpoint':<24}{'status':>7}{'median (ms)':>13}"
+            f"{'db (ms)':>10}{'queries':>9}{'ratio':>8}"
+        )
+        for name, result in results["endpoints"].items():
+            ratio = f"{ratios[name]:.2f}" if name in ratios else ""
+            self.stdout.write(
+                f"{name:<24}{result['status']:>7}{result['median_ms']:>13.1f}"
+                f"{result['db_ms']:>10.1f}{result['queries']:>9}{ratio:>8}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f"Results written to {options['output']}")
+            )
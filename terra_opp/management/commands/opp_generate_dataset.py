@@ -0,0 +1,47 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from terra_opp.dataset import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = "Create a synthetic observatory to measure the API on large data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--viewpoints", type=int, default=1000)
+        parser.add_argument("--pictures-per-viewpoint", type=int, default=10)
+        parser.add_argument("--cities", type=int, default=100)
+        parser.add_argument("--themes", type=int, default=20)
+        parser.add_argument("--campaigns", type=int, default=10)
+        parser.add_argument(
+            "--campaign-size",
+            type=int,
+            default=50,
+            help="Number of viewpoints of each campaign",
+        )
+        parser.add_argument("--photographers", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the random values"
+        )
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            viewpoints=options["viewpoints"],
+            pictures_per_viewpoint=options["pictures_per_viewpoint"],
+            cities=options["cities"],
+            themes=options["themes"],
+            campaigns=options["campaigns"],
+            campaign_size=options["campaign_size"],
+            photographers=options["photographers"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+        )
+        with transaction.atomic():
+            created = generator.generate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Dataset has been created: "
+                + ", ".join(f"{count} {name}" for name, count in created.items())
+            )
+        )
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from terra_opp.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Count the filter values of all viewpoints again"
+
+    def handle(self, *args, **options):
+        rebuild_facets()
+        self.stdout.write(self.style.SUCCESS("Viewpoint facets have been rebuilt"))
@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from terra_opp.photographers import rebuild_photographers
+
+
+class Command(BaseCommand):
+    help = "Count the pictures of all photographers again"
+
+    def handle(self, *args, **options):
+        rebuild_photographers()
+        self.stdout.write(
+            self.style.SUCCESS("Photographers directory has been rebuilt")
+        )
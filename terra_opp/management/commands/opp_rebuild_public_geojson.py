@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from terra_opp.geojson import get_public_collection, refresh_public_features
+
+
+class Command(BaseCommand):
+    help = "Rebuild the public GeoJSON FeatureCollection of viewpoints"
+
+    def handle(self, *args, **options):
+        refresh_public_features()
+        collection = get_public_collection()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Public GeoJSON has been rebuilt (version {collection.version})"
+            )
+        )
@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from terra_opp.search import rebuild_search_vectors
+
+
+class Command(BaseCommand):
+    help = "Compute the full text search vectors of all viewpoints again"
+
+    def handle(self, *args, **options):
+        rebuild_search_vectors()
+        self.stdout.write(
+            self.style.SUCCESS("Viewpoint search vectors have been rebuilt")
+        )
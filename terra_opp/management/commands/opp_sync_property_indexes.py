@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand
+
+from terra_opp.indexes import get_uncovered_properties, sync_property_indexes
+
+
+class Command(BaseCommand):
+    help = "Create the database indexes of TROPP_SEARCHABLE_PROPERTIES"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop indexes of properties which are not searchable any more",
+        )
+        parser.add_argument(
+            "--concurrently",
+            action="store_true",
+            help="Build indexes without locking the viewpoints table",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report the searchable properties without index",
+        )
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            created, dropped = sync_property_indexes(
+                drop=options["drop"], concurrently=options["concurrently"]
+            )
+            for name in created:
+                self.stdout.write(f"Created {name}")
+            for name in dropped:
+                self.stdout.write(f"Dropped {name}")
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{len(created)} index(es) created, {len(dropped)} dropped"
+                )
+            )
+
+        for key in get_uncovered_properties():
+            self.stdout.write(self.style.WARNING(f"No index covers property {key}"))
@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from terra_opp.models import Viewpoint
+
+
+class Command(BaseCommand):
+    help = "Point viewpoints to their latest accepted picture"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "viewpoints",
+            nargs="*",
+            type=int,
+            help="Viewpoint ids to update, all viewpoints if none is given.",
+        )
+
+    def handle(self, *args, **options):
+        updated = Viewpoint.objects.update_last_accepted_pictures(
+            *options["viewpoints"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{updated} viewpoint(s) have been updated")
+        )
@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand
+
+from terra_opp.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Render the PDF jobs queued in the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Stop when no job is left instead of waiting for new ones",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between checks for new jobs",
+        )
+        parser.add_argument(
+            "--max-jobs", type=int, help="Stop after rendering this number of jobs"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            processed = run_worker(
+                once=options["once"],
+                sleep=options["sleep"],
+                max_jobs=options["max_jobs"],
+            )
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f"{processed} job(s) processed"))
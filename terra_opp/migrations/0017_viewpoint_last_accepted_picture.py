@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-17 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def update_last_accepted_pictures(apps, schema_editor):
+    Picture = apps.get_model("terra_opp", "Picture")
+    Viewpoint = apps.get_model("terra_opp", "Viewpoint")
+
+    latest_pictures = Picture.objects.filter(
+        viewpoint=models.OuterRef("pk"),
+        state="accepted",
+    ).order_by("-date", "-pk")
+
+    Viewpoint.objects.update(
+        last_accepted_picture=models.Subquery(latest_pictures.values("pk")[:1]),
+        last_accepted_picture_date=models.Subquery(latest_pictures.values("date")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("terra_opp", "0016_alter_viewpoint_city"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="viewpoint",
+            name="last_accepted_picture",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="terra_opp.picture",
+            ),
+        ),
+        migrations.AddField(
+            model_name="viewpoint",
+            name="last_accepted_picture_date",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="Last accepted picture date",
+            ),
+        ),
+        migrations.RunPython(
+            update_last_accepted_pictures, reverse_code=migrations.RunPython.noop
+        ),
+    ]
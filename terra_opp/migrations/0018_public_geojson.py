@@ -0,0 +1,49 @@
+# Generated by Django 3.2 on 2026-10-17 10:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("terra_opp", "0017_viewpoint_last_accepted_picture"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublicFeatureCollection",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content", models.BinaryField(default=bytes)),
+                ("etag", models.CharField(default="", max_length=64)),
+                ("version", models.PositiveIntegerField(default=0)),
+                ("stale", models.BooleanField(default=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PublicViewpointFeature",
+            fields=[
+                (
+                    "viewpoint",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="terra_opp.viewpoint",
+                    ),
+                ),
+                ("geojson", models.TextField()),
+            ],
+        ),
+    ]
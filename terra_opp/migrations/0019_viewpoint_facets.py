@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+def rebuild_facets(apps, schema_editor):
+    from terra_opp.facets import rebuild_facets
+
+    rebuild_facets(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("terra_opp", "0018_public_geojson"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ViewpointFacet",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("facet", models.CharField(max_length=100)),
+                ("value", models.TextField()),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["facet", "value"],
+                "unique_together": {("facet", "value")},
+            },
+        ),
+        migrations.CreateModel(
+            name="ViewpointFacetEntry",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("viewpoint_id", models.IntegerField(db_index=True)),
+                ("facet", models.CharField(max_length=100)),
+                ("value", models.TextField()),
+            ],
+        ),
+        migrations.RunPython(rebuild_facets, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 3.2 on 2026-10-17 15:02
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("terra_opp", "0019_viewpoint_facets"),
+    ]
+
+    operations = [
+        # Used by the indexes of text searchable properties
+        TrigramExtension(),
+    ]
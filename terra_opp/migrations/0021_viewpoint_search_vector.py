@@ -0,0 +1,51 @@
+# Generated by Django 3.2 on 2026-10-17 15:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+
+def rebuild_search_vectors(apps, schema_editor):
+    from terra_opp.search import rebuild_search_vectors
+
+    rebuild_search_vectors(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("terra_opp", "0020_trigram_extension"),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunSQL(
+            [
+                "CREATE TEXT SEARCH CONFIGURATION terra_opp_french (COPY = french)",
+                "ALTER TEXT SEARCH CONFIGURATION terra_opp_french "
+                "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem",
+                "CREATE TEXT SEARCH CONFIGURATION terra_opp_english (COPY = english)",
+                "ALTER TEXT SEARCH CONFIGURATION terra_opp_english "
+                "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, english_stem",
+            ],
+            [
+                "DROP TEXT SEARCH CONFIGURATION terra_opp_french",
+                "DROP TEXT SEARCH CONFIGURATION terra_opp_english",
+            ],
+        ),
+        migrations.AddField(
+            model_name="viewpoint",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="viewpoint",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="terra_opp_viewpoint_search"
+            ),
+        ),
+        migrations.RunPython(rebuild_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2 on 2026-10-17 16:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def rebuild_photographers(apps, schema_editor):
+    from terra_opp.photographers import rebuild_photographers
+
+    rebuild_photographers(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("terra_opp", "0021_viewpoint_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Photographer",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("pictures_count", models.PositiveIntegerField(default=0)),
+                ("first_picture_date", models.DateTimeField()),
+                ("last_picture_date", models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(rebuild_photographers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-17 19:40
+
+from django.db import migrations
+
+
+def rebuild_facets(apps, schema_editor):
+    from terra_opp.facets import rebuild_facets
+
+    rebuild_facets(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("terra_opp", "0023_pdfjob"),
+    ]
+
+    operations = [
+        # Single values are now indexed as JSON
+        migrations.RunPython(rebuild_facets, reverse_code=migrations.RunPython.noop),
+    ]
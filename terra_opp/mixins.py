@@ -0,0 +1,174 @@
+import hashlib
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import prefetch_related_objects
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .renderers import stream_json
+from .response_cache import get_validators
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    Answer `If-None-Match` and `If-Modified-Since` requests of viewsets.
+
+    Validators are derived from the generation of the responses cache, bumped
+    when any object rendered by terra_opp responses changes, and from the time
+    of that change. They are read from the cache without any query, and are only
+    sent when the cache is shared by all processes, see is_cache_shared. A 304 response is returned without
+    serializing anything, details are only fetched to check they exist and
+    their object permissions.
+
+    Any change invalidates the validators of all responses, and `Last-Modified`
+    is the time of the last change of any object. It is only sent for a single
+    object.
+    """
+
+    conditional_actions = ("list", "retrieve")
+
+    _conditional_etag = None
+    _conditional_last_modified = None
+
+    def get_conditional_object(self):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return get_object_or_404(
+                queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+
+    def get_etag(self, request, generation):
+        user = request.user
+        parts = [
+            self.action,
+            str(user.pk if user.is_authenticated else ""),
+            request.get_full_path(),
+            getattr(request.accepted_renderer, "format", ""),
+            getattr(request, "LANGUAGE_CODE", ""),
+            str(generation),
+        ]
+        return quote_etag(hashlib.md5("|".join(parts).encode()).hexdigest())
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in ("GET", "HEAD"):
+            return
+        if self.action not in self.conditional_actions:
+            return
+
+        validators = get_validators()
+        if validators is None:
+            return
+        generation, modified = validators
+        self._conditional_etag = self.get_etag(request, generation)
+        if self.detail:
+            self._conditional_last_modified = int(modified)
+
+        response = get_conditional_response(
+            request,
+            etag=self._conditional_etag,
+            last_modified=self._conditional_last_modified,
+        )
+        if response is not None:
+            if self.detail:
+                # Answer 404 for missing objects, object permissions are only
+                # checked by get_object
+                obj = self.get_conditional_object()
+                self.check_object_permissions(request, obj)
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self._conditional_etag and response.status_code in (200, 304):
+            response.setdefault("ETag", self._conditional_etag)
+            if self._conditional_last_modified is not None:
+                response.setdefault(
+                    "Last-Modified", http_date(self._conditional_last_modified)
+                )
+        return response
+
+
+class StreamingListMixin:
+    """
+    Stream JSON listings which are not paginated, or with pages larger than
+    TROPP_STREAMING_PAGE_SIZE, instead of building them in memory.
+
+    Objects are loaded `streaming_chunk_size` at a time with a server side cursor,
+    their prefetched relations are loaded for each chunk, then they are
+    serialized and encoded before the next chunk is loaded.
+    """
+
+    streaming_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.get_list_response(queryset)
+
+    def get_list_response(self, queryset):
+        """Paginated or streamed response of the listing of a queryset"""
+        if self.should_stream():
+            return self.get_streaming_response(queryset)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def should_stream(self):
+        renderer = getattr(self.request, "accepted_renderer", None)
+        if getattr(renderer, "format", None) != JSONRenderer.format:
+            return False
+        if self.paginator is None:
+            return True
+        if not hasattr(self.paginator, "get_page"):
+            # Only page number pagination can be streamed
+            return False
+        page_size = self.paginator.get_page_size(self.request)
+        return not page_size or page_size > settings.TROPP_STREAMING_PAGE_SIZE
+
+    def iter_serialized_chunks(self, queryset):
+        prefetch_lookups = queryset._prefetch_related_lookups
+        objects = queryset.prefetch_related(None).iterator(
+            chunk_size=self.streaming_chunk_size
+        )
+        while True:
+            chunk = list(islice(objects, self.streaming_chunk_size))
+            if not chunk:
+                break
+            prefetch_related_objects(chunk, *prefetch_lookups)
+            yield self.get_serializer(chunk, many=True).data
+
+    def get_streaming_response(self, queryset):
+        envelope = None
+        if self.paginator is not None:
+            page = self.paginator.get_page(queryset, self.request)
+            if page is not None:
+                queryset = page.object_list
+                envelope = self.paginator.get_paginated_data([])
+
+        return StreamingHttpResponse(
+            stream_json(self.iter_serialized_chunks(queryset), envelope),
+            content_type="application/json",
+        )
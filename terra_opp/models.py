@@ -1,6 +1,11 @@
+import uuid
+
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import transaction
 from pathlib import Path
 
 try:
@@ -13,7 +18,7 @@ from versatileimagefield.fields import VersatileImageField
 
 from terra_settings.mixins import BaseUpdatableModel
 from geostore.models import Feature
-from .signals import state_change
+from .signals import last_accepted_pictures_change, state_change
 
 
 # from django.db.models import Count
@@ -31,14 +36,36 @@ class BaseLabelModel(BaseUpdatableModel):
 
 class ViewpointsManager(models.Manager):
     def with_accepted_pictures(self):
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                pictures__state=Picture.ACCEPTED,
+        return super().get_queryset().filter(last_accepted_picture__isnull=False)
+
+    def update_last_accepted_pictures(self, *viewpoint_ids):
+        """
+        Point viewpoints to their latest accepted picture, all of them if no id is
+        given. Rows are locked first, so concurrent picture changes of a viewpoint
+        are applied one after the other.
+        """
+        latest_pictures = Picture.objects.filter(
+            viewpoint=models.OuterRef("pk"),
+            state=Picture.ACCEPTED,
+        ).order_by("-date", "-pk")
+
+        queryset = self.get_queryset()
+        if viewpoint_ids:
+            queryset = queryset.filter(pk__in=viewpoint_ids)
+
+        with transaction.atomic():
+            if viewpoint_ids:
+                list(queryset.select_for_update().values_list("pk", flat=True))
+            updated = queryset.update(
+                last_accepted_picture=models.Subquery(latest_pictures.values("pk")[:1]),
+                last_accepted_picture_date=models.Subquery(
+                    latest_pictures.values("date")[:1]
+                ),
             )
-            .distinct()
-        )
+            last_accepted_pictures_change.send(
+                sender=self.model, viewpoint_ids=viewpoint_ids or None
+            )
+        return updated
 
 
 class City(BaseLabelModel):
@@ -70,8 +97,33 @@ class Viewpoint(BaseLabelModel):
     related = GenericRelation("datastore.RelatedDocument")
     active = models.BooleanField(_("Active"), default=False)
 
+    # Maintained from the pictures, see ViewpointsManager.update_last_accepted_pictures
+    last_accepted_picture = models.ForeignKey(
+        "Picture",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    last_accepted_picture_date = models.DateTimeField(
+        _("Last accepted picture date"),
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+    )
+    # Maintained by terra_opp.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
     objects = ViewpointsManager()
 
+    DENORMALIZED_FIELDS = (
+        "last_accepted_picture",
+        "last_accepted_picture_date",
+        "search_vector",
+    )
+
     @property
     def ordered_pics(self):
         if hasattr(self, "_ordered_pics"):
@@ -87,12 +139,31 @@ class Viewpoint(BaseLabelModel):
 
     @property
     def picture(self):
-        pics = self.ordered_pics
-        return pics[0].file if pics else None
+        picture = self.last_accepted_picture
+        return picture.file if picture else None
 
     class Meta:
         permissions = (("can_download_pdf", "Is able to download a pdf document"),)
         ordering = ["-created_at"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="terra_opp_viewpoint_search"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Never write back denormalized fields, they may be stale in this instance
+        if (
+            not args
+            and not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            excluded = {*self.DENORMALIZED_FIELDS, *self.get_deferred_fields()}
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in excluded
+            ]
+        super().save(*args, **kwargs)
 
 
 class CampaignManager(models.Manager):
@@ -237,11 +308,19 @@ class Picture(BaseUpdatableModel):
         ordering = ["-date"]
 
     def save(self, *args, **kwargs):
-        prev_state = None
+        prev_state = prev_viewpoint_id = None
         if self.id:
-            prev_state = Picture.objects.get(id=self.id).state
+            prev_state, prev_viewpoint_id = Picture.objects.values_list(
+                "state", "viewpoint_id"
+            ).get(id=self.id)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if Picture.ACCEPTED in (prev_state, self.state):
+                viewpoint_ids = {self.viewpoint_id, prev_viewpoint_id} - {None}
+                Viewpoint.objects.update_last_accepted_pictures(*viewpoint_ids)
 
-        super().save(*args, **kwargs)
         # Update Campaign status if any
         if self.campaign:
             self.campaign.check_state()
@@ -262,3 +341,111 @@ class Picture(BaseUpdatableModel):
         ).index(self.id)
         pic_index += 1  # list index start at 0, picture order start at 1
         return f"{obs_id}0{self.viewpoint.id:03}{pic_index:02}"
+
+
+class PublicViewpointFeature(models.Model):
+    """GeoJSON Feature of a public viewpoint, see terra_opp.geojson"""
+
+    viewpoint = models.OneToOneField(
+        Viewpoint,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="+",
+    )
+    geojson = models.TextField()
+
+
+class Photographer(models.Model):
+    """Owner of pictures, with their statistics, see terra_opp.photographers"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="+",
+    )
+    pictures_count = models.PositiveIntegerField(default=0)
+    first_picture_date = models.DateTimeField()
+    last_picture_date = models.DateTimeField()
+
+
+class PdfJob(models.Model):
+    """PDF sheet of a viewpoint rendered by opp_worker, see terra_opp.jobs"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATES = (
+        (PENDING, _("Pending")),
+        (RUNNING, _("Running")),
+        (DONE, _("Done")),
+        (FAILED, _("Failed")),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    viewpoint = models.ForeignKey(
+        Viewpoint,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    # Static and media URLs of the sheet are relative to the requested site
+    base_url = models.CharField(max_length=500)
+    state = models.CharField(_("State"), default=PENDING, choices=STATES, max_length=10)
+    file = models.FileField(_("File"), upload_to="pdf_jobs/", blank=True)
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["state", "created_at"], name="terra_opp_pdfjob_queue")
+        ]
+
+
+class PublicFeatureCollection(models.Model):
+    """
+    Single row storing the gzipped FeatureCollection of all public viewpoints,
+    rebuilt from their features when it is stale.
+    """
+
+    content = models.BinaryField(default=bytes)
+    etag = models.CharField(max_length=64, default="")
+    version = models.PositiveIntegerField(default=0)
+    stale = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ViewpointFacet(models.Model):
+    """
+    Number of viewpoints by value of a filter, see terra_opp.facets
+
+    Cities and themes are kept without viewpoints, as long as they exist.
+    """
+
+    facet = models.CharField(max_length=100)
+    value = models.TextField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("facet", "value")
+        ordering = ["facet", "value"]
+
+
+class ViewpointFacetEntry(models.Model):
+    """Filter values of a viewpoint, counted in ViewpointFacet"""
+
+    # Not a foreign key, entries of deleted viewpoints are removed by the facets
+    viewpoint_id = models.IntegerField(db_index=True)
+    facet = models.CharField(max_length=100)
+    value = models.TextField()
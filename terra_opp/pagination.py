@@ -1,27 +1,304 @@
+import datetime
+import json
 from collections import OrderedDict
+from decimal import Decimal
+from uuid import UUID
 
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
 
 class RestPageNumberPagination(PageNumberPagination):
     page_size_query_param = "page_size"
 
-    def get_paginated_response(self, data):
+    def get_page(self, queryset, request):
+        """
+        Return the requested page, or None if pagination is disabled. Objects of
+        the page are not loaded, its `object_list` is a sliced queryset.
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        self.request = request
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.get_page(queryset, request) is None:
+            return None
+        if self.page.paginator.num_pages > 1 and self.template is not None:
+            # The browsable API should display pagination controls.
+            self.display_page_controls = True
+        return list(self.page)
+
+    def get_paginated_data(self, data):
         page = self.page
 
         next_page = page.next_page_number() if page.has_next() else None
         previous_page = page.previous_page_number() if page.has_previous() else None
 
+        return OrderedDict(
+            [
+                ("count", page.paginator.count),
+                ("num_pages", page.paginator.num_pages),
+                ("next", next_page),
+                ("previous", previous_page),
+                ("page_size", self.get_page_size(self.request)),
+                ("results", data),
+            ]
+        )
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+def estimate_count(queryset):
+    """
+    Return the planner row estimate of a queryset, without counting it.
+
+    :param QuerySet queryset: the queryset to estimate
+    :return: estimated number of rows, as an integer
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _encode_position_value(value):
+    # Keep full precision for datetimes, DjangoJSONEncoder truncates microseconds
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"Can't use {type(value).__name__} in a pagination cursor")
+
+
+class RestCursorPagination(CursorPagination):
+    """
+    Keyset pagination seeking on the full ordering of the listing
+
+    The ordering comes from the OrderingFilter of the view (or `ordering` of this
+    class), relations are seeked on their column and the primary key is always
+    appended as tie-breaker, so deep pages cost the same as the first one.
+
+    The total count is expensive on large tables, so it is only computed on demand
+    with `count=exact`, or estimated by the planner with `count=estimate`.
+    """
+
+    page_size_query_param = "page_size"
+    ordering = "-created_at"
+    count_query_param = "count"
+    count_modes = ("none", "exact", "estimate")
+    default_count_mode = "none"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        self.count = self.get_count(queryset, request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            position = self._decode_position(self.cursor.position)
+            queryset = queryset.filter(self._seek(ordering, position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = []
+        for field in super().get_ordering(request, queryset, view):
+            descending = field.startswith("-")
+            name = self._get_column_name(queryset.model, field.lstrip("-"))
+            ordering.append(f"-{name}" if descending else name)
+
+        if not {"pk", "-pk"} & set(ordering):
+            # Make the ordering unique, so the seek never skips nor repeats a row
+            ordering.append("-pk" if ordering and ordering[0][0] == "-" else "pk")
+        return tuple(ordering)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, self.default_count_mode)
+        if mode not in self.count_modes:
+            raise ValidationError(
+                {
+                    self.count_query_param: f"Expected one of {', '.join(self.count_modes)}"
+                }
+            )
+
+        if mode == "exact":
+            return queryset.count()
+        if mode == "estimate":
+            return estimate_count(queryset)
+        return None
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_paginated_response(self, data):
         return Response(
             OrderedDict(
                 [
-                    ("count", page.paginator.count),
-                    ("num_pages", page.paginator.num_pages),
-                    ("next", next_page),
-                    ("previous", previous_page),
-                    ("page_size", self.get_page_size(self.request)),
+                    ("count", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("page_size", self.page_size),
                     ("results", data),
                 ]
             )
         )
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            value = instance
+            for attr in field.lstrip("-").split("__"):
+                if value is None:
+                    break
+                value = value[attr] if isinstance(value, dict) else getattr(value, attr)
+            values.append(value)
+        return json.dumps(values, default=_encode_position_value)
+
+    def _decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    @staticmethod
+    def _get_column_name(model, name):
+        """Seek on the column of a relation instead of the related object"""
+        if name == "pk" or "__" in name:
+            return name
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation, keep it as is
+            return name
+        if field.many_to_one or (field.one_to_one and field.concrete):
+            return field.attname
+        return name
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @classmethod
+    def _seek(cls, ordering, position):
+        """
+        Build the condition selecting rows strictly after `position` with the given
+        ordering. PostgreSQL sorts NULL values last in ascending order and first in
+        descending order.
+        """
+        field, *next_fields = ordering
+        value, *next_values = position
+        descending = field.startswith("-")
+        name = field.lstrip("-")
+
+        if next_fields:
+            tie = cls._seek(next_fields, next_values)
+        else:
+            tie = None
+
+        if value is None:
+            if descending:
+                after = Q(**{f"{name}__isnull": False})
+            else:
+                after = None
+            same = Q(**{f"{name}__isnull": True})
+        else:
+            after = Q(**{f"{name}__lt" if descending else f"{name}__gt": value})
+            if not descending:
+                after |= Q(**{f"{name}__isnull": True})
+            same = Q(**{name: value})
+
+        if tie is not None:
+            same &= tie
+        else:
+            same = None
+
+        conditions = [condition for condition in (after, same) if condition is not None]
+        if not conditions:
+            # Nothing can come after this position
+            return Q(pk__in=[])
+
+        condition = conditions[0]
+        for other in conditions[1:]:
+            condition |= other
+        return condition
+
+
+class CursorPaginationMixin:
+    """
+    Let the clients opt into cursor pagination, by asking `pagination=cursor` or
+    by following a cursor link.
+    """
+
+    cursor_pagination_class = RestCursorPagination
+    pagination_mode_query_param = "pagination"
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            params = request.query_params if request is not None else {}
+            if (
+                params.get(self.pagination_mode_query_param) == "cursor"
+                or self.cursor_pagination_class.cursor_query_param in params
+            ):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
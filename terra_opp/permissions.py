@@ -51,6 +51,15 @@ class CampaignPermission(BasePermission):
         return request.user.has_terra_perm("can_manage_campaigns")
 
 
+class PhotographerPermission(BasePermission):
+    """Read only for users managing campaigns, as it lists emails"""
+
+    def has_permission(self, request, view):
+        if request.user.is_anonymous or request.method not in SAFE_METHODS:
+            return False
+        return request.user.has_terra_perm("can_manage_campaigns")
+
+
 class PicturePermission(BasePermission):
     """Read only for anonymous users or has terra permissions"""
 
@@ -0,0 +1,49 @@
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, F, Max, Min
+
+
+def _get_statistics(apps, user_ids=None):
+    Picture = apps.get_model("terra_opp", "Picture")
+    pictures = Picture.objects.all()
+    if user_ids is not None:
+        pictures = pictures.filter(owner_id__in=user_ids)
+    return (
+        pictures.order_by()
+        .values(user_id=F("owner_id"))
+        .annotate(
+            pictures_count=Count("pk"),
+            first_picture_date=Min("date"),
+            last_picture_date=Max("date"),
+        )
+    )
+
+
+def refresh_photographers(*user_ids):
+    """
+    Count the pictures of the given users again, removing the ones without
+    pictures from the directory.
+    """
+    user_ids = set(user_ids) - {None}
+    if not user_ids:
+        return
+    Photographer = global_apps.get_model("terra_opp", "Photographer")
+
+    with transaction.atomic():
+        found = set()
+        for statistics in _get_statistics(global_apps, user_ids):
+            user_id = statistics.pop("user_id")
+            Photographer.objects.update_or_create(user_id=user_id, defaults=statistics)
+            found.add(user_id)
+        Photographer.objects.filter(user_id__in=user_ids - found).delete()
+
+
+def rebuild_photographers(apps=global_apps):
+    """Count the pictures of every user"""
+    Photographer = apps.get_model("terra_opp", "Photographer")
+    with transaction.atomic():
+        Photographer.objects.all().delete()
+        Photographer.objects.bulk_create(
+            (Photographer(**statistics) for statistics in _get_statistics(apps)),
+            batch_size=1000,
+        )
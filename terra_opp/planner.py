@@ -0,0 +1,146 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class QueryPlan:
+    """
+    Relations and annotations needed to render a serializer without extra queries
+
+    Plans are derived from the serializer fields: forward relations are joined with
+    `select_related`, multi-valued relations are prefetched (with their own plan
+    when rendered by a nested serializer), and computed attributes of the model
+    are resolved through the `computed` mapping given by the view.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.select_related = set()
+        self.prefetch_related = {}
+        self.prefetch_objects = {}
+        self.annotations = {}
+
+    def __bool__(self):
+        return bool(
+            self.select_related
+            or self.prefetch_related
+            or self.prefetch_objects
+            or self.annotations
+        )
+
+    @classmethod
+    def from_serializer(cls, serializer_class, computed=None):
+        """
+        Build the plan of a serializer class.
+
+        :param serializer_class: a ModelSerializer class
+        :param dict computed: maps model attributes that are not fields, to a
+            `select_related` path, a `Prefetch` object or an annotation expression.
+        :return: the plan of the serializer
+        """
+        serializer = serializer_class()
+        return cls._from_fields(
+            serializer.Meta.model, serializer.fields.values(), computed or {}
+        )
+
+    @classmethod
+    def _from_fields(cls, model, fields, computed):
+        plan = cls(model)
+        for field in fields:
+            if field.write_only or field.source == "*":
+                continue
+            plan._add_source(field.source_attrs, field, computed)
+        return plan
+
+    def _add_source(self, attrs, field, computed):
+        name = attrs[0]
+        if name in computed:
+            self._add_computed(name, computed[name])
+            return
+
+        try:
+            model_field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return
+        if not model_field.is_relation:
+            return
+
+        related_model = model_field.related_model
+        nested = self._get_nested_serializer(field)
+        if model_field.many_to_one or model_field.one_to_one:
+            if len(attrs) == 1 and self._renders_pk_only(field):
+                return
+            self.select_related.add(name)
+            if nested is not None:
+                sub_plan = self._from_fields(related_model, nested.fields.values(), {})
+                self._merge(sub_plan, prefix=name)
+            elif len(attrs) > 1:
+                sub_plan = self.__class__(related_model)
+                sub_plan._add_source(attrs[1:], field, {})
+                self._merge(sub_plan, prefix=name)
+        else:
+            sub_plan = self.prefetch_related.setdefault(
+                name, self.__class__(related_model)
+            )
+            if nested is not None:
+                sub_plan._merge(
+                    self._from_fields(related_model, nested.fields.values(), {})
+                )
+
+    def _add_computed(self, name, value):
+        if isinstance(value, str):
+            self.select_related.add(value)
+        elif isinstance(value, Prefetch):
+            self.prefetch_objects[value.prefetch_to] = value
+        else:
+            self.annotations[name] = value
+
+    def _merge(self, plan, prefix=None):
+        def prefixed(path):
+            return f"{prefix}__{path}" if prefix else path
+
+        self.select_related.update(prefixed(path) for path in plan.select_related)
+        for lookup, sub_plan in plan.prefetch_related.items():
+            existing = self.prefetch_related.get(prefixed(lookup))
+            if existing is not None:
+                existing._merge(sub_plan)
+            else:
+                self.prefetch_related[prefixed(lookup)] = sub_plan
+        if prefix is None:
+            self.prefetch_objects.update(plan.prefetch_objects)
+            self.annotations.update(plan.annotations)
+
+    @staticmethod
+    def _renders_pk_only(field):
+        return (
+            isinstance(field, serializers.RelatedField)
+            and field.use_pk_only_optimization()
+        )
+
+    @staticmethod
+    def _get_nested_serializer(field):
+        if isinstance(field, serializers.ListSerializer):
+            field = field.child
+        if isinstance(field, serializers.BaseSerializer):
+            return field
+        return None
+
+    def apply(self, queryset):
+        """Return the queryset loading everything the serializer renders"""
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+
+        lookups = []
+        for lookup, sub_plan in sorted(self.prefetch_related.items()):
+            if sub_plan:
+                related_queryset = sub_plan.apply(sub_plan.model._default_manager.all())
+                lookups.append(Prefetch(lookup, queryset=related_queryset))
+            else:
+                lookups.append(lookup)
+        lookups += self.prefetch_objects.values()
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset
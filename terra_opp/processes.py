@@ -0,0 +1,21 @@
+"""
+Processes of the pool rendering sheets, see terra_opp.sheets.get_executor.
+Imported by new processes before Django is set up, so without any model.
+"""
+import multiprocessing
+
+import django
+from django.db import connections
+
+
+def get_context():
+    """Start pool processes afresh, instead of forking a server thread"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def init_process():
+    """Set Django up, sheets are rendered without the database"""
+    django.setup()
+    connections.close_all()
@@ -1,7 +1,22 @@
-from django.db.models.signals import post_save
+from datastore.models import RelatedDocument
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 
-from terra_opp.models import Picture
+from terra_opp.facets import refresh_label_facets, refresh_viewpoint_facets
+from terra_opp.geojson import mark_public_collection_stale, refresh_public_features
+from terra_opp.models import Campaign, City, Picture, Theme, Viewpoint
+from terra_opp.photographers import refresh_photographers
+from terra_opp.response_cache import bump_generation
+from terra_opp.search import update_search_vectors
+from terra_opp.signals import last_accepted_pictures_change, state_change
 
 
 @receiver(post_save, sender=Picture)
@@ -9,3 +24,150 @@ def create_picture_identifier(sender, instance, **kwargs):
     if instance.state == sender.ACCEPTED and not instance.identifier:
         instance.identifier = instance.get_identifier()
         instance.save()
+
+
+@receiver(post_delete, sender=Picture)
+def update_last_accepted_picture(sender, instance, **kwargs):
+    # Also sent for pictures deleted by a queryset or a cascade
+    if instance.state == sender.ACCEPTED:
+        Viewpoint.objects.update_last_accepted_pictures(instance.viewpoint_id)
+
+
+@receiver(post_save, sender=Viewpoint)
+def refresh_viewpoint_feature(sender, instance, **kwargs):
+    refresh_public_features(instance.pk)
+
+
+@receiver(last_accepted_pictures_change, sender=Viewpoint)
+def refresh_viewpoints_features(sender, viewpoint_ids, **kwargs):
+    refresh_public_features(*(viewpoint_ids or ()))
+
+
+@receiver(post_delete, sender=Viewpoint)
+def remove_viewpoint_feature(sender, instance, **kwargs):
+    # The feature itself is removed by cascade
+    mark_public_collection_stale()
+
+
+@receiver(post_save, sender=City)
+def refresh_city_features(sender, instance, created, **kwargs):
+    if created:
+        return
+    viewpoint_ids = list(instance.viewpoints.values_list("pk", flat=True))
+    if viewpoint_ids:
+        refresh_public_features(*viewpoint_ids)
+
+
+@receiver(post_save, sender=Viewpoint)
+@receiver(post_delete, sender=Viewpoint)
+@receiver(post_save, sender=Picture)
+@receiver(post_delete, sender=Picture)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=Theme)
+@receiver(post_delete, sender=Theme)
+@receiver(post_save, sender=Campaign)
+@receiver(post_delete, sender=Campaign)
+@receiver(post_save, sender=RelatedDocument)
+@receiver(post_delete, sender=RelatedDocument)
+@receiver(post_delete, sender=get_user_model())
+@receiver(m2m_changed, sender=Viewpoint.themes.through)
+@receiver(m2m_changed, sender=Campaign.viewpoints.through)
+@receiver(state_change)
+@receiver(last_accepted_pictures_change, sender=Viewpoint)
+def invalidate_cached_responses(sender, **kwargs):
+    bump_generation()
+    # Responses computed while the transaction was running may be stale too
+    transaction.on_commit(bump_generation)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_owner_responses(sender, update_fields=None, **kwargs):
+    # Picture owners are rendered, not their logins
+    if update_fields is None or set(update_fields) - {"last_login"}:
+        invalidate_cached_responses(sender, **kwargs)
+
+
+def refresh_viewpoint_indexes(*viewpoint_ids):
+    """Update the facets and the search vectors of the given viewpoints"""
+    refresh_viewpoint_facets(*viewpoint_ids)
+    update_search_vectors(*viewpoint_ids)
+
+
+@receiver(post_save, sender=Viewpoint)
+@receiver(post_delete, sender=Viewpoint)
+def refresh_indexes(sender, instance, **kwargs):
+    refresh_viewpoint_indexes(instance.pk)
+
+
+@receiver(pre_save, sender=Picture)
+def remember_picture_relations(sender, instance, **kwargs):
+    # The previous viewpoint may lose a photographer if the picture is moved, and
+    # the previous owner a picture
+    instance._previous_viewpoint_id = instance._previous_owner_id = None
+    if instance.pk:
+        instance._previous_viewpoint_id, instance._previous_owner_id = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("viewpoint_id", "owner_id")
+            .first()
+        ) or (None, None)
+
+
+@receiver(post_save, sender=Picture)
+def refresh_picture_indexes(sender, instance, **kwargs):
+    viewpoint_ids = {
+        instance.viewpoint_id,
+        getattr(instance, "_previous_viewpoint_id", None),
+    }
+    refresh_viewpoint_indexes(*(viewpoint_ids - {None}))
+
+
+@receiver(post_delete, sender=Picture)
+def refresh_deleted_picture_indexes(sender, instance, **kwargs):
+    refresh_viewpoint_indexes(instance.viewpoint_id)
+
+
+@receiver(post_save, sender=Picture)
+@receiver(post_delete, sender=Picture)
+def refresh_picture_photographers(sender, instance, **kwargs):
+    refresh_photographers(
+        instance.owner_id, getattr(instance, "_previous_owner_id", None)
+    )
+
+
+@receiver(m2m_changed, sender=Viewpoint.themes.through)
+def refresh_themes_indexes(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        viewpoint_ids = [instance.pk]
+    elif action == "pre_clear":
+        instance._cleared_viewpoint_ids = list(
+            instance.viewpoints.values_list("pk", flat=True)
+        )
+        return
+    elif action == "post_clear":
+        viewpoint_ids = instance._cleared_viewpoint_ids
+    else:
+        viewpoint_ids = pk_set
+    if action in ("post_add", "post_remove", "post_clear"):
+        refresh_viewpoint_indexes(*viewpoint_ids)
+
+
+@receiver(pre_delete, sender=City)
+@receiver(pre_delete, sender=Theme)
+def remember_label_viewpoints(sender, instance, **kwargs):
+    # Their viewpoints are updated without signals
+    instance._deleted_viewpoint_ids = list(
+        instance.viewpoints.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=Theme)
+@receiver(post_delete, sender=City)
+@receiver(post_delete, sender=Theme)
+def refresh_labels_indexes(sender, instance, **kwargs):
+    viewpoint_ids = getattr(instance, "_deleted_viewpoint_ids", None)
+    if viewpoint_ids is None:
+        viewpoint_ids = instance.viewpoints.values_list("pk", flat=True)
+    refresh_viewpoint_indexes(*viewpoint_ids)
+    refresh_label_facets()
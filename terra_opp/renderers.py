@@ -1,13 +1,18 @@
+import collections
 import mimetypes
 import os
 import tempfile
+import threading
 import zipfile
 from io import StringIO
-from urllib.parse import urlparse
+from urllib.parse import unquote, urlparse
 
 import weasyprint
+from django.conf import settings
 from django.core.files.storage import default_storage
-from rest_framework import renderers
+from django.utils.module_loading import import_string
+from rest_framework import encoders, renderers
+from rest_framework.settings import api_settings
 from terra_opp.helpers import CustomCsvBuilder
 
 
@@ -24,27 +29,191 @@ class CSVRenderer(renderers.BaseRenderer):
         return csv_file.read()
 
 
+def stream_json(chunks, envelope=None):
+    """
+    Yield a JSON list as bytes, one chunk of items at a time, with the encoding
+    options of JSONRenderer.
+
+    :param chunks: iterable of lists of items
+    :param dict envelope: object to nest the list in, as its last `results` key
+    """
+    encoder = encoders.JSONEncoder(
+        ensure_ascii=not api_settings.UNICODE_JSON,
+        separators=renderers.SHORT_SEPARATORS
+        if api_settings.COMPACT_JSON
+        else renderers.LONG_SEPARATORS,
+    )
+
+    def encode(value):
+        # Same escaping as JSONRenderer, for JavaScript
+        content = encoder.encode(value)
+        return content.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+    prefix, suffix = "[", "]"
+    if envelope is not None:
+        content = encode({**envelope, "results": []})
+        prefix, suffix = content[:-2], content[-2:]
+
+    yield prefix.encode()
+    separator = ""
+    for chunk in chunks:
+        if chunk:
+            yield (separator + ",".join(encode(item) for item in chunk)).encode()
+            separator = ","
+    yield suffix.encode()
+
+
+class ZipSink:
+    """Write-only file keeping what ZipFile wrote since it was last emptied"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def empty(self):
+        content = b"".join(self.chunks)
+        self.chunks.clear()
+        return content
+
+
+def stream_zip(files):
+    """
+    Yield a ZIP archive as bytes, one entry at a time, without a temporary file.
+
+    :param files: iterable of (name, content as bytes)
+    """
+    sink = ZipSink()
+    # As the sink isn't seekable, sizes are written after each entry
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+            yield sink.empty()
+    yield sink.empty()
+
+
+def get_storage_name(url):
+    """Name in the media storage of a file:// URL, as file://pictures/a.jpg"""
+    parsed_url = urlparse(url)
+    return unquote(parsed_url.netloc + parsed_url.path)
+
+
 def django_url_fetcher(url, *args, **kwargs):
     """Helper from django-weasyprint"""
     # load file:// paths directly from disk
     if url.startswith("file:"):
         mime_type, encoding = mimetypes.guess_type(url)
-        parsed_url = urlparse(url)
+        name = get_storage_name(url)
 
         data = {
             "mime_type": mime_type,
             "encoding": encoding,
-            "filename": parsed_url.netloc,
+            "filename": name,
         }
         # try to find in media storage
-        if default_storage.exists(parsed_url.netloc):
-            data["file_obj"] = default_storage.open(parsed_url.netloc)
+        if default_storage.exists(name):
+            data["file_obj"] = default_storage.open(name)
             return data
 
     # fall back to weasyprint default fetcher
     return weasyprint.default_url_fetcher(url, *args, **kwargs)
 
 
+class CachedUrlFetcher:
+    """
+    URL fetcher keeping the content of media files in memory, by storage name
+    and modification time, up to TROPP_URL_FETCHER_CACHE_SIZE bytes. The least
+    recently used files are dropped first.
+
+    Cached files cost a single storage request, for their modification time.
+    """
+
+    def __init__(self):
+        self._files = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, url, *args, **kwargs):
+        if not url.startswith("file:"):
+            return weasyprint.default_url_fetcher(url, *args, **kwargs)
+
+        name = get_storage_name(url)
+        try:
+            key = (name, default_storage.get_modified_time(name))
+        except NotImplementedError:
+            return django_url_fetcher(url, *args, **kwargs)
+        except OSError:
+            # Not in the media storage
+            return weasyprint.default_url_fetcher(url, *args, **kwargs)
+
+        content = self.get(key)
+        if content is None:
+            with default_storage.open(name) as f:
+                content = f.read()
+            self.set(key, content)
+
+        mime_type, encoding = mimetypes.guess_type(url)
+        return {
+            "string": content,
+            "mime_type": mime_type,
+            "encoding": encoding,
+            "filename": name,
+        }
+
+    def get(self, key):
+        with self._lock:
+            content = self._files.get(key)
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._files.move_to_end(key)
+            return content
+
+    def set(self, key, content):
+        max_size = settings.TROPP_URL_FETCHER_CACHE_SIZE
+        if len(content) > max_size:
+            return
+        with self._lock:
+            if key in self._files:
+                return
+            self._files[key] = content
+            self.size += len(content)
+            while self.size > max_size:
+                _, dropped = self._files.popitem(last=False)
+                self.size -= len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self.size = self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared by the renders of the current process
+cached_url_fetcher = CachedUrlFetcher()
+
+
+def get_url_fetcher():
+    """URL fetcher of weasyprint selected by TROPP_URL_FETCHER"""
+    return import_string(settings.TROPP_URL_FETCHER)
+
+
 def write_pdf(request, html):
     """
     Function used to write pdf from html
@@ -52,12 +221,20 @@ def write_pdf(request, html):
     :param html: HTML string
     :return: pdf as bytes
     """
-    base_url = request.build_absolute_uri("/")
+    return render_pdf(html, request.build_absolute_uri("/"))
+
 
+def render_pdf(html, base_url):
+    """
+    Write pdf from html outside of a request
+    :param html: HTML string
+    :param base_url: URL of the site relative URLs of the HTML are resolved to
+    :return: pdf as bytes
+    """
     return weasyprint.HTML(
         string=html,
         base_url=base_url,
-        url_fetcher=django_url_fetcher,
+        url_fetcher=get_url_fetcher(),
     ).write_pdf()
 
 
@@ -94,3 +271,8 @@ class ZipRenderer(renderers.JSONRenderer):
                 tmp.seek(0)
                 return tmp.read()
         return super(ZipRenderer, self).render(data, media_type, renderer_context)
+
+
+class GeoJSONRenderer(renderers.JSONRenderer):
+    media_type = "application/geo+json"
+    format = "geojson"
@@ -0,0 +1,150 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import get_language
+from rest_framework import status
+from rest_framework.response import Response
+
+GENERATION_KEY = "terra_opp:responses:generation"
+MODIFIED_KEY = "terra_opp:responses:modified"
+LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.05
+
+
+def is_cache_shared():
+    """
+    Whether the default cache is shared by all the processes serving requests,
+    so that bump_generation reaches them all. Guessed from its backend unless
+    TROPP_RESPONSE_CACHE_SHARED is set.
+    """
+    shared = settings.TROPP_RESPONSE_CACHE_SHARED
+    if shared is None:
+        return not isinstance(caches[DEFAULT_CACHE_ALIAS], (DummyCache, LocMemCache))
+    return shared
+
+
+def _new_generation():
+    # Never reuse generations of entries which may still be cached
+    return int(time.time() * 1000)
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _new_generation(), None)
+        generation = cache.get(GENERATION_KEY, _new_generation())
+    return generation
+
+
+def bump_generation():
+    """Invalidate all cached responses"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, _new_generation(), None)
+    cache.set(MODIFIED_KEY, time.time(), None)
+
+
+def get_validators():
+    """
+    Current generation and timestamp of the last change of responses data, or
+    None when the cache isn't shared or doesn't keep them.
+    """
+    if not is_cache_shared():
+        return None
+    validators = cache.get_many([GENERATION_KEY, MODIFIED_KEY])
+    if len(validators) < 2:
+        get_generation()
+        cache.add(MODIFIED_KEY, time.time(), None)
+        validators = cache.get_many([GENERATION_KEY, MODIFIED_KEY])
+        if len(validators) < 2:
+            return None
+    return validators[GENERATION_KEY], validators[MODIFIED_KEY]
+
+
+def get_response_key(request, name):
+    params = sorted(
+        (key, sorted(values)) for key, values in request.query_params.lists()
+    )
+    parts = [
+        # Responses link to other pages and files by absolute URLs
+        request.scheme,
+        request.get_host(),
+        getattr(request.accepted_renderer, "format", ""),
+        get_language() or "",
+        repr(params),
+    ]
+    digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+    return f"terra_opp:responses:{get_generation()}:{name}:{digest}"
+
+
+def get_or_compute(key, compute, timeout):
+    """
+    Return the cached value of `key`, or the result of `compute` which is cached
+    unless it is None. Only one process computes a missing key at a time, the
+    others wait for its result.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if time.monotonic() > deadline:
+            # The lock holder is too slow or died
+            return compute()
+
+    try:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def cache_anonymous_response(name):
+    """
+    Cache the data of successful responses of a viewset action for anonymous
+    users, until the next bump_generation or TROPP_RESPONSE_CACHE_TIMEOUT. Only
+    when the cache is shared, as other processes would serve stale responses.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            timeout = settings.TROPP_RESPONSE_CACHE_TIMEOUT
+            if request.user.is_authenticated or not timeout or not is_cache_shared():
+                return func(view, request, *args, **kwargs)
+
+            response = None
+
+            def compute():
+                nonlocal response
+                response = func(view, request, *args, **kwargs)
+                # Streamed responses are not cached
+                if (
+                    isinstance(response, Response)
+                    and response.status_code == status.HTTP_200_OK
+                ):
+                    return response.data
+
+            data = get_or_compute(get_response_key(request, name), compute, timeout)
+            if response is not None:
+                # Computed by this request
+                return response
+            return Response(data)
+
+        return wrapper
+
+    return decorator
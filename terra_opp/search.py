@@ -0,0 +1,69 @@
+import operator
+from functools import reduce
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db.models import TextField, Value
+
+
+def get_viewpoint_document(viewpoint):
+    """Return the texts to search a viewpoint on, by weight"""
+    properties = []
+    for field in settings.TROPP_SEARCHABLE_PROPERTIES.values():
+        value = viewpoint.properties.get(field["json_key"])
+        if isinstance(value, list):
+            properties.extend(str(item) for item in value if item is not None)
+        elif value is not None:
+            properties.append(str(value))
+
+    return {
+        "A": [viewpoint.label],
+        "B": [
+            *([viewpoint.city.label] if viewpoint.city else []),
+            *(theme.label for theme in viewpoint.themes.all()),
+        ],
+        "C": properties,
+        "D": [picture.identifier for picture in viewpoint.pictures.all()],
+    }
+
+
+def get_search_vector(viewpoint):
+    vectors = [
+        SearchVector(
+            Value(" ".join(texts), output_field=TextField()),
+            config=settings.TROPP_SEARCH_CONFIG,
+            weight=weight,
+        )
+        for weight, texts in get_viewpoint_document(viewpoint).items()
+        if any(texts)
+    ]
+    if not vectors:
+        return None
+    return reduce(operator.add, vectors)
+
+
+def _update_search_vectors(apps, viewpoint_ids, chunk_size=500):
+    Viewpoint = apps.get_model("terra_opp", "Viewpoint")
+    queryset = Viewpoint.objects.select_related("city").prefetch_related(
+        "themes", "pictures"
+    )
+    viewpoint_ids = list(viewpoint_ids)
+    # By chunks, as prefetching isn't done by iterator()
+    for start in range(0, len(viewpoint_ids), chunk_size):
+        chunk = viewpoint_ids[start : start + chunk_size]
+        for viewpoint in queryset.filter(pk__in=chunk):
+            Viewpoint.objects.filter(pk=viewpoint.pk).update(
+                search_vector=get_search_vector(viewpoint)
+            )
+
+
+def update_search_vectors(*viewpoint_ids):
+    """Compute again the search vectors of the given viewpoints"""
+    _update_search_vectors(global_apps, set(viewpoint_ids) - {None})
+
+
+def rebuild_search_vectors(apps=global_apps):
+    """Compute again the search vectors of all viewpoints"""
+    Viewpoint = apps.get_model("terra_opp", "Viewpoint")
+    _update_search_vectors(apps, Viewpoint.objects.values_list("pk", flat=True))
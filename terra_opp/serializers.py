@@ -4,6 +4,7 @@ from django.conf import settings
 from django.db import transaction
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
+from django.urls import reverse
 from geostore import GeometryTypes
 from geostore.models import Feature, Layer
 from rest_framework import serializers, fields
@@ -13,7 +14,15 @@ from datastore.serializers import RelatedDocumentUrlSerializer
 from datastore.fields import FileBase64UrlField
 from versatileimagefield.serializers import VersatileImageFieldSerializer
 
-from .models import Campaign, City, Picture, Theme, Viewpoint
+from .models import (
+    Campaign,
+    City,
+    PdfJob,
+    Photographer,
+    Picture,
+    Theme,
+    Viewpoint,
+)
 
 UserModel = get_user_model()
 
@@ -124,6 +133,61 @@ class PhotographSerializer(serializers.ModelSerializer):
         )
 
 
+class PhotographerSerializer(serializers.ModelSerializer):
+    user = PhotographSerializer(read_only=True)
+
+    class Meta:
+        model = Photographer
+        fields = (
+            "user",
+            "pictures_count",
+            "first_picture_date",
+            "last_picture_date",
+        )
+
+
+class VisibleViewpointField(serializers.PrimaryKeyRelatedField):
+    """Viewpoints the user can see, as ViewpointViewSet"""
+
+    def get_queryset(self):
+        request = self.context.get("request")
+        if request is not None and request.user.is_authenticated:
+            return Viewpoint.objects.all()
+        return Viewpoint.objects.with_accepted_pictures().filter(active=True)
+
+
+class PdfJobSerializer(serializers.ModelSerializer):
+    viewpoint = VisibleViewpointField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PdfJob
+        fields = (
+            "id",
+            "viewpoint",
+            "state",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        )
+        read_only_fields = (
+            "state",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+
+    def get_download_url(self, obj):
+        if obj.state != PdfJob.DONE:
+            return None
+        return self.context["request"].build_absolute_uri(
+            reverse("terra_opp:pdf-job-download", args=[obj.pk])
+        )
+
+
 class PictureSerializer(serializers.ModelSerializer):
     owner_id = serializers.PrimaryKeyRelatedField(
         source="owner",
@@ -248,6 +312,7 @@ class ViewpointSerializerWithPicture(serializers.ModelSerializer):
         if "pictures" in validated_data:
             picture_ids = [p.pk for p in validated_data["pictures"]]
             instance.pictures.exclude(pk__in=picture_ids).delete()
+            instance.refresh_from_db(fields=Viewpoint.DENORMALIZED_FIELDS)
 
         related_docs = validated_data.pop("related", None)
         self.handle_related_documents(instance, related_docs)
@@ -1,4 +1,6 @@
 TROPP_URL_FETCHER = "terra_opp.renderers.django_url_fetcher"
+# Bytes of media files kept in memory by terra_opp.renderers.cached_url_fetcher
+TROPP_URL_FETCHER_CACHE_SIZE = 64 * 1024 * 1024
 
 TROPP_PICTURES_STATES_WORKFLOW = False
 
@@ -23,6 +25,47 @@ TROPP_SEARCHABLE_PROPERTIES = {
     },
 }
 
+# Whether the default cache is shared by all server processes, which conditional
+# requests need. None guesses it from the backend: not with locmem and dummy ones.
+TROPP_RESPONSE_CACHE_SHARED = None
+
+# Seconds to cache viewpoint listings and filters for anonymous users, 0 disables it
+TROPP_RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Text search configuration of viewpoints, terra_opp_french or terra_opp_english
+# ignore accents. Run opp_rebuild_search_vectors after changing it.
+TROPP_SEARCH_CONFIG = "terra_opp_french"
+
+# Report the queries of API actions in a Server-Timing header and in the logs
+TROPP_QUERY_INSTRUMENTATION = False
+
+# JSON listings with larger pages, or not paginated, are streamed
+TROPP_STREAMING_PAGE_SIZE = 1000
+
+# Processes rendering the PDF sheets of campaigns, shared by the requests of a
+# server process. None for the number of CPUs, 0 to render in the request process
+TROPP_PDF_PROCESSES = None
+# Sheets of a single request rendered at the same time
+TROPP_PDF_REQUEST_CONCURRENCY = 4
+
+# Keep PDF sheets in the media storage, rendered again only when their viewpoint,
+# pictures, template or stylesheet change
+TROPP_PDF_CACHE = True
+TROPP_PDF_CACHE_PATH = "pdf_sheets/"
+
+# Resolution of the pictures of PDF sheets, resized once from the originals which
+# are used with 0
+TROPP_PDF_IMAGE_DPI = 200
+
+# Seconds before a PDF job still running is given to another worker, and seconds
+# PDF jobs and their file are kept once finished
+TROPP_PDF_JOB_TIMEOUT = 10 * 60
+TROPP_PDF_JOB_EXPIRATION = 24 * 60 * 60
+# Renders of a PDF job, when its worker died or it failed
+TROPP_PDF_JOB_MAX_ATTEMPTS = 3
+# PDF jobs a user, or an anonymous IP address, can queue, None for no limit
+TROPP_PDF_JOB_THROTTLE_RATE = "30/hour"
+
 # Create a geostore layer and provide its Primary Key here
 TROPP_OBSERVATORY_LAYER_PK = None
 TROPP_OBSERVATORY_ID = None
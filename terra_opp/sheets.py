@@ -0,0 +1,422 @@
+import atexit
+import collections
+import functools
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import weasyprint
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import loader
+from django.utils import translation
+from django.utils.functional import cached_property
+
+try:
+    from weasyprint.text.fonts import FontConfiguration
+except ImportError:  # weasyprint releases < 53
+    from weasyprint.fonts import FontConfiguration
+
+from .models import Picture
+from .processes import get_context, init_process
+from .renderers import get_url_fetcher
+
+SHEET_TEMPLATE = "terra_opp/viewpoint_pdf.html"
+BOOKLET_TEMPLATE = "terra_opp/campaign_booklet.html"
+# Templates sheets are rendered with, for their cache
+SHEET_TEMPLATES = (SHEET_TEMPLATE, BOOKLET_TEMPLATE, "terra_opp/viewpoint_sheet.html")
+SHEET_STYLESHEET = "terra_opp/viewpoint_pdf.css"
+# Change to render again every cached sheet, when the rendering itself changes
+SHEET_CACHE_VERSION = 3
+# Box of sheet pictures in CSS pixels, see .viewpoint-picture in the stylesheet:
+# the width of an A4 page within weasyprint default margins, and the max-height
+PICTURE_BOX = (644, 300)
+
+_executor = None
+_executor_size = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_sheet_template():
+    return loader.get_template(SHEET_TEMPLATE)
+
+
+def get_rendition_size():
+    """Size of sheet pictures in pixels at TROPP_PDF_IMAGE_DPI, as WIDTHxHEIGHT"""
+    scale = settings.TROPP_PDF_IMAGE_DPI / 96
+    width, height = (math.ceil(length * scale) for length in PICTURE_BOX)
+    return f"{width}x{height}"
+
+
+def get_picture_rendition(picture):
+    """
+    Storage name of the picture resized for sheets, created once in the storage.
+    Originals are used when the rendition can't be made or is disabled.
+    """
+    if picture is None:
+        return ""
+    if not settings.TROPP_PDF_IMAGE_DPI:
+        return picture.file.name
+    image = picture.file
+    image.create_on_demand = True
+    try:
+        return image.thumbnail[get_rendition_size()].name
+    except (OSError, ValueError):
+        return picture.file.name
+
+
+def get_sheet_pictures(viewpoint):
+    """Earliest and latest pictures of a viewpoint shown by its sheet, or None"""
+    pictures = []
+    for method in ("earliest", "latest"):
+        try:
+            pictures.append(getattr(viewpoint.pictures, method)())
+        except Picture.DoesNotExist:
+            pictures.append(None)
+    return pictures
+
+
+def get_sheets_pictures(viewpoints):
+    """
+    Earliest and latest pictures of the sheets of viewpoints by pk, in a query
+    each instead of two by viewpoint
+    """
+    pictures = {viewpoint.pk: [None, None] for viewpoint in viewpoints}
+    for index, order in enumerate(("date", "-date")):
+        queryset = (
+            Picture.objects.filter(viewpoint_id__in=pictures)
+            .order_by("viewpoint_id", order)
+            .distinct("viewpoint_id")
+        )
+        for picture in queryset:
+            pictures[picture.viewpoint_id][index] = picture
+    return pictures
+
+
+def get_sheet_context(viewpoint, pictures=None):
+    earliest, latest = pictures or get_sheet_pictures(viewpoint)
+    return {
+        "viewpoint": viewpoint,
+        "properties_set": settings.TROPP_VIEWPOINT_PROPERTIES_SET["pdf"],
+        "earliest_picture": get_picture_rendition(earliest),
+        "latest_picture": get_picture_rendition(latest),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def read_stylesheet():
+    """Content of the stylesheet of sheets, read once by process"""
+    path = finders.find(SHEET_STYLESHEET)
+    if path:
+        with open(path, "rb") as f:
+            return f.read().decode()
+    with staticfiles_storage.open(SHEET_STYLESHEET) as f:
+        return f.read().decode()
+
+
+@functools.lru_cache(maxsize=None)
+def get_sheet_version():
+    """Digest of the templates and the stylesheet of sheets, read once by process"""
+    digest = hashlib.sha256(str(SHEET_CACHE_VERSION).encode())
+    for name in SHEET_TEMPLATES:
+        digest.update(loader.get_template(name).template.source.encode())
+    digest.update(read_stylesheet().encode())
+    return digest.hexdigest()
+
+
+class SheetRenderer:
+    """
+    Render sheets with their template loaded once, and their stylesheet parsed
+    once with the fonts it uses, instead of fetching and parsing the stylesheet
+    linked by each sheet.
+
+    The stylesheet is parsed on first use, in the process writing PDFs.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.template = get_sheet_template()
+
+    @cached_property
+    def booklet_template(self):
+        return loader.get_template(BOOKLET_TEMPLATE)
+
+    @cached_property
+    def font_config(self):
+        return FontConfiguration()
+
+    @cached_property
+    def stylesheet(self):
+        return weasyprint.CSS(
+            string=read_stylesheet(),
+            base_url=self.base_url,
+            url_fetcher=get_url_fetcher(),
+            font_config=self.font_config,
+        )
+
+    def render_html(self, viewpoint, pictures=None):
+        context = get_sheet_context(viewpoint, pictures)
+        return self.template.render({**context, "stylesheet_preloaded": True})
+
+    def render_booklet_html(self, campaign, viewpoints, pictures=None):
+        """
+        HTML of the sheets of all viewpoints, each starting a new page, with
+        their pictures given by get_sheets_pictures
+        """
+        viewpoints = list(viewpoints)
+        if pictures is None:
+            pictures = get_sheets_pictures(viewpoints)
+        sheets = [
+            get_sheet_context(viewpoint, pictures[viewpoint.pk])
+            for viewpoint in viewpoints
+        ]
+        return self.booklet_template.render(
+            {
+                "campaign": campaign,
+                "sheets": sheets,
+                "properties_set": settings.TROPP_VIEWPOINT_PROPERTIES_SET["pdf"],
+                "stylesheet_preloaded": True,
+            }
+        )
+
+    def write_pdf(self, html):
+        """:return: the pdf of HTML rendered by render_html, as bytes"""
+        return weasyprint.HTML(
+            string=html,
+            base_url=self.base_url,
+            url_fetcher=get_url_fetcher(),
+        ).write_pdf(stylesheets=[self.stylesheet], font_config=self.font_config)
+
+
+@functools.lru_cache(maxsize=8)
+def get_sheet_renderer(base_url):
+    """Renderer shared by the sheets of a site rendered by the current process"""
+    return SheetRenderer(base_url)
+
+
+def render_sheet_pdf(html, base_url):
+    """Render the pdf of a sheet, in a process of the pool or the current one"""
+    return get_sheet_renderer(base_url).write_pdf(html)
+
+
+def get_picture_key(picture):
+    if picture is None:
+        return None
+    return [picture.pk, picture.file.name, picture.updated_at.isoformat()]
+
+
+def get_sheet_digest(viewpoint, pictures=None):
+    """Digest of everything the sheet of a viewpoint is rendered from"""
+    earliest, latest = pictures or get_sheet_pictures(viewpoint)
+    inputs = {
+        "viewpoint": [viewpoint.pk, viewpoint.label, viewpoint.properties],
+        "earliest": get_picture_key(earliest),
+        "latest": get_picture_key(latest),
+        # Sets are iterated in an order depending on the hash seed of the process
+        "properties_set": sorted(settings.TROPP_VIEWPOINT_PROPERTIES_SET["pdf"]),
+        "image_dpi": settings.TROPP_PDF_IMAGE_DPI,
+        "language": translation.get_language(),
+        "version": get_sheet_version(),
+    }
+    content = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_sheet_directory(key):
+    return f"{settings.TROPP_PDF_CACHE_PATH}{key}/"
+
+
+def get_sheet_name(key, digest):
+    return f"{get_sheet_directory(key)}{digest}.pdf"
+
+
+def get_cached_sheet(key, digest):
+    """Content of the cached sheet, or None"""
+    name = get_sheet_name(key, digest)
+    if not settings.TROPP_PDF_CACHE or not default_storage.exists(name):
+        return None
+    with default_storage.open(name) as f:
+        return f.read()
+
+
+def store_sheet(key, digest, content):
+    """
+    Save a rendered sheet in the cache, removing the previous ones with the
+    same key, kept in its own directory
+    """
+    if not settings.TROPP_PDF_CACHE:
+        return
+    name = get_sheet_name(key, digest)
+    if default_storage.exists(name):
+        # Rendered by another request in the meantime
+        return
+    default_storage.save(name, ContentFile(content))
+    directory = get_sheet_directory(key)
+    try:
+        _, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for filename in files:
+        path = f"{directory}{filename}"
+        if path != name:
+            default_storage.delete(path)
+
+
+def render_sheet(viewpoint, base_url):
+    """PDF sheet of a viewpoint, rendered when it isn't cached yet"""
+    pictures = get_sheet_pictures(viewpoint)
+    digest = get_sheet_digest(viewpoint, pictures)
+    key = f"viewpoint_{viewpoint.pk}"
+    content = get_cached_sheet(key, digest)
+    if content is None:
+        renderer = get_sheet_renderer(base_url)
+        content = renderer.write_pdf(renderer.render_html(viewpoint, pictures))
+        store_sheet(key, digest, content)
+    return content
+
+
+def render_booklet(campaign, base_url):
+    """
+    Single PDF of the sheets of the viewpoints of a campaign, laid out at once
+    with their fonts and styles shared. Cached as long as none of its sheets
+    changes.
+    """
+    viewpoints = list(campaign.viewpoints.all())
+    pictures = get_sheets_pictures(viewpoints)
+    digest = hashlib.sha256(campaign.label.encode())
+    for viewpoint in viewpoints:
+        digest.update(get_sheet_digest(viewpoint, pictures[viewpoint.pk]).encode())
+    digest = digest.hexdigest()
+
+    key = f"campaign_{campaign.pk}"
+    content = get_cached_sheet(key, digest)
+    if content is None:
+        renderer = get_sheet_renderer(base_url)
+        html = renderer.render_booklet_html(campaign, viewpoints, pictures)
+        content = renderer.write_pdf(html)
+        store_sheet(key, digest, content)
+    return content
+
+
+def get_pool_size():
+    if settings.TROPP_PDF_PROCESSES is None:
+        return os.cpu_count() or 1
+    return settings.TROPP_PDF_PROCESSES
+
+
+def create_executor(size):
+    if sys.version_info < (3, 7):
+        # Neither start methods nor initializers, processes are forked
+        return ProcessPoolExecutor(max_workers=size)
+    return ProcessPoolExecutor(
+        max_workers=size, mp_context=get_context(), initializer=init_process
+    )
+
+
+def get_executor():
+    """
+    Pool of processes rendering sheets, shared by the requests of the current
+    process. None when sheets are rendered in the current process.
+
+    Processes are started afresh, with Django set up again, so that they don't
+    inherit the connections of the server nor the locks held by its threads.
+    """
+    global _executor, _executor_size, _executor_pid
+
+    size = get_pool_size()
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            # Created by the parent of a forked server process
+            _executor = None
+        if _executor is not None and _executor_size != size:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _executor is None and size > 0:
+            _executor = create_executor(size)
+            _executor_size = size
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def start_executor():
+    """Create the pool when the server starts, not in processes of the pool"""
+    if multiprocessing.current_process().name == "MainProcess":
+        get_executor()
+
+
+@atexit.register
+def shutdown_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def render_sheets(viewpoints, base_url):
+    """
+    Yield the viewpoints with their PDF sheet, in order.
+
+    Cached sheets are read from the storage. Otherwise HTML is rendered here, as
+    it needs the database, then weasyprint runs in the processes of the pool. At
+    most TROPP_PDF_REQUEST_CONCURRENCY sheets of a call are rendered at the same
+    time, so other requests get their turn.
+    """
+    renderer = get_sheet_renderer(base_url)
+
+    def get_documents():
+        for viewpoint in viewpoints:
+            pictures = get_sheet_pictures(viewpoint)
+            digest = get_sheet_digest(viewpoint, pictures)
+            content = get_cached_sheet(f"viewpoint_{viewpoint.pk}", digest)
+            html = None
+            if content is None:
+                html = renderer.render_html(viewpoint, pictures)
+            yield viewpoint, digest, content, html
+
+    def collect(viewpoint, digest, result):
+        if isinstance(result, bytes):
+            return viewpoint, result
+        content = result.result()
+        store_sheet(f"viewpoint_{viewpoint.pk}", digest, content)
+        return viewpoint, content
+
+    executor = get_executor()
+    if executor is None:
+        for viewpoint, digest, content, html in get_documents():
+            if content is None:
+                content = renderer.write_pdf(html)
+                store_sheet(f"viewpoint_{viewpoint.pk}", digest, content)
+            yield viewpoint, content
+        return
+
+    concurrency = max(settings.TROPP_PDF_REQUEST_CONCURRENCY, 1)
+    pending = collections.deque()
+    try:
+        for viewpoint, digest, content, html in get_documents():
+            if content is None:
+                content = executor.submit(render_sheet_pdf, html, base_url)
+            pending.append((viewpoint, digest, content))
+            if len(pending) >= concurrency:
+                yield collect(*pending.popleft())
+        while pending:
+            yield collect(*pending.popleft())
+    except BrokenProcessPool:
+        # A process died, the next call starts a new pool
+        shutdown_executor()
+        raise
+    finally:
+        for viewpoint, digest, result in pending:
+            if not isinstance(result, bytes):
+                result.cancel()
@@ -1,3 +1,6 @@
 import django.dispatch
 
 state_change = django.dispatch.Signal()
+
+# Sent with the viewpoint ids, or None when all viewpoints have been updated
+last_accepted_pictures_change = django.dispatch.Signal()
@@ -1,5 +1,9 @@
+from contextlib import contextmanager
+
 from django.contrib.auth.models import Permission
 
+from terra_opp.instrumentation import QueryRecorder
+
 
 class TestPermissionsMixin:
     def _clean_permissions(self):
@@ -19,3 +23,24 @@ class TestPermissionsMixin:
         for cache in ["_user_perm_cache", "_perm_cache"]:
             if hasattr(self.user, cache):
                 delattr(self.user, cache)
+
+
+class QueryBudgetTestMixin:
+    @contextmanager
+    def assertQueryBudget(self, viewset, action):
+        """Fail when the block runs more queries than the budget of the action"""
+        budget = viewset.query_budgets.get(action)
+        if budget is None:
+            self.fail(f"{viewset.__name__} declares no query budget for {action}")
+
+        with QueryRecorder() as recorder:
+            yield recorder
+        if len(recorder) > budget:
+            queries = "\n".join(sql for sql, duration in recorder.queries)
+            repeated = "\n".join(
+                f"{count} times: {sql}" for sql, count in recorder.repeated.items()
+            )
+            self.fail(
+                f"{viewset.__name__}.{action} ran {len(recorder)} queries, over its "
+                f"budget of {budget}:\n{queries}\nRepeated:\n{repeated}"
+            )
@@ -1,3 +1,6 @@
+import json
+import tempfile
+
 from django.core.management import call_command
 from django.test import TestCase, override_settings
 from io import StringIO
@@ -5,6 +8,19 @@ from io import StringIO
 from geostore import GeometryTypes
 from geostore.models import Layer
 
+from terra_accounts.tests.factories import TerraUserFactory
+
+from terra_opp.models import (
+    Campaign,
+    Photographer,
+    Picture,
+    PublicViewpointFeature,
+    Viewpoint,
+    ViewpointFacet,
+    ViewpointFacetEntry,
+)
+from terra_opp.tests.factories import CityFactory, ViewpointFactory
+
 
 class CreateDefaultObservatoryLayerTEstCase(TestCase):
     @override_settings(TROPP_OBSERVATORY_LAYER_PK=None)
@@ -49,3 +65,91 @@ class CreateDefaultObservatoryLayerTEstCase(TestCase):
         with override_settings(TROPP_OBSERVATORY_LAYER_PK=layer.pk):
             call_command("create_observatory_layer", name="test", stdout=out)
             self.assertIn("A layer already exists", out.getvalue())
+
+
+class UpdateLastPicturesTestCase(TestCase):
+    def test_update_last_pictures(self):
+        viewpoint = ViewpointFactory(pictures__state="accepted")
+        picture = viewpoint.pictures.get()
+        Viewpoint.objects.update(last_accepted_picture=None)
+
+        out = StringIO()
+        call_command("opp_update_last_pictures", stdout=out)
+        self.assertIn("1 viewpoint(s) have been updated", out.getvalue())
+        viewpoint.refresh_from_db()
+        self.assertEqual(picture, viewpoint.last_accepted_picture)
+
+
+class RebuildPublicGeoJSONTestCase(TestCase):
+    def test_rebuild_public_geojson(self):
+        viewpoint = ViewpointFactory(active=True, pictures__state="accepted")
+        PublicViewpointFeature.objects.all().delete()
+
+        out = StringIO()
+        call_command("opp_rebuild_public_geojson", stdout=out)
+        self.assertIn("Public GeoJSON has been rebuilt", out.getvalue())
+        self.assertTrue(
+            PublicViewpointFeature.objects.filter(viewpoint=viewpoint).exists()
+        )
+
+
+class RebuildFacetsTestCase(TestCase):
+    def test_rebuild_facets(self):
+        ViewpointFactory(city=CityFactory(label="Marseille"))
+        ViewpointFacet.objects.all().delete()
+        ViewpointFacetEntry.objects.all().delete()
+
+        out = StringIO()
+        call_command("opp_rebuild_facets", stdout=out)
+        self.assertIn("Viewpoint facets have been rebuilt", out.getvalue())
+        self.assertEqual(
+            1, ViewpointFacet.objects.get(facet="cities", value="Marseille").count
+        )
+
+
+class GenerateDatasetTestCase(TestCase):
+    def test_generate_dataset(self):
+        out = StringIO()
+        call_command(
+            "opp_generate_dataset",
+            viewpoints=12,
+            pictures_per_viewpoint=3,
+            campaigns=2,
+            campaign_size=5,
+            photographers=2,
+            batch_size=5,
+            stdout=out,
+        )
+        self.assertIn("Dataset has been created", out.getvalue())
+        self.assertEqual(12, Viewpoint.objects.count())
+        self.assertEqual(36, Picture.objects.count())
+        self.assertEqual(2, Campaign.objects.count())
+        self.assertEqual(5, Campaign.objects.first().viewpoints.count())
+        # Denormalized data is rebuilt
+        self.assertTrue(ViewpointFacet.objects.filter(facet="cities").exists())
+        self.assertFalse(Viewpoint.objects.filter(search_vector=None).exists())
+        self.assertEqual(36, sum(p.pictures_count for p in Photographer.objects.all()))
+
+
+class BenchmarkTestCase(TestCase):
+    def test_benchmark(self):
+        TerraUserFactory(is_superuser=True)
+        ViewpointFactory(pictures__state="accepted")
+
+        with tempfile.NamedTemporaryFile(mode="r", suffix=".json") as output:
+            out = StringIO()
+            call_command(
+                "opp_benchmark",
+                repeat=2,
+                only=["viewpoints list", "viewpoint detail"],
+                output=output.name,
+                stdout=out,
+            )
+            results = json.load(output)
+
+        self.assertIn("viewpoint detail", out.getvalue())
+        self.assertEqual(
+            {"viewpoints list", "viewpoint detail"}, set(results["endpoints"])
+        )
+        self.assertEqual(200, results["endpoints"]["viewpoint detail"]["status"])
+        self.assertEqual(1, results["dataset"]["viewpoints"])
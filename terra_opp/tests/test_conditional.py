@@ -0,0 +1,188 @@
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.tests.factories import (
+    CampaignFactory,
+    CityFactory,
+    PictureFactory,
+    ViewpointFactory,
+)
+from terra_opp.tests.mixins import TestPermissionsMixin
+
+DUMMY_CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+# Tests are served by a single process
+@override_settings(CACHES=LOCMEM_CACHES, TROPP_RESPONSE_CACHE_SHARED=True)
+class ConditionalGetTestCase(APITestCase, TestPermissionsMixin):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TerraUserFactory()
+        cls.viewpoint = ViewpointFactory(active=True, pictures__state="accepted")
+        ViewpointFactory(active=True, pictures__state="accepted")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def assertNotModified(self, url, response, **extra):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"], **extra)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        self.assertEqual(b"", response.content)
+        return response
+
+    def test_list_not_modified(self):
+        url = reverse("terra_opp:viewpoint-list")
+        response = self.client.get(url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIn("ETag", response)
+        # Listings can not tell about removed rows
+        self.assertNotIn("Last-Modified", response)
+
+        # Answered from the cache only
+        with self.assertNumQueries(0):
+            self.assertNotModified(url, response)
+
+    def test_list_modified(self):
+        url = reverse("terra_opp:viewpoint-list")
+        etag = self.client.get(url)["ETag"]
+
+        self.viewpoint.label = "Changed"
+        self.viewpoint.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
+        etag = response["ETag"]
+        self.viewpoint.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_list_follows_relations(self):
+        url = reverse("terra_opp:viewpoint-list")
+        etag = self.client.get(url)["ETag"]
+
+        PictureFactory(viewpoint=self.viewpoint)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+        etag = response["ETag"]
+        self.viewpoint.city.label = "Renamed"
+        self.viewpoint.city.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_retrieve_follows_rendered_objects(self):
+        url = reverse("terra_opp:viewpoint-detail", args=[self.viewpoint.pk])
+        owner = self.viewpoint.pictures.get().owner
+        changes = [
+            lambda: self.viewpoint.related.create(
+                key="croquis",
+                properties={},
+                document=ContentFile(b"croquis", name="croquis.txt"),
+            ),
+            lambda: owner.save(),
+            lambda: CampaignFactory().viewpoints.add(self.viewpoint),
+        ]
+        for change in changes:
+            etag = self.client.get(url)["ETag"]
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+        # Logins don't change responses
+        response = self.client.get(url)
+        owner.save(update_fields=["last_login"])
+        self.assertNotModified(url, response)
+
+    def test_etag_depends_on_query_and_user(self):
+        url = reverse("terra_opp:viewpoint-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(etag, self.client.get(url, {"search": "foo"})["ETag"])
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_retrieve_last_modified(self):
+        url = reverse("terra_opp:viewpoint-detail", args=[self.viewpoint.pk])
+        response = self.client.get(url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIn("Last-Modified", response)
+        # The viewpoint is only fetched to check it exists
+        with self.assertNumQueries(1):
+            self.assertNotModified(url, response)
+
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_retrieve_not_found(self):
+        url = reverse("terra_opp:viewpoint-detail", args=[0])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_other_viewsets(self):
+        self._set_permissions(["can_manage_campaigns"])
+        campaign = CampaignFactory()
+        campaign.viewpoints.add(self.viewpoint)
+        city = CityFactory(label="City")
+        picture = self.viewpoint.pictures.get()
+        urls = [
+            reverse("terra_opp:picture-list"),
+            reverse("terra_opp:picture-detail", args=[picture.pk]),
+            reverse("terra_opp:campaign-list"),
+            reverse("terra_opp:campaign-detail", args=[campaign.pk]),
+            reverse("terra_opp:city-list"),
+            reverse("terra_opp:city-detail", args=[city.pk]),
+            reverse("terra_opp:theme-list"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(status.HTTP_200_OK, response.status_code)
+                self.assertNotModified(url, response)
+
+    def test_not_modified_checks_object_permissions(self):
+        self._set_permissions(["can_manage_campaigns", "can_add_pictures"])
+        campaign = CampaignFactory(state="started")
+        url = reverse("terra_opp:campaign-detail", args=[campaign.pk])
+        response = self.client.get(url)
+        self.assertNotModified(url, response)
+
+        # Photographers only see their own campaigns
+        self._clean_permissions()
+        self._set_permissions(["can_add_pictures"])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+    @override_settings(CACHES=DUMMY_CACHES)
+    def test_without_cache(self):
+        url = reverse("terra_opp:viewpoint-list")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertNotIn("ETag", response)
+
+    @override_settings(TROPP_RESPONSE_CACHE_SHARED=None)
+    def test_without_shared_cache(self):
+        # Other processes would not see the changes of this one
+        url = reverse("terra_opp:viewpoint-detail", args=[self.viewpoint.pk])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
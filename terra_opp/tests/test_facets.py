@@ -0,0 +1,167 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.facets import get_facets, rebuild_facets, refresh_viewpoint_facets
+from terra_opp.models import ViewpointFacet
+from terra_opp.tests.factories import (
+    CityFactory,
+    PictureFactory,
+    ThemeFactory,
+    ViewpointFactory,
+)
+
+
+@override_settings(
+    TROPP_SEARCHABLE_PROPERTIES={
+        "road": {"json_key": "voie", "type": "text"},
+        "site": {"json_key": "site", "type": "single"},
+        "tags": {"json_key": "tags", "type": "many"},
+    }
+)
+class FacetsTestCase(APITestCase):
+    def setUp(self):
+        self.marseille = CityFactory(label="Marseille")
+        self.theme = ThemeFactory(label="Sea")
+        self.viewpoint = ViewpointFactory(
+            city=self.marseille,
+            properties={"voie": "A7", "site": "Port", "tags": ["b", "A"]},
+        )
+        self.viewpoint.themes.add(self.theme)
+        ViewpointFactory(
+            city=self.marseille, properties={"site": "Port", "tags": ["c"]}
+        )
+
+    def get_counts(self):
+        return {
+            (facet, value): count
+            for facet, value, count in ViewpointFacet.objects.values_list(
+                "facet", "value", "count"
+            )
+        }
+
+    def assertIndexConsistent(self):
+        counts = self.get_counts()
+        rebuild_facets()
+        self.assertEqual(self.get_counts(), counts)
+
+    def test_counts(self):
+        counts = self.get_counts()
+        self.assertEqual(2, counts["cities", "Marseille"])
+        self.assertEqual(1, counts["themes", "Sea"])
+        self.assertEqual(2, counts["site", '"Port"'])
+        self.assertEqual(1, counts["tags", "A"])
+        self.assertNotIn(("road", "A7"), counts)
+        self.assertEqual(2, len([key for key in counts if key[0] == "photographers"]))
+        self.assertIndexConsistent()
+
+    def test_viewpoint_changes(self):
+        self.viewpoint.properties = {"site": "Beach", "tags": []}
+        self.viewpoint.city = CityFactory(label="Aix")
+        self.viewpoint.save()
+        self.viewpoint.themes.clear()
+        counts = self.get_counts()
+        self.assertEqual(1, counts["site", '"Port"'])
+        self.assertEqual(1, counts["site", '"Beach"'])
+        self.assertNotIn(("tags", "A"), counts)
+        # Cities and themes are kept without viewpoints
+        self.assertEqual(0, counts["themes", "Sea"])
+        self.assertEqual(1, counts["cities", "Aix"])
+        self.assertIndexConsistent()
+
+        self.viewpoint.delete()
+        self.assertEqual(1, self.get_counts()["cities", "Marseille"])
+        self.assertIndexConsistent()
+
+    def test_refresh_locks_viewpoints(self):
+        with CaptureQueriesContext(connection) as queries:
+            refresh_viewpoint_facets(self.viewpoint.pk)
+        # Before their values are read
+        selects = [q["sql"] for q in queries if q["sql"].startswith("SELECT")]
+        self.assertIn('FROM "terra_opp_viewpoint"', selects[0])
+        self.assertIn("FOR UPDATE", selects[0])
+
+    def test_picture_changes(self):
+        other = ViewpointFactory()
+        picture = self.viewpoint.pictures.get()
+        picture.viewpoint = other
+        picture.save()
+        self.assertIndexConsistent()
+
+        PictureFactory(viewpoint=other)
+        other.pictures.all().delete()
+        self.assertIndexConsistent()
+
+    def test_label_changes(self):
+        self.marseille.label = "Massilia"
+        self.marseille.save()
+        counts = self.get_counts()
+        self.assertNotIn(("cities", "Marseille"), counts)
+        self.assertEqual(2, counts["cities", "Massilia"])
+
+        self.theme.delete()
+        self.assertNotIn(("themes", "Sea"), self.get_counts())
+        self.marseille.delete()
+        self.assertNotIn(("cities", "Massilia"), self.get_counts())
+        self.assertIndexConsistent()
+
+    def test_get_facets(self):
+        facets = get_facets()
+        # Sorted whatever the case
+        self.assertEqual([("A", 1), ("b", 1), ("c", 1)], facets["tags"])
+
+    def test_typed_single_values(self):
+        for site in (10, 9, True, "Port"):
+            ViewpointFactory(properties={"site": site})
+        self.assertEqual(
+            [("Port", 3), (9, 1), (10, 1), (True, 1)], get_facets()["site"]
+        )
+        data = self.client.get(reverse("terra_opp:viewpoint-filters")).json()
+        self.assertEqual(["Port", 9, 10, True], data["site"])
+        self.assertIndexConsistent()
+
+    def test_filters(self):
+        url = reverse("terra_opp:viewpoint-filters")
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual(["Port"], data["site"])
+        self.assertEqual(["A", "b", "c"], data["tags"])
+        self.assertNotIn("road", data)
+        self.assertEqual(["Marseille"], data["cities"])
+        self.assertEqual(["Sea"], data["themes"])
+        self.assertEqual(2, len(data["photographers"]))
+
+        data = self.client.get(url, {"counts": "true"}).json()
+        self.assertEqual([{"value": "Port", "count": 2}], data["site"])
+        self.assertEqual([{"value": "Marseille", "count": 2}], data["cities"])
+        self.assertEqual([1, 1], [p["count"] for p in data["photographers"]])
+
+    def test_filters_photographers(self):
+        user = TerraUserFactory()
+        PictureFactory(viewpoint=self.viewpoint, owner=user)
+        data = self.client.get(reverse("terra_opp:viewpoint-filters")).json()
+        self.assertIn(user.email, [p["email"] for p in data["photographers"]])
+
+    def test_facets_action(self):
+        self.client.force_authenticate(user=TerraUserFactory())
+        url = reverse("terra_opp:viewpoint-facets")
+        # filtered viewpoints entries counted in one query, photographers
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual([{"value": "Port", "count": 2}], data["site"])
+        self.assertEqual([{"value": "Marseille", "count": 2}], data["cities"])
+        # Only values of the filtered viewpoints are listed
+        self.assertEqual([{"value": "Sea", "count": 1}], data["themes"])
+
+        data = self.client.get(url, {"themes": "Sea"}).json()
+        self.assertEqual([{"value": "Marseille", "count": 1}], data["cities"])
+        self.assertEqual(
+            [{"value": "A", "count": 1}, {"value": "b", "count": 1}], data["tags"]
+        )
+        self.assertEqual(1, len(data["photographers"]))
+
+        data = self.client.get(url, {"properties__site": "Beach"}).json()
+        self.assertEqual([], data["cities"])
@@ -0,0 +1,84 @@
+from datetime import date, datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.filters import ViewpointFilterSet, has_multivalued_joins
+from terra_opp.models import Viewpoint
+from terra_opp.tests.factories import PictureFactory, ThemeFactory, ViewpointFactory
+
+
+def aware(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class PictureDateFiltersTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TerraUserFactory()
+        cls.old = ViewpointFactory(label="old", pictures__date=aware(2018, 1, 1))
+        PictureFactory(viewpoint=cls.old, date=aware(2020, 1, 1))
+        PictureFactory(viewpoint=cls.old, date=aware(2020, 6, 1))
+        cls.recent = ViewpointFactory(label="recent", pictures__date=aware(2019, 6, 1))
+        cls.empty = ViewpointFactory(label="empty")
+        cls.empty.pictures.all().delete()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("terra_opp:viewpoint-list")
+
+    def get_ids(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(self.url, {**params, "page_size": 100}).json()
+        self.queries = [query["sql"] for query in queries]
+        return [viewpoint["id"] for viewpoint in data["results"]]
+
+    def test_same_results_as_joins(self):
+        for params in (
+            {"date_from": date(2019, 1, 1)},
+            {"date_to": date(2019, 1, 1)},
+            {"date_from": date(2019, 1, 1), "date_to": date(2019, 12, 31)},
+            {"date_from": date(2018, 6, 1), "date_to": date(2018, 12, 31)},
+            {"date_from": date(2021, 1, 1)},
+        ):
+            with self.subTest(params=params):
+                # Each filter was a join of its own
+                expected = Viewpoint.objects.all()
+                if "date_from" in params:
+                    expected = expected.filter(pictures__date__gte=params["date_from"])
+                if "date_to" in params:
+                    expected = expected.filter(pictures__date__lte=params["date_to"])
+                ids = self.get_ids(params)
+                self.assertEqual(len(set(ids)), len(ids))
+                self.assertEqual(
+                    set(expected.distinct().values_list("pk", flat=True)), set(ids)
+                )
+
+    def test_no_join_fan_out(self):
+        filterset = ViewpointFilterSet(
+            {"date_from": "2018-01-01", "date_to": "2018-06-01"},
+            queryset=Viewpoint.objects.all(),
+        )
+        queryset = filterset.qs
+        sql = str(queryset.query)
+        self.assertFalse(has_multivalued_joins(queryset))
+        self.assertNotIn('JOIN "terra_opp_picture"', sql)
+        self.assertIn("EXISTS", sql)
+        # Its three pictures don't repeat the viewpoint, without DISTINCT
+        self.assertEqual(1, queryset.count())
+        self.assertEqual([self.old.pk], list(queryset.values_list("pk", flat=True)))
+
+        self.get_ids({"date_from": "2018-01-01"})
+        list_sql = next(sql for sql in self.queries if "EXISTS" in sql)
+        self.assertNotIn("DISTINCT", list_sql)
+
+    def test_distinct_with_joins(self):
+        theme = ThemeFactory(label="Sea")
+        self.old.themes.add(theme)
+        ids = self.get_ids({"themes": "Sea", "date_from": "2018-01-01"})
+        self.assertEqual([self.old.pk], ids)
+        self.assertTrue(any("DISTINCT" in sql for sql in self.queries))
@@ -0,0 +1,84 @@
+import gzip
+import json
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from terra_opp.models import PublicFeatureCollection, PublicViewpointFeature
+from terra_opp.tests.factories import CityFactory, PictureFactory, ViewpointFactory
+
+
+class PublicGeoJSONTestCase(APITestCase):
+    def setUp(self):
+        self.viewpoint = ViewpointFactory(
+            label="Public", active=True, pictures__state="accepted"
+        )
+        # Not public: inactive, or without accepted picture
+        ViewpointFactory(label="Inactive", pictures__state="accepted")
+        ViewpointFactory(label="Draft", active=True, pictures__state="draft")
+        self.url = reverse("terra_opp:viewpoint-geojson")
+
+    def get_collection(self, **headers):
+        response = self.client.get(self.url, **headers)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return response, json.loads(response.content)
+
+    def test_public_viewpoints(self):
+        response, data = self.get_collection()
+        self.assertEqual("application/geo+json", response["Content-Type"])
+        self.assertEqual("FeatureCollection", data["type"])
+        self.assertEqual([self.viewpoint.pk], [f["id"] for f in data["features"]])
+        feature = data["features"][0]
+        self.assertEqual("Point", feature["geometry"]["type"])
+        self.assertEqual("Public", feature["properties"]["label"])
+        self.assertIsNotNone(feature["properties"]["picture"])
+
+    def test_gzip(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual("gzip", response["Content-Encoding"])
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(1, len(data["features"]))
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertNotEqual(response["ETag"], self.get_collection()[0]["ETag"])
+
+    def test_not_modified(self):
+        response, _ = self.get_collection()
+        # Served from the prebuilt collection
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def test_incremental_updates(self):
+        response, _ = self.get_collection()
+        version = int(response["X-Collection-Version"])
+
+        self.viewpoint.label = "Renamed"
+        self.viewpoint.save()
+        self.assertTrue(PublicFeatureCollection.objects.get().stale)
+
+        response, data = self.get_collection(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(version + 1, int(response["X-Collection-Version"]))
+        self.assertEqual("Renamed", data["features"][0]["properties"]["label"])
+
+        other = ViewpointFactory(active=True, pictures=None)
+        PictureFactory(viewpoint=other, state="accepted")
+        _, data = self.get_collection()
+        self.assertEqual(2, len(data["features"]))
+
+        picture = self.viewpoint.pictures.get()
+        picture.state = "refused"
+        picture.save()
+        other.delete()
+        _, data = self.get_collection()
+        self.assertEqual([], data["features"])
+        self.assertFalse(PublicViewpointFeature.objects.exists())
+
+    def test_city_update(self):
+        self.viewpoint.city = CityFactory(label="Nantes")
+        self.viewpoint.save()
+        city = self.viewpoint.city
+        city.label = "Rennes"
+        city.save()
+        _, data = self.get_collection()
+        self.assertEqual("Rennes", data["features"][0]["properties"]["city"])
@@ -0,0 +1,122 @@
+import logging
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp import views
+from terra_opp.instrumentation import QueryRecorder
+from terra_opp.models import Picture, Viewpoint
+from terra_opp.tests.factories import (
+    CampaignFactory,
+    CityFactory,
+    PictureFactory,
+    ThemeFactory,
+    ViewpointFactory,
+)
+from terra_opp.tests.mixins import QueryBudgetTestMixin
+from terra_opp.urls import router
+
+
+class QueryRecorderTestCase(TestCase):
+    def test_record(self):
+        with QueryRecorder() as recorder:
+            for pk in (1, 2):
+                list(Viewpoint.objects.filter(pk=pk))
+            Picture.objects.count()
+        self.assertEqual(3, len(recorder))
+        self.assertGreater(recorder.duration, 0)
+        self.assertEqual([2], list(recorder.repeated.values()))
+
+        # Not recorded any more
+        Picture.objects.count()
+        self.assertEqual(3, len(recorder))
+
+
+class QueryInstrumentationTestCase(APITestCase):
+    def test_disabled(self):
+        response = self.client.get(reverse("terra_opp:city-list"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(TROPP_QUERY_INSTRUMENTATION=True)
+    def test_server_timing_and_logs(self):
+        with self.assertLogs("terra_opp.instrumentation", logging.INFO) as logs:
+            response = self.client.get(reverse("terra_opp:city-list"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="3 queries"$')
+        self.assertIn("CityViewSet.list: 3 queries", logs.output[0])
+
+    @override_settings(TROPP_QUERY_INSTRUMENTATION=True)
+    def test_over_budget(self):
+        CityFactory.create_batch(2)
+        with patch.object(
+            views.CityViewSet, "query_budgets", {"list": 1}
+        ), self.assertLogs("terra_opp.instrumentation", logging.WARNING) as logs:
+            self.client.get(reverse("terra_opp:city-list"))
+        self.assertIn("over its budget of 1", logs.output[-1])
+
+
+class QueryBudgetsTestCase(QueryBudgetTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TerraUserFactory(is_superuser=True)
+        cls.viewpoints = [
+            ViewpointFactory(
+                active=True, pictures__state="accepted", pictures__owner=cls.user
+            )
+            for _ in range(3)
+        ]
+        for viewpoint in cls.viewpoints:
+            viewpoint.themes.add(ThemeFactory())
+            PictureFactory(viewpoint=viewpoint, owner=TerraUserFactory())
+        cls.campaign = CampaignFactory(assignee=cls.user)
+        cls.campaign.viewpoints.set(cls.viewpoints)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        # Content types are cached by the process, don't count them
+        ContentType.objects.get_for_model(Viewpoint)
+
+    def assertWithinBudget(self, viewset, action, url):
+        # Per request caches, such as permissions, are filled first
+        self.client.get(url)
+        with self.assertQueryBudget(viewset, action):
+            response = self.client.get(url)
+        self.assertEqual(200, response.status_code, response.content)
+
+    def test_every_viewset_has_budgets(self):
+        for prefix, viewset, basename in router.registry:
+            with self.subTest(viewset=viewset.__name__):
+                for action in ("list", "retrieve"):
+                    if hasattr(viewset, action):
+                        self.assertIn(action, viewset.query_budgets)
+
+    def test_viewpoints(self):
+        viewset = views.ViewpointViewSet
+        pk = self.viewpoints[0].pk
+        for action, url in (
+            ("list", reverse("terra_opp:viewpoint-list")),
+            ("active", reverse("terra_opp:viewpoint-active")),
+            ("retrieve", reverse("terra_opp:viewpoint-detail", args=[pk])),
+            ("filters", reverse("terra_opp:viewpoint-filters")),
+            ("facets", reverse("terra_opp:viewpoint-facets")),
+        ):
+            with self.subTest(action=action):
+                self.assertWithinBudget(viewset, action, url)
+
+    def test_list_and_retrieve(self):
+        for viewset, basename, pk in (
+            (views.PictureViewSet, "picture", Picture.objects.first().pk),
+            (views.CampaignViewSet, "campaign", self.campaign.pk),
+            (views.PhotographerViewSet, "photographer", self.user.pk),
+            (views.CityViewSet, "city", self.viewpoints[0].city_id),
+            (views.ThemeViewSet, "theme", self.viewpoints[0].themes.first().pk),
+        ):
+            with self.subTest(viewset=viewset.__name__):
+                self.assertWithinBudget(
+                    viewset, "list", reverse(f"terra_opp:{basename}-list")
+                )
+                url = reverse(f"terra_opp:{basename}-detail", args=[pk])
+                self.assertWithinBudget(viewset, "retrieve", url)
@@ -0,0 +1,155 @@
+import datetime
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.jobs import (
+    claim_job,
+    purge_expired_jobs,
+    requeue_stale_jobs,
+    run_job,
+    run_worker,
+)
+from terra_opp.models import PdfJob
+from terra_opp.sheets import SheetRenderer
+from terra_opp.tests.factories import ViewpointFactory
+
+
+class PdfJobTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewpoint = ViewpointFactory(active=True, pictures__state="accepted")
+
+    def setUp(self):
+        # The connection of the test transaction must not be closed by workers
+        patcher = patch("terra_opp.jobs.close_old_connections")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_job(self):
+        response = self.client.post(
+            reverse("terra_opp:pdf-job-list"), {"viewpoint": self.viewpoint.pk}
+        )
+        self.assertEqual(202, response.status_code)
+        return response
+
+    def test_create(self):
+        response = self.create_job()
+        job = PdfJob.objects.get()
+        self.assertEqual(str(job.pk), response.data["id"])
+        self.assertEqual(PdfJob.PENDING, response.data["state"])
+        self.assertIsNone(response.data["download_url"])
+        self.assertTrue(
+            response["Location"].endswith(
+                reverse("terra_opp:pdf-job-detail", args=[job.pk])
+            )
+        )
+
+    def test_create_reuses_unfinished_job(self):
+        user = TerraUserFactory()
+        self.client.force_authenticate(user)
+        first = self.create_job()
+        second = self.create_job()
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertEqual(user, PdfJob.objects.get().owner)
+
+    def test_create_unknown_viewpoint(self):
+        response = self.client.post(reverse("terra_opp:pdf-job-list"), {"viewpoint": 0})
+        self.assertEqual(400, response.status_code)
+
+    def test_create_hidden_viewpoint(self):
+        url = reverse("terra_opp:pdf-job-list")
+        hidden = ViewpointFactory(active=False, pictures__state="accepted")
+        response = self.client.post(url, {"viewpoint": hidden.pk})
+        self.assertEqual(400, response.status_code)
+        self.client.force_authenticate(TerraUserFactory())
+        response = self.client.post(url, {"viewpoint": hidden.pk})
+        self.assertEqual(202, response.status_code)
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+        TROPP_PDF_JOB_THROTTLE_RATE="2/hour",
+    )
+    def test_create_throttled(self):
+        cache.clear()
+        self.create_job()
+        self.create_job()
+        response = self.client.post(
+            reverse("terra_opp:pdf-job-list"), {"viewpoint": self.viewpoint.pk}
+        )
+        self.assertEqual(429, response.status_code)
+
+    def test_worker_renders_artifact(self):
+        job_id = self.create_job().data["id"]
+        detail_url = reverse("terra_opp:pdf-job-detail", args=[job_id])
+        download_url = reverse("terra_opp:pdf-job-download", args=[job_id])
+        self.assertEqual(404, self.client.get(download_url).status_code)
+
+        out = StringIO()
+        call_command("opp_worker", once=True, stdout=out)
+        self.assertIn("1 job(s) processed", out.getvalue())
+
+        response = self.client.get(detail_url)
+        self.assertEqual(PdfJob.DONE, response.data["state"])
+        self.assertTrue(response.data["download_url"].endswith(download_url))
+
+        response = self.client.get(download_url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("application/pdf", response["Content-Type"])
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+    @override_settings(TROPP_PDF_JOB_MAX_ATTEMPTS=2)
+    def test_failed_job_is_retried(self):
+        self.create_job()
+        with patch.object(SheetRenderer, "write_pdf", side_effect=ValueError("Broken")):
+            job = run_job(claim_job())
+            self.assertEqual(PdfJob.PENDING, job.state)
+            job = run_job(claim_job())
+        self.assertEqual(PdfJob.FAILED, job.state)
+        self.assertEqual("Broken", job.error)
+        self.assertIsNone(claim_job())
+
+    def test_deleted_job_does_not_stop_worker(self):
+        self.create_job()
+        other = ViewpointFactory(active=True, pictures__state="accepted")
+        PdfJob.objects.create(viewpoint=other, base_url="http://testserver/")
+
+        def delete_viewpoint(viewpoint, base_url):
+            viewpoint.delete()
+            return b"%PDF"
+
+        with patch("terra_opp.jobs.render_viewpoint_pdf", delete_viewpoint):
+            self.assertEqual(2, run_worker(once=True))
+        self.assertFalse(PdfJob.objects.exists())
+
+    def test_unsaved_job_is_failed(self):
+        self.create_job()
+        with patch("terra_opp.jobs.run_job", side_effect=ValueError("Broken")):
+            self.assertEqual(1, run_worker(once=True))
+        job = PdfJob.objects.get()
+        self.assertEqual(PdfJob.FAILED, job.state)
+        self.assertEqual("Broken", job.error)
+
+    def test_stale_job_is_requeued(self):
+        self.create_job()
+        job = claim_job()
+        PdfJob.objects.update(started_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(1, requeue_stale_jobs())
+        self.assertEqual(job, claim_job())
+
+    def test_expired_job_is_purged(self):
+        self.create_job()
+        run_job(claim_job())
+        self.assertEqual(0, purge_expired_jobs())
+        PdfJob.objects.update(finished_at=timezone.now() - datetime.timedelta(days=2))
+        self.assertEqual(1, purge_expired_jobs())
+        self.assertFalse(PdfJob.objects.exists())
@@ -0,0 +1,106 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.models import Picture, Viewpoint
+from terra_opp.tests.factories import ViewpointFactory
+
+
+class CursorPaginationTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TerraUserFactory()
+        for index in range(5):
+            ViewpointFactory(
+                label=f"Viewpoint {index % 2}",
+                pictures__state="accepted",
+                active=True,
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def _walk(self, url, params):
+        ids = []
+        data = self.client.get(url, params).json()
+        ids += [viewpoint["id"] for viewpoint in data["results"]]
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            ids += [viewpoint["id"] for viewpoint in data["results"]]
+        return ids, data
+
+    def test_page_number_pagination_is_the_default(self):
+        data = self.client.get(reverse("terra_opp:viewpoint-list")).json()
+        self.assertIn("num_pages", data)
+        self.assertEqual(5, data["count"])
+
+    def test_cursor_pagination_walks_all_viewpoints(self):
+        ids, last_page = self._walk(
+            reverse("terra_opp:viewpoint-list"),
+            {"pagination": "cursor", "page_size": 2},
+        )
+        expected = list(
+            Viewpoint.objects.order_by("-created_at", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+        self.assertEqual(expected, ids)
+        self.assertIsNone(last_page["count"])
+
+        # And back to the beginning
+        previous = self.client.get(last_page["previous"]).json()
+        self.assertEqual(
+            expected[2:4], [viewpoint["id"] for viewpoint in previous["results"]]
+        )
+
+    def test_cursor_pagination_with_ordering_filter(self):
+        ids, _ = self._walk(
+            reverse("terra_opp:viewpoint-list"),
+            {"pagination": "cursor", "page_size": 2, "ordering": "-label"},
+        )
+        expected = list(
+            Viewpoint.objects.order_by("-label", "-pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(expected, ids)
+
+    def test_cursor_pagination_on_relation_ordering(self):
+        ids, _ = self._walk(
+            reverse("terra_opp:viewpoint-list"),
+            {"pagination": "cursor", "page_size": 2, "ordering": "city"},
+        )
+        expected = list(
+            Viewpoint.objects.order_by("city_id", "pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(expected, ids)
+
+    def test_cursor_pagination_count_modes(self):
+        url = reverse("terra_opp:viewpoint-list")
+        data = self.client.get(
+            url, {"pagination": "cursor", "page_size": 2, "count": "exact"}
+        ).json()
+        self.assertEqual(5, data["count"])
+
+        data = self.client.get(
+            url, {"pagination": "cursor", "page_size": 2, "count": "estimate"}
+        ).json()
+        self.assertIsInstance(data["count"], int)
+
+        response = self.client.get(url, {"pagination": "cursor", "count": "maybe"})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse("terra_opp:viewpoint-list"), {"cursor": "not-a-cursor"}
+        )
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_cursor_pagination_on_pictures(self):
+        ids, _ = self._walk(
+            reverse("terra_opp:picture-list"),
+            {"pagination": "cursor", "page_size": 2, "ordering": "-date"},
+        )
+        expected = list(
+            Picture.objects.order_by("-date", "-pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(expected, ids)
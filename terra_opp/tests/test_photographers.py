@@ -0,0 +1,100 @@
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.models import Photographer
+from terra_opp.tests.factories import PictureFactory, ViewpointFactory
+from terra_opp.tests.mixins import TestPermissionsMixin
+
+
+def aware(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class PhotographersTestCase(TestPermissionsMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = TerraUserFactory(email="alice@example.com")
+        cls.bob = TerraUserFactory(email="bob@example.com")
+        cls.viewpoint = ViewpointFactory(
+            pictures__owner=cls.alice, pictures__date=aware(2019, 1, 1)
+        )
+        cls.picture = PictureFactory(
+            viewpoint=cls.viewpoint, owner=cls.alice, date=aware(2020, 1, 1)
+        )
+
+    def get_statistics(self, user):
+        return (
+            Photographer.objects.filter(user=user)
+            .values_list("pictures_count", "first_picture_date", "last_picture_date")
+            .first()
+        )
+
+    def test_maintained(self):
+        self.assertEqual(
+            (2, aware(2019, 1, 1), aware(2020, 1, 1)), self.get_statistics(self.alice)
+        )
+        self.assertIsNone(self.get_statistics(self.bob))
+
+        # Picture given to another user
+        self.picture.owner = self.bob
+        self.picture.date = aware(2021, 1, 1)
+        self.picture.save()
+        self.assertEqual(
+            (1, aware(2019, 1, 1), aware(2019, 1, 1)), self.get_statistics(self.alice)
+        )
+        self.assertEqual(
+            (1, aware(2021, 1, 1), aware(2021, 1, 1)), self.get_statistics(self.bob)
+        )
+
+        self.picture.delete()
+        self.assertIsNone(self.get_statistics(self.bob))
+
+    def test_rebuild(self):
+        Photographer.objects.all().delete()
+        out = StringIO()
+        call_command("opp_rebuild_photographers", stdout=out)
+        self.assertIn("Photographers directory has been rebuilt", out.getvalue())
+        self.assertEqual(2, self.get_statistics(self.alice)[0])
+
+    def test_endpoint(self):
+        PictureFactory(viewpoint=self.viewpoint, owner=self.bob)
+        url = reverse("terra_opp:photographer-list")
+        self.user = TerraUserFactory()
+        self._set_permissions(["can_manage_campaigns"])
+        self.client.force_authenticate(user=self.user)
+        # Permissions are cached by the user
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual(2, data["count"])
+        self.assertEqual(
+            ["alice@example.com", "bob@example.com"],
+            [photographer["user"]["email"] for photographer in data["results"]],
+        )
+        self.assertEqual(2, data["results"][0]["pictures_count"])
+
+        data = self.client.get(url, {"ordering": "-pictures_count,user__email"}).json()
+        self.assertEqual(str(self.alice.uuid), data["results"][0]["user"]["uuid"])
+        data = self.client.get(url, {"search": "bob"}).json()
+        self.assertEqual(1, data["count"])
+
+    def test_endpoint_permissions(self):
+        url = reverse("terra_opp:photographer-list")
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+        self.user = TerraUserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(403, self.client.get(url).status_code)
+        self._set_permissions(["can_add_pictures"])
+        self.assertEqual(403, self.client.get(url).status_code)
+
+    def test_filters(self):
+        data = self.client.get(reverse("terra_opp:viewpoint-filters")).json()
+        self.assertEqual(
+            ["alice@example.com"], [p["email"] for p in data["photographers"]]
+        )
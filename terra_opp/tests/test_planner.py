@@ -0,0 +1,74 @@
+from django.db.models import Prefetch
+from django.test import SimpleTestCase
+
+from terra_opp.models import Picture, Viewpoint
+from terra_opp.planner import QueryPlan
+from terra_opp.serializers import (
+    RoCampaignSerializer,
+    SimpleAuthenticatedViewpointSerializer,
+    SimpleViewpointSerializer,
+    ViewpointSerializerWithPicture,
+)
+
+
+class QueryPlanTestCase(SimpleTestCase):
+    computed = {"picture": "last_accepted_picture"}
+
+    def test_simple_viewpoint_plan(self):
+        plan = QueryPlan.from_serializer(SimpleViewpointSerializer, self.computed)
+        self.assertEqual(Viewpoint, plan.model)
+        self.assertEqual(
+            {"point", "city", "last_accepted_picture"}, plan.select_related
+        )
+        self.assertEqual({}, plan.prefetch_related)
+        self.assertEqual({}, plan.prefetch_objects)
+        self.assertEqual({}, plan.annotations)
+
+    def test_prefetch_computed_field(self):
+        computed = {
+            "picture": Prefetch(
+                "pictures",
+                queryset=Picture.objects.order_by("-created_at"),
+                to_attr="_ordered_pics",
+            ),
+        }
+        plan = QueryPlan.from_serializer(SimpleViewpointSerializer, computed)
+        self.assertEqual({"point", "city"}, plan.select_related)
+        self.assertEqual(["_ordered_pics"], list(plan.prefetch_objects))
+
+    def test_authenticated_viewpoint_plan(self):
+        plan = QueryPlan.from_serializer(
+            SimpleAuthenticatedViewpointSerializer, self.computed
+        )
+        self.assertEqual(
+            {"point", "city", "last_accepted_picture"}, plan.select_related
+        )
+        self.assertEqual(["themes"], list(plan.prefetch_related))
+        # last_accepted_picture_date is a column
+        self.assertEqual({}, plan.annotations)
+
+    def test_viewpoint_plan_prefetches_pictures_once(self):
+        plan = QueryPlan.from_serializer(ViewpointSerializerWithPicture, self.computed)
+        self.assertEqual({"point", "city"}, plan.select_related)
+        self.assertEqual({"pictures", "related", "themes"}, set(plan.prefetch_related))
+        # picture_ids and nested pictures share the same prefetch
+        self.assertEqual({"owner"}, plan.prefetch_related["pictures"].select_related)
+        self.assertEqual({}, plan.prefetch_objects)
+
+    def test_pk_only_relations_are_not_joined(self):
+        plan = QueryPlan.from_serializer(RoCampaignSerializer)
+        # owner and assignee are rendered as primary keys
+        self.assertEqual(set(), plan.select_related)
+        # viewpoint of pictures too
+        self.assertFalse(plan.prefetch_related["pictures"])
+
+    def test_apply(self):
+        plan = QueryPlan.from_serializer(ViewpointSerializerWithPicture, self.computed)
+        queryset = plan.apply(Viewpoint.objects.all())
+        self.assertEqual({"point": {}, "city": {}}, queryset.query.select_related)
+        lookups = [
+            getattr(lookup, "prefetch_to", lookup)
+            for lookup in queryset._prefetch_related_lookups
+        ]
+        self.assertEqual(["pictures", "related", "themes"], lookups)
+        self.assertEqual({}, queryset.query.annotations)
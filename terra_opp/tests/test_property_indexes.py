@@ -0,0 +1,140 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.checks import check_property_indexes
+from terra_opp.filters import JsonFilterBackend
+from terra_opp.indexes import (
+    get_existing_indexes,
+    get_index_name,
+    get_uncovered_properties,
+)
+from terra_opp.models import Viewpoint
+from terra_opp.tests.factories import ViewpointFactory
+
+SEARCHABLE_PROPERTIES = {
+    "road": {"json_key": "voie", "type": "text", "ranking": True},
+    "site": {"json_key": "site", "type": "text"},
+    "kind": {"json_key": "kind", "type": "single"},
+    "tags": {"json_key": "tags", "type": "many"},
+}
+
+
+@override_settings(TROPP_SEARCHABLE_PROPERTIES=SEARCHABLE_PROPERTIES)
+class SyncPropertyIndexesTestCase(TestCase):
+    def test_create_and_drop(self):
+        out = StringIO()
+        call_command("opp_sync_property_indexes", stdout=out)
+        self.assertEqual(
+            {
+                get_index_name("road", "trgm"),
+                get_index_name("site", "trgm"),
+                get_index_name("kind", "btree"),
+                get_index_name("tags", "gin"),
+            },
+            get_existing_indexes(),
+        )
+        self.assertIn("4 index(es) created", out.getvalue())
+        self.assertEqual([], get_uncovered_properties())
+
+        with self.settings(TROPP_SEARCHABLE_PROPERTIES={}):
+            call_command("opp_sync_property_indexes", stdout=out)
+            self.assertEqual(4, len(get_existing_indexes()))
+            call_command("opp_sync_property_indexes", drop=True, stdout=out)
+            self.assertEqual(set(), get_existing_indexes())
+
+    def test_report_uncovered(self):
+        out = StringIO()
+        call_command("opp_sync_property_indexes", check=True, stdout=out)
+        self.assertEqual(set(), get_existing_indexes())
+        self.assertIn("No index covers property tags", out.getvalue())
+        self.assertEqual(
+            ["road", "site", "kind", "tags"],
+            [warning.msg.split("'")[1] for warning in check_property_indexes(None)],
+        )
+
+        call_command("opp_sync_property_indexes", stdout=StringIO())
+        self.assertEqual([], check_property_indexes(None))
+
+    def test_indexes_match_filters(self):
+        call_command("opp_sync_property_indexes", stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+        for name, kind, value in (
+            ("road", "trgm", "rue"),
+            ("kind", "btree", "Church"),
+            ("tags", "gin", "sea"),
+        ):
+            with self.subTest(name=name):
+                param = f"properties__{SEARCHABLE_PROPERTIES[name]['json_key']}"
+                request = Request(APIRequestFactory().get("/", {param: value}))
+                queryset = JsonFilterBackend().filter_queryset(
+                    request, Viewpoint.objects.all(), None
+                )
+                self.assertIn(get_index_name(name, kind), queryset.explain())
+
+    def test_long_names(self):
+        name = get_index_name("x" * 100, "trgm")
+        self.assertLessEqual(len(name), connection.ops.max_name_length())
+        self.assertNotEqual(name, get_index_name("x" * 101, "trgm"))
+
+
+@override_settings(TROPP_SEARCHABLE_PROPERTIES=SEARCHABLE_PROPERTIES)
+class TextPropertiesSearchTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TerraUserFactory()
+        for label, road in (
+            ("first", "Avenue de la rue"),
+            ("second", "Rue"),
+            ("third", "Chemin"),
+            ("fourth", "100% rue"),
+        ):
+            ViewpointFactory(label=label, properties={"voie": road, "site": "Port"})
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("terra_opp:viewpoint-list")
+
+    def get_labels(self, params):
+        data = self.client.get(self.url, params).json()
+        return [viewpoint["label"] for viewpoint in data["results"]]
+
+    def test_contains(self):
+        self.assertEqual(
+            {"first", "second", "fourth"},
+            set(self.get_labels({"properties__voie": "RUE", "ordering": "label"})),
+        )
+        self.assertEqual(["fourth"], self.get_labels({"properties__voie": "0% r"}))
+        self.assertEqual([], self.get_labels({"properties__voie": "_ue"}))
+
+    def test_ranking(self):
+        labels = self.get_labels({"properties__voie": "rue"})
+        self.assertEqual("second", labels[0])
+        # Unless an ordering is asked
+        labels = self.get_labels({"properties__voie": "rue", "ordering": "label"})
+        self.assertEqual(["first", "fourth", "second"], labels)
+
+    def test_without_ranking(self):
+        labels = self.get_labels({"properties__site": "port", "ordering": "-label"})
+        self.assertEqual(["third", "second", "fourth", "first"], labels)
+
+    def test_single_and_many(self):
+        ViewpointFactory(
+            label="fifth", properties={"kind": "Church", "tags": ["sea", "sun"]}
+        )
+        self.assertEqual(["fifth"], self.get_labels({"properties__kind": "Church"}))
+        self.assertEqual([], self.get_labels({"properties__kind": "church"}))
+        self.assertEqual(["fifth"], self.get_labels({"properties__tags": "sun"}))
+        self.assertEqual(
+            ["fifth"],
+            self.get_labels({"properties__tags": ["sun", "sea"]}),
+        )
+        self.assertEqual([], self.get_labels({"properties__tags": ["sun", "snow"]}))
@@ -0,0 +1,104 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.checks import check_shared_cache
+from terra_opp.models import Viewpoint
+from terra_opp.response_cache import get_or_compute
+from terra_opp.tests.factories import CityFactory, PictureFactory, ViewpointFactory
+
+
+# Tests are served by a single process
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    TROPP_RESPONSE_CACHE_SHARED=True,
+)
+class AnonymousResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewpoint = ViewpointFactory(
+            label="Cached", active=True, pictures__state="accepted"
+        )
+        self.url = reverse("terra_opp:viewpoint-list")
+
+    def get_labels(self, params=None):
+        response = self.client.get(self.url, params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return [viewpoint["label"] for viewpoint in response.json()["results"]]
+
+    def test_list_is_cached(self):
+        self.assertEqual(["Cached"], self.get_labels())
+        with self.assertNumQueries(0):
+            self.assertEqual(["Cached"], self.get_labels())
+
+        # Not invalidated without signals
+        Viewpoint.objects.update(label="Updated")
+        self.assertEqual(["Cached"], self.get_labels())
+
+    def test_query_parameters_are_normalized(self):
+        self.get_labels({"page_size": 10, "search": "Cached"})
+        with self.assertNumQueries(0):
+            self.get_labels({"search": "Cached", "page_size": 10})
+
+    def test_scheme_is_part_of_the_key(self):
+        self.get_labels()
+        Viewpoint.objects.update(label="Updated")
+        response = self.client.get(self.url, secure=True)
+        self.assertEqual("Updated", response.json()["results"][0]["label"])
+
+    def test_invalidated_by_saves(self):
+        self.assertEqual(["Cached"], self.get_labels())
+
+        self.viewpoint.label = "Changed"
+        self.viewpoint.save()
+        self.assertEqual(["Changed"], self.get_labels())
+
+        PictureFactory(viewpoint=self.viewpoint, state="refused")
+        self.viewpoint.pictures.filter(state="accepted").delete()
+        self.assertEqual([], self.get_labels())
+
+    def test_filters_invalidated_by_cities(self):
+        url = reverse("terra_opp:viewpoint-filters")
+        self.client.get(url)
+        CityFactory(label="Marseille")
+        self.assertIn("Marseille", self.client.get(url).json()["cities"])
+
+    def test_authenticated_users_are_not_cached(self):
+        self.get_labels()
+        Viewpoint.objects.update(label="Updated")
+        self.client.force_authenticate(user=TerraUserFactory())
+        self.assertEqual(["Updated"], self.get_labels())
+
+    @override_settings(TROPP_RESPONSE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        self.get_labels()
+        Viewpoint.objects.update(label="Updated")
+        self.assertEqual(["Updated"], self.get_labels())
+
+    @override_settings(TROPP_RESPONSE_CACHE_SHARED=None)
+    def test_not_shared(self):
+        self.get_labels()
+        Viewpoint.objects.update(label="Updated")
+        self.assertEqual(["Updated"], self.get_labels())
+        self.assertEqual(["terra_opp.W002"], [e.id for e in check_shared_cache(None)])
+
+    def test_cold_key_is_computed_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "value"
+
+        cache.add("key:lock", 1)
+        cache.set("key", "computed elsewhere")
+        self.assertEqual("computed elsewhere", get_or_compute("key", compute, 60))
+        self.assertEqual([], calls)
+
+        cache.delete_many(["key", "key:lock"])
+        self.assertEqual("value", get_or_compute("key", compute, 60))
+        self.assertEqual("value", get_or_compute("key", compute, 60))
+        self.assertEqual([1], calls)
+        self.assertIsNone(cache.get("key:lock"))
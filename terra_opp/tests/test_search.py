@@ -0,0 +1,104 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.models import Viewpoint
+from terra_opp.search import rebuild_search_vectors
+from terra_opp.tests.factories import (
+    CityFactory,
+    PictureFactory,
+    ThemeFactory,
+    ViewpointFactory,
+)
+
+
+@override_settings(
+    TROPP_SEARCH_CONFIG="terra_opp_french",
+    TROPP_SEARCHABLE_PROPERTIES={"site": {"json_key": "site", "type": "text"}},
+)
+class FullTextSearchTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TerraUserFactory()
+        cls.city = CityFactory(label="Saint-Étienne")
+        cls.church = ViewpointFactory(label="Église du village", city=cls.city)
+        cls.harbour = ViewpointFactory(
+            label="Le port",
+            properties={"site": "Vue sur l'église"},
+            pictures__identifier="4200101",
+        )
+        cls.theme = ThemeFactory(label="Patrimoine")
+        cls.harbour.themes.add(cls.theme)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, terms, url=None, **params):
+        response = self.client.get(
+            url or reverse("terra_opp:viewpoint-list"), {"search": terms, **params}
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code, response.content)
+        return [result["id"] for result in response.json()["results"]]
+
+    def test_accents_and_prefixes(self):
+        self.assertEqual([self.church.pk], self.search("eglise village"))
+        self.assertEqual([self.church.pk], self.search("VILL"))
+        self.assertEqual([self.church.pk], self.search("etienne"))
+        self.assertEqual([], self.search("église château"))
+
+    def test_ranking(self):
+        # The label has more weight than the properties
+        self.assertEqual([self.church.pk, self.harbour.pk], self.search("église"))
+        self.assertEqual(
+            sorted([self.church.pk, self.harbour.pk]),
+            self.search("église", ordering="id"),
+        )
+
+    def test_exact_fields(self):
+        self.assertIn(self.church.pk, self.search(str(self.church.pk)))
+        self.assertEqual([self.harbour.pk], self.search("4200101"))
+
+    def test_vectors_are_maintained(self):
+        self.assertEqual([self.harbour.pk], self.search("patrimoine"))
+        self.theme.label = "Maritime"
+        self.theme.save()
+        self.assertEqual([self.harbour.pk], self.search("maritime"))
+        self.harbour.themes.clear()
+        self.assertEqual([], self.search("maritime"))
+
+        PictureFactory(viewpoint=self.church, identifier="4200201")
+        self.assertEqual([self.church.pk], self.search("4200201"))
+
+        self.church.label = "Chapelle"
+        self.church.save()
+        self.assertEqual([self.church.pk], self.search("chapelle"))
+
+    def test_pictures(self):
+        url = reverse("terra_opp:picture-list")
+        pictures = self.search("port", url)
+        self.assertEqual(
+            list(self.harbour.pictures.values_list("pk", flat=True)), pictures
+        )
+        self.assertEqual(pictures, self.search("4200101", url))
+
+    def test_pictures_identifiers(self):
+        url = reverse("terra_opp:picture-list")
+        picture = self.harbour.pictures.get()
+        sibling = PictureFactory(viewpoint=self.harbour, identifier="4200102")
+        # Not through the identifiers of the other pictures of the viewpoint
+        self.assertEqual([picture.pk], self.search("4200101", url))
+        self.assertEqual([sibling.pk], self.search("00102", url))
+        self.assertEqual(
+            sorted([picture.pk, sibling.pk]), self.search("42001", url, ordering="id")
+        )
+
+    def test_rebuild(self):
+        Viewpoint.objects.update(search_vector=None)
+        self.assertEqual([], self.search("port"))
+        rebuild_search_vectors()
+        self.assertEqual([self.harbour.pk], self.search("port"))
+
+    def test_without_words(self):
+        self.assertEqual(2, len(self.search("'&!")))
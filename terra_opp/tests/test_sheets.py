@@ -0,0 +1,307 @@
+import io
+import sys
+import zipfile
+from concurrent.futures import Future
+from unittest import skipIf
+from unittest.mock import patch
+
+import weasyprint
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.models import Campaign
+from terra_opp.renderers import django_url_fetcher
+from terra_opp.sheets import (
+    SheetRenderer,
+    get_executor,
+    get_picture_rendition,
+    get_rendition_size,
+    get_sheet_digest,
+    get_sheet_renderer,
+    render_booklet,
+    render_sheet,
+    render_sheets,
+)
+from terra_opp.tests.factories import (
+    CampaignFactory,
+    PictureFactory,
+    ViewpointFactory,
+)
+from terra_opp.tests.mixins import TestPermissionsMixin
+
+
+def has_connection():
+    return connection.connection is not None
+
+
+class InlineExecutor:
+    """Run tasks when submitted, counting the ones not collected yet"""
+
+    def __init__(self):
+        self.pending = 0
+        self.max_pending = 0
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        self.pending += 1
+        self.max_pending = max(self.pending, self.max_pending)
+        result = future.result
+
+        def collect(*args, **kwargs):
+            self.pending -= 1
+            return result(*args, **kwargs)
+
+        future.result = collect
+        return future
+
+
+@override_settings(TROPP_PDF_CACHE_PATH="test_pdf_sheets/")
+class SheetsTestCase(TestCase):
+    def list_cached_sheets(self):
+        try:
+            directories, _ = default_storage.listdir("test_pdf_sheets/")
+        except FileNotFoundError:
+            return []
+        return [
+            f"test_pdf_sheets/{directory}/{filename}"
+            for directory in directories
+            for filename in default_storage.listdir(f"test_pdf_sheets/{directory}/")[1]
+        ]
+
+    def tearDown(self):
+        for name in self.list_cached_sheets():
+            default_storage.delete(name)
+
+    def get_cached_names(self):
+        return sorted(self.list_cached_sheets())
+
+
+class RenderSheetsTestCase(SheetsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewpoints = [ViewpointFactory(label=f"Viewpoint {i}") for i in range(5)]
+        cls.campaign = CampaignFactory()
+        cls.campaign.viewpoints.set(cls.viewpoints)
+
+    @override_settings(TROPP_PDF_PROCESSES=0)
+    def test_render_in_process(self):
+        sheets = list(render_sheets(self.viewpoints, "http://testserver/"))
+        self.assertEqual(self.viewpoints, [viewpoint for viewpoint, _ in sheets])
+        for _, content in sheets:
+            self.assertTrue(content.startswith(b"%PDF"))
+
+    @override_settings(TROPP_PDF_PROCESSES=2)
+    def test_render_in_pool(self):
+        sheets = list(render_sheets(self.viewpoints, "http://testserver/"))
+        self.assertEqual(self.viewpoints, [viewpoint for viewpoint, _ in sheets])
+        for _, content in sheets:
+            self.assertTrue(content.startswith(b"%PDF"))
+
+    @skipIf(sys.version_info < (3, 7), "Pool processes are forked")
+    @override_settings(TROPP_PDF_PROCESSES=1)
+    def test_pool_does_not_inherit_connections(self):
+        self.assertTrue(has_connection())
+        self.assertFalse(get_executor().submit(has_connection).result())
+
+    @override_settings(TROPP_PDF_REQUEST_CONCURRENCY=2, TROPP_PDF_CACHE=False)
+    def test_concurrency_limit(self):
+        executor = InlineExecutor()
+        with patch("terra_opp.sheets.get_executor", return_value=executor), patch(
+            "terra_opp.sheets.render_sheet_pdf", return_value=b"%PDF"
+        ):
+            sheets = list(render_sheets(self.viewpoints, "http://testserver/"))
+        self.assertEqual(5, len(sheets))
+        self.assertEqual(2, executor.max_pending)
+        self.assertEqual(0, executor.pending)
+
+    @override_settings(TROPP_PDF_PROCESSES=2)
+    def test_all_sheets(self):
+        response = self.client.get(
+            reverse("terra_opp:campaign-all-sheets", args=[self.campaign.pk])
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            names = archive.namelist()
+        # In campaign order
+        viewpoints = self.campaign.viewpoints.all()
+        self.assertEqual([f"viewpoint_{v.pk}.pdf" for v in viewpoints], names)
+
+
+@override_settings(TROPP_PDF_PROCESSES=0)
+class SheetCacheTestCase(SheetsTestCase):
+    def setUp(self):
+        self.viewpoint = ViewpointFactory(label="Moulin", pictures__state="accepted")
+        self.render_pdf = patch.object(
+            SheetRenderer,
+            "write_pdf",
+            autospec=True,
+            side_effect=SheetRenderer.write_pdf,
+        ).start()
+        self.addCleanup(patch.stopall)
+
+    def test_unchanged_sheet_is_cached(self):
+        content = render_sheet(self.viewpoint, "http://testserver/")
+        self.assertEqual(content, render_sheet(self.viewpoint, "http://testserver/"))
+        self.assertEqual(1, self.render_pdf.call_count)
+        self.assertEqual(1, len(self.get_cached_names()))
+
+    def test_changed_viewpoint_is_rendered_again(self):
+        render_sheet(self.viewpoint, "http://testserver/")
+        previous = self.get_cached_names()
+        self.viewpoint.label = "Lavoir"
+        self.viewpoint.save()
+        render_sheet(self.viewpoint, "http://testserver/")
+        self.assertEqual(2, self.render_pdf.call_count)
+        # The previous sheet is removed
+        self.assertEqual(1, len(self.get_cached_names()))
+        self.assertNotEqual(previous, self.get_cached_names())
+
+    def test_other_viewpoints_are_kept(self):
+        other = ViewpointFactory(label="Lavoir", pictures__state="accepted")
+        render_sheet(self.viewpoint, "http://testserver/")
+        render_sheet(other, "http://testserver/")
+        directories = {name.split("/")[1] for name in self.get_cached_names()}
+        self.assertEqual(
+            {f"viewpoint_{self.viewpoint.pk}", f"viewpoint_{other.pk}"}, directories
+        )
+
+    def test_new_picture_is_rendered_again(self):
+        render_sheet(self.viewpoint, "http://testserver/")
+        PictureFactory(viewpoint=self.viewpoint, date=timezone.now())
+        render_sheet(self.viewpoint, "http://testserver/")
+        self.assertEqual(2, self.render_pdf.call_count)
+
+    def test_changed_properties_set_is_rendered_again(self):
+        render_sheet(self.viewpoint, "http://testserver/")
+        with override_settings(TROPP_VIEWPOINT_PROPERTIES_SET={"pdf": ()}):
+            render_sheet(self.viewpoint, "http://testserver/")
+        self.assertEqual(2, self.render_pdf.call_count)
+
+    def test_endpoints_share_cache(self):
+        response = self.client.get(
+            reverse("terra_opp:viewpoint-pdf", args=[self.viewpoint.pk])
+        )
+        self.assertEqual(200, response.status_code)
+        rendered = list(render_sheets([self.viewpoint], "http://testserver/"))
+        self.assertEqual(response.content, rendered[0][1])
+        self.assertEqual(1, self.render_pdf.call_count)
+
+    def test_digest_ignores_properties_set_order(self):
+        properties = [("camera", "Camera"), ("lens", "Lens"), ("film", "Film")]
+        with override_settings(TROPP_VIEWPOINT_PROPERTIES_SET={"pdf": properties}):
+            digest = get_sheet_digest(self.viewpoint)
+        properties.reverse()
+        with override_settings(TROPP_VIEWPOINT_PROPERTIES_SET={"pdf": set(properties)}):
+            self.assertEqual(digest, get_sheet_digest(self.viewpoint))
+
+    @override_settings(TROPP_PDF_CACHE=False)
+    def test_disabled(self):
+        render_sheet(self.viewpoint, "http://testserver/")
+        render_sheet(self.viewpoint, "http://testserver/")
+        self.assertEqual(2, self.render_pdf.call_count)
+
+
+class PictureRenditionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewpoint = ViewpointFactory()
+        cls.picture = cls.viewpoint.pictures.get()
+
+    @override_settings(TROPP_PDF_IMAGE_DPI=96)
+    def test_rendition(self):
+        name = get_picture_rendition(self.picture)
+        self.assertNotEqual(self.picture.file.name, name)
+        self.assertEqual("644x300", get_rendition_size())
+        with default_storage.open(name) as f:
+            width, height = Image.open(f).size
+        self.assertLessEqual(width, 644)
+        self.assertLessEqual(height, 300)
+        html = get_sheet_renderer("http://testserver/").render_html(self.viewpoint)
+        self.assertIn(f'src="file://{name}"', html)
+
+    @override_settings(TROPP_PDF_IMAGE_DPI=0)
+    def test_disabled(self):
+        self.assertEqual(self.picture.file.name, get_picture_rendition(self.picture))
+
+
+class SheetRendererTestCase(TestCase):
+    def test_stylesheet_parsed_once(self):
+        viewpoint = ViewpointFactory()
+        renderer = SheetRenderer("http://testserver/")
+        html = renderer.render_html(viewpoint)
+        self.assertNotIn("viewpoint_pdf.css", html)
+        with patch("weasyprint.CSS", wraps=weasyprint.CSS) as css:
+            for _ in range(2):
+                self.assertTrue(renderer.write_pdf(html).startswith(b"%PDF"))
+        self.assertEqual(1, css.call_count)
+
+
+class CampaignBookletTestCase(TestPermissionsMixin, SheetsTestCase, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = TerraUserFactory()
+        cls.campaign = CampaignFactory(
+            assignee=cls.photographer, state=Campaign.STARTED
+        )
+        cls.campaign.viewpoints.set(
+            [ViewpointFactory(label=f"Viewpoint {index}") for index in range(3)]
+        )
+
+    def setUp(self):
+        self.user = self.photographer
+        self.url = reverse("terra_opp:campaign-booklet", args=[self.campaign.pk])
+
+    def test_page_by_viewpoint(self):
+        renderer = SheetRenderer("http://testserver/")
+        html = renderer.render_booklet_html(
+            self.campaign, self.campaign.viewpoints.all()
+        )
+        self.assertEqual(3, html.count('class="viewpoint-sheet"'))
+        document = weasyprint.HTML(
+            string=html, base_url=renderer.base_url, url_fetcher=django_url_fetcher
+        ).render(stylesheets=[renderer.stylesheet], font_config=renderer.font_config)
+        self.assertEqual(3, len(document.pages))
+
+    def test_booklet(self):
+        self.client.force_authenticate(user=self.photographer)
+        self._set_permissions(["can_add_pictures"])
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("application/pdf", response["Content-Type"])
+        self.assertTrue(response.content.startswith(b"%PDF"))
+
+    def test_anonymous(self):
+        self.assertIn(self.client.get(self.url).status_code, (401, 403))
+
+    @override_settings(TROPP_PDF_CACHE=False)
+    def test_queries(self):
+        self.campaign.viewpoints.add(ViewpointFactory(), ViewpointFactory())
+        with patch.object(SheetRenderer, "write_pdf", return_value=b"%PDF"):
+            # Viewpoints, their earliest and latest pictures
+            with self.assertNumQueries(3):
+                render_booklet(self.campaign, "http://testserver/")
+
+    def test_cached(self):
+        with patch.object(
+            SheetRenderer,
+            "write_pdf",
+            autospec=True,
+            side_effect=SheetRenderer.write_pdf,
+        ) as write_pdf:
+            content = render_booklet(self.campaign, "http://testserver/")
+            self.assertEqual(
+                content, render_booklet(self.campaign, "http://testserver/")
+            )
+            self.campaign.viewpoints.add(ViewpointFactory())
+            render_booklet(self.campaign, "http://testserver/")
+        self.assertEqual(2, write_pdf.call_count)
@@ -0,0 +1,91 @@
+from django.contrib.gis.geos import Point
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from geostore.tests.factories import FeatureFactory
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.filters import meters_to_degrees
+from terra_opp.tests.factories import ViewpointFactory
+
+
+class SpatialFiltersTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TerraUserFactory()
+        cls.viewpoints = {
+            label: ViewpointFactory(
+                label=label,
+                active=True,
+                pictures__state="accepted",
+                point=FeatureFactory(geom=Point(x, y, srid=4326)),
+            )
+            for label, x, y in (
+                ("Marseille", 5.3698, 43.2965),
+                ("Aix", 5.4474, 43.5297),
+                ("Lyon", 4.8357, 45.7640),
+            )
+        }
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def get_labels(self, params, url=None):
+        response = self.client.get(url or reverse("terra_opp:viewpoint-list"), params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code, response.content)
+        return [viewpoint["label"] for viewpoint in response.json()["results"]]
+
+    def test_in_bbox(self):
+        labels = self.get_labels({"in_bbox": "5,43,6,44"})
+        self.assertEqual({"Marseille", "Aix"}, set(labels))
+
+    def test_dist(self):
+        # Marseille and Aix are 26km apart
+        labels = self.get_labels({"point": "5.3698,43.2965", "dist": 20000})
+        self.assertEqual(["Marseille"], labels)
+        labels = self.get_labels({"point": "5.3698,43.2965", "dist": 30000})
+        self.assertEqual({"Marseille", "Aix"}, set(labels))
+
+    def test_nearest(self):
+        labels = self.get_labels({"point": "4.8,45.7", "nearest": 2})
+        self.assertEqual(["Lyon", "Aix"], labels)
+
+    def test_nearest_in_meters(self):
+        # Degrees of longitude are half as long at 60°N: East is nearer in meters,
+        # North in degrees
+        for label, x, y in (("East", 0.15, 60), ("North", 0, 60.1)):
+            ViewpointFactory(
+                label=label,
+                active=True,
+                pictures__state="accepted",
+                point=FeatureFactory(geom=Point(x, y, srid=4326)),
+            )
+        labels = self.get_labels({"point": "0,60", "nearest": 1})
+        self.assertEqual(["East"], labels)
+        labels = self.get_labels({"point": "0,60", "nearest": 2})
+        self.assertEqual(["East", "North"], labels)
+
+    def test_active_action(self):
+        url = reverse("terra_opp:viewpoint-active")
+        labels = self.get_labels({"point": "5.4,43.5", "nearest": 1}, url)
+        self.assertEqual(["Aix"], labels)
+
+    def test_bad_values(self):
+        url = reverse("terra_opp:viewpoint-list")
+        for params in (
+            {"in_bbox": "1,2,3"},
+            {"in_bbox": "a,b,c,d"},
+            {"dist": 100},
+            {"point": "1,2", "dist": "far"},
+            {"point": "1,2", "nearest": 0},
+            {"point": "1,2", "nearest": 100000},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_meters_to_degrees(self):
+        # Degrees of longitude are shorter far from the equator
+        self.assertGreater(meters_to_degrees(1000, 60), meters_to_degrees(1000, 0))
+        self.assertGreaterEqual(meters_to_degrees(1000, 0), 1000 / 110574)
+        self.assertEqual(360, meters_to_degrees(1000, 90))
@@ -0,0 +1,116 @@
+import io
+import json
+import zipfile
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from terra_accounts.tests.factories import TerraUserFactory
+from terra_opp.models import Viewpoint
+from terra_opp.pagination import RestPageNumberPagination
+from terra_opp.renderers import stream_json, stream_zip
+from terra_opp.tests.factories import PictureFactory, ViewpointFactory
+from terra_opp.views import ViewpointViewSet
+
+
+@override_settings(TROPP_STREAMING_PAGE_SIZE=3)
+class StreamingListTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TerraUserFactory()
+        for index in range(5):
+            ViewpointFactory(label=f"Viewpoint {index}", pictures__state="accepted")
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("terra_opp:viewpoint-list")
+
+    def get_streamed(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.streaming)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_small_pages_are_not_streamed(self):
+        response = self.client.get(self.url, {"page_size": 3})
+        self.assertFalse(response.streaming)
+
+    def test_large_page(self):
+        expected = self.client.get(self.url, {"page_size": 3, "page": 2}).json()
+        # Whatever the chunks are
+        for chunk_size in (1, 2, 500):
+            with self.subTest(chunk_size=chunk_size), self.settings(
+                TROPP_STREAMING_PAGE_SIZE=2
+            ), patch.object(ViewpointViewSet, "streaming_chunk_size", chunk_size):
+                data = self.get_streamed(self.url, {"page_size": 3, "page": 2})
+                self.assertEqual(expected, data)
+
+    def test_same_as_paginated(self):
+        expected = self.client.get(self.url).json()
+        data = self.get_streamed(self.url, {"page_size": 100})
+        self.assertEqual(expected["results"], data["results"])
+        self.assertEqual(5, data["count"])
+        self.assertEqual(1, data["num_pages"])
+
+    def test_invalid_page(self):
+        response = self.client.get(self.url, {"page_size": 100, "page": 2})
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_not_paginated(self):
+        with patch.object(RestPageNumberPagination, "page_size", None):
+            data = self.get_streamed(self.url, {})
+        self.assertEqual(
+            list(Viewpoint.objects.values_list("pk", flat=True)),
+            [viewpoint["id"] for viewpoint in data],
+        )
+
+    def test_active(self):
+        Viewpoint.objects.update(active=True)
+        data = self.get_streamed(
+            reverse("terra_opp:viewpoint-active"), {"page_size": 100}
+        )
+        self.assertEqual(5, data["count"])
+
+    def test_pictures(self):
+        PictureFactory(viewpoint=Viewpoint.objects.first())
+        data = self.get_streamed(reverse("terra_opp:picture-list"), {"page_size": 100})
+        self.assertEqual(6, len(data["results"]))
+        self.assertIn("owner", data["results"][0])
+
+    def test_queries_by_chunk(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_streamed(self.url, {"page_size": 100})
+        ViewpointFactory.create_batch(5, pictures__state="accepted")
+        with self.assertNumQueries(len(queries)):
+            self.get_streamed(self.url, {"page_size": 100})
+
+    def test_browsable_api_is_not_streamed(self):
+        response = self.client.get(self.url, {"page_size": 100, "format": "api"})
+        self.assertFalse(response.streaming)
+
+    def test_stream_json(self):
+        self.assertEqual(b"[]", b"".join(stream_json([])))
+        self.assertEqual(b"[1,2,3]", b"".join(stream_json([[1], [], [2, 3]])))
+        self.assertEqual(
+            {"count": 3, "results": [1, 2, 3]},
+            json.loads(
+                b"".join(stream_json([[1, 2], [3]], {"count": 3, "results": None}))
+            ),
+        )
+        self.assertEqual(b'["\\u2028"]', b"".join(stream_json([["\u2028"]])))
+
+    def test_stream_zip(self):
+        files = [("a.txt", b"a" * 1000), ("b.txt", b"b")]
+        chunks = list(stream_zip(iter(files)))
+        # An entry by file, then the central directory
+        self.assertEqual(3, len(chunks))
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertEqual(files, [(n, archive.read(n)) for n in archive.namelist()])
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(stream_zip([])))) as archive:
+            self.assertEqual([], archive.namelist())
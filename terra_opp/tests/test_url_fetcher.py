@@ -0,0 +1,84 @@
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+
+from terra_opp.renderers import (
+    CachedUrlFetcher,
+    django_url_fetcher,
+    get_storage_name,
+    get_url_fetcher,
+)
+
+
+class UrlFetcherTestCase(SimpleTestCase):
+    def setUp(self):
+        self.names = [
+            default_storage.save(f"test_fetcher/file_{index}.css", ContentFile(content))
+            for index, content in enumerate((b"a" * 10, b"b" * 20, b"c" * 30))
+        ]
+        self.addCleanup(lambda: [default_storage.delete(n) for n in self.names])
+        self.fetcher = CachedUrlFetcher()
+
+    def test_storage_name(self):
+        self.assertEqual(
+            "pictures/viewpoint_1/a b.jpg",
+            get_storage_name("file://pictures/viewpoint_1/a%20b.jpg"),
+        )
+
+    def test_django_url_fetcher(self):
+        data = django_url_fetcher(f"file://{self.names[0]}")
+        with data["file_obj"] as f:
+            self.assertEqual(b"a" * 10, f.read())
+        self.assertEqual("text/css", data["mime_type"])
+
+    def test_hits_and_misses(self):
+        for _ in range(3):
+            data = self.fetcher(f"file://{self.names[0]}")
+        self.assertEqual(b"a" * 10, data["string"])
+        self.assertEqual("text/css", data["mime_type"])
+        self.assertEqual(
+            {"files": 1, "size": 10, "hits": 2, "misses": 1}, self.fetcher.stats()
+        )
+
+    def test_modified_file(self):
+        url = f"file://{self.names[0]}"
+        self.fetcher(url)
+        modified = patch.object(
+            default_storage, "get_modified_time", return_value="modified"
+        )
+        with modified, patch.object(
+            default_storage, "open", wraps=default_storage.open
+        ) as storage_open:
+            self.fetcher(url)
+        storage_open.assert_called_once()
+        self.assertEqual(2, self.fetcher.misses)
+
+    @override_settings(TROPP_URL_FETCHER_CACHE_SIZE=50)
+    def test_least_recently_used_dropped(self):
+        urls = [f"file://{name}" for name in self.names]
+        self.fetcher(urls[0])
+        self.fetcher(urls[1])
+        self.fetcher(urls[0])
+        # Over 50 bytes, the second file is dropped
+        self.fetcher(urls[2])
+        self.assertEqual(40, self.fetcher.size)
+        self.fetcher(urls[0])
+        self.assertEqual(2, self.fetcher.hits)
+        self.fetcher(urls[1])
+        self.assertEqual(4, self.fetcher.misses)
+
+    @override_settings(TROPP_URL_FETCHER_CACHE_SIZE=5)
+    def test_too_large_file(self):
+        self.assertEqual(b"a" * 10, self.fetcher(f"file://{self.names[0]}")["string"])
+        self.assertEqual(0, self.fetcher.size)
+
+    def test_missing_file(self):
+        with patch("weasyprint.default_url_fetcher", return_value={}) as fetcher:
+            self.fetcher("file://test_fetcher/missing.css")
+        fetcher.assert_called_once()
+
+    @override_settings(TROPP_URL_FETCHER="terra_opp.renderers.cached_url_fetcher")
+    def test_setting(self):
+        self.assertIsInstance(get_url_fetcher(), CachedUrlFetcher)
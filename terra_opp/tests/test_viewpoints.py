@@ -4,6 +4,7 @@ from datetime import timedelta
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
 from django.test import override_settings
 from django.urls import reverse
@@ -159,7 +160,8 @@ class ViewpointTestCase(APITestCase, TestPermissionsMixin):
         )
 
     def test_viewpoint_get_list_anonymous(self):
-        with self.assertNumQueries(6):
+        # count, viewpoints with point, city and last picture
+        with self.assertNumQueries(2):
             data = self.client.get(reverse("terra_opp:viewpoint-list")).json()
         # List must contain all viewpoints WITHOUT those with no pictures
         # Pictures must also be ACCEPTED
@@ -168,11 +170,34 @@ class ViewpointTestCase(APITestCase, TestPermissionsMixin):
     def test_viewpoint_get_list_with_auth(self):
         # User is now authenticated
         self.client.force_authenticate(user=self.user)
-        data = self.client.get(reverse("terra_opp:viewpoint-list")).json()
+        # count, viewpoints with point, city and last picture, themes
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse("terra_opp:viewpoint-list")).json()
         # List must still contain ALL viewpoints even those with no
         # pictures and pictures with other states than ACCEPTED
         self.assertEqual(3, data.get("count"))
 
+    def test_viewpoint_get_active_anonymous(self):
+        # count, viewpoints with point, city and last picture
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse("terra_opp:viewpoint-active")).json()
+        self.assertEqual(1, data.get("count"))
+
+    def test_viewpoint_get_detail_queries(self):
+        self.client.force_authenticate(user=self.user)
+        # Content types are cached by the process, don't count them
+        ContentType.objects.get_for_model(Viewpoint)
+        # viewpoint with point and city, pictures with owner, related, themes
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                reverse(
+                    "terra_opp:viewpoint-detail",
+                    args=[self.viewpoint_with_accepted_picture.pk],
+                )
+            )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(1, len(response.json()["pictures"]))
+
     def test_anonymous_access_without_accepted_picture(self):
         # User is not authenticated yet
         response = self.client.get(
@@ -1001,3 +1026,75 @@ class ViewpointTestCase(APITestCase, TestPermissionsMixin):
         self.assertEqual(active_viewpoint_count, data["count"])
         self.assertNotIn(inactive_viewpoint.id, [d["id"] for d in data["results"]])
         self.assertIn(active_viewpoint.id, [d["id"] for d in data["results"]])
+
+
+class LastAcceptedPictureTestCase(APITestCase):
+    def setUp(self):
+        self.viewpoint = ViewpointFactory(pictures=None)
+        self.picture = PictureFactory(viewpoint=self.viewpoint, state="draft")
+
+    def assertLastAcceptedPicture(self, picture):
+        self.viewpoint.refresh_from_db()
+        self.assertEqual(picture, self.viewpoint.last_accepted_picture)
+        self.assertEqual(
+            picture.date if picture else None,
+            self.viewpoint.last_accepted_picture_date,
+        )
+
+    def test_draft_picture_is_ignored(self):
+        self.assertLastAcceptedPicture(None)
+        self.assertNotIn(self.viewpoint, Viewpoint.objects.with_accepted_pictures())
+
+    def test_accepted_picture(self):
+        self.picture.state = "accepted"
+        self.picture.save()
+        self.assertLastAcceptedPicture(self.picture)
+        self.assertIn(self.viewpoint, Viewpoint.objects.with_accepted_pictures())
+
+    def test_latest_accepted_picture(self):
+        older = PictureFactory(
+            viewpoint=self.viewpoint,
+            state="accepted",
+            date=timezone.datetime(2010, 1, 1, tzinfo=timezone.utc),
+        )
+        latest = PictureFactory(viewpoint=self.viewpoint, state="accepted")
+        self.assertLastAcceptedPicture(latest)
+
+        latest.state = "refused"
+        latest.save()
+        self.assertLastAcceptedPicture(older)
+
+    def test_deleted_picture(self):
+        older = PictureFactory(
+            viewpoint=self.viewpoint,
+            state="accepted",
+            date=timezone.datetime(2010, 1, 1, tzinfo=timezone.utc),
+        )
+        latest = PictureFactory(viewpoint=self.viewpoint, state="accepted")
+        latest.delete()
+        self.assertLastAcceptedPicture(older)
+
+        self.viewpoint.pictures.all().delete()
+        self.assertLastAcceptedPicture(None)
+
+    def test_picture_moved_to_another_viewpoint(self):
+        other = ViewpointFactory(pictures=None)
+        self.picture.state = "accepted"
+        self.picture.save()
+
+        self.picture.viewpoint = other
+        self.picture.save()
+        self.assertLastAcceptedPicture(None)
+        other.refresh_from_db()
+        self.assertEqual(self.picture, other.last_accepted_picture)
+
+    def test_viewpoint_save_keeps_last_accepted_picture(self):
+        viewpoint = Viewpoint.objects.get(pk=self.viewpoint.pk)
+        self.picture.state = "accepted"
+        self.picture.save()
+
+        # viewpoint instance is stale, but must not overwrite the pointer
+        viewpoint.label = "Updated"
+        viewpoint.save()
+        self.assertLastAcceptedPicture(self.picture)
+        self.assertEqual("Updated", self.viewpoint.label)
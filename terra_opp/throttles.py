@@ -0,0 +1,11 @@
+from django.conf import settings
+from rest_framework.throttling import UserRateThrottle
+
+
+class PdfJobThrottle(UserRateThrottle):
+    """PDF jobs queued by user, or by IP address for anonymous users"""
+
+    scope = "terra_opp_pdf_jobs"
+
+    def get_rate(self):
+        return settings.TROPP_PDF_JOB_THROTTLE_RATE
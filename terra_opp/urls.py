@@ -9,6 +9,8 @@ router = SimpleRouter()
 router.register(r"viewpoints", views.ViewpointViewSet, basename="viewpoint")
 router.register(r"campaigns", views.CampaignViewSet, basename="campaign")
 router.register(r"pictures", views.PictureViewSet, basename="picture")
+router.register(r"pdf-jobs", views.PdfJobViewSet, basename="pdf-job")
+router.register(r"photographers", views.PhotographerViewSet, basename="photographer")
 router.register(r"cities", views.CityViewSet, basename="city")
 router.register(r"themes", views.ThemeViewSet, basename="theme")
 
@@ -1,50 +1,88 @@
-import io
-import operator
-from functools import reduce
+import gzip
+import re
 
 import coreapi
 import coreschema
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.postgres.fields.jsonb import KeyTransform
 from django.core.cache import cache
-from django.db.models import Prefetch
-from django.db import models
-from django.template import loader
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django_filters.rest_framework import DjangoFilterBackend
 
-from rest_framework import viewsets, renderers
+from rest_framework import mixins, renderers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.exceptions import APIException
 
 from .filters import (
     CampaignFilterBackend,
     CampaignFilterSet,
+    FullTextSearchFilter,
     JsonFilterBackend,
+    RankedOrderingFilter,
     ViewpointFilterSet,
     SchemaAwareDjangoFilterBackend,
+    SpatialFilterBackend,
     PictureFilterSet,
+    has_multivalued_joins,
+)
+from .facets import (
+    CITIES,
+    PHOTOGRAPHERS,
+    THEMES,
+    count_facets,
+    get_facets,
+    get_property_facets,
 )
-from .models import Campaign, City, Picture, Theme, Viewpoint
-from .pagination import RestPageNumberPagination
+from .geojson import get_public_collection
+from .instrumentation import QueryInstrumentationMixin
+from .jobs import enqueue_pdf_job
+from .mixins import ConditionalGetMixin, StreamingListMixin
+from .models import (
+    Campaign,
+    City,
+    PdfJob,
+    Photographer,
+    Picture,
+    Theme,
+    Viewpoint,
+)
+from .pagination import CursorPaginationMixin, RestPageNumberPagination
+from .planner import QueryPlan
 from .point_utilities import remove_point_thumbnail, update_point_properties
-from .renderers import PdfRenderer, ZipRenderer, write_pdf
+from .renderers import GeoJSONRenderer, PdfRenderer, ZipRenderer, stream_zip
+from .response_cache import cache_anonymous_response
+from .sheets import (
+    SHEET_TEMPLATE,
+    get_sheet_context,
+    render_booklet,
+    render_sheet,
+    render_sheets,
+)
+from .throttles import PdfJobThrottle
 from . import permissions
 
 from .serializers import (
     CampaignSerializer,
     RoCampaignSerializer,
     ListCampaignNestedSerializer,
+    PdfJobSerializer,
     PictureSerializer,
     SimpleAuthenticatedViewpointSerializer,
     SimpleViewpointSerializer,
     ViewpointSerializerWithPicture,
     PhotographSerializer,
+    PhotographerSerializer,
     CitySerializer,
     ThemeSerializer,
 )
@@ -62,17 +100,25 @@ class PictureAlreadyExists(APIException):
     default_code = "picture_already_exists"
 
 
-class ViewpointViewSet(viewsets.ModelViewSet):
+class ViewpointViewSet(
+    QueryInstrumentationMixin,
+    ConditionalGetMixin,
+    StreamingListMixin,
+    CursorPaginationMixin,
+    viewsets.ModelViewSet,
+):
     serializer_class = ViewpointSerializerWithPicture
     permission_classes = [
         permissions.ViewpointPermission,
     ]
     filter_backends = (
-        SearchFilter,
+        FullTextSearchFilter,
         SchemaAwareDjangoFilterBackend,
         JsonFilterBackend,
         DjangoFilterBackend,
-        OrderingFilter,
+        RankedOrderingFilter,
+        # Last, as nearest viewpoints are ordered by distance
+        SpatialFilterBackend,
     )
     filterset_class = ViewpointFilterSet
     filter_fields_schema = [
@@ -96,11 +142,19 @@ class ViewpointViewSet(viewsets.ModelViewSet):
         ),
     ]
     filter_fields = ["pictures", "active"]
-    search_fields = ("label", "id")
+    search_exact_fields = ("id",)
     pagination_class = RestPageNumberPagination
     template_name = "terra_opp/viewpoint_pdf.html"
     ordering_fields = ["id", "city", "active", "label"]
     ordering = ["-created_at"]
+    conditional_actions = ("list", "retrieve", "active")
+    query_budgets = {
+        "list": 3,
+        "active": 2,
+        "retrieve": 4,
+        "filters": 2,
+        "facets": 2,
+    }
 
     def perform_create(self, serializer):
         serializer.save()
@@ -117,91 +171,92 @@ class ViewpointViewSet(viewsets.ModelViewSet):
         # FIXME Try to be more precise and delete only the related feature's tile in cache
         cache.delete("tile_cache_*")  # delete all the cached tiles
 
+    # Actions not rendered by a serializer, they load what they need by themselves
+    unplanned_actions = ("zip_pictures", "preview", "pdf", "destroy", "facets")
+
+    # Viewpoint attributes rendered by serializers which are not model fields
+    computed_fields = {
+        "picture": "last_accepted_picture",
+    }
+
     def get_queryset(self):
         # unauthenticated user not allowed to access archived viewpoint
         qs = Viewpoint.objects.with_accepted_pictures().filter(active=True)
         if self.request.user.is_authenticated:
-            qs = Viewpoint.objects.all().distinct()
+            qs = Viewpoint.objects.all()
 
-        pictures_qs = Picture.objects.order_by("-created_at")
+        if self.action in self.unplanned_actions:
+            return qs
 
-        return (
-            qs.select_related("point", "city")
-            .prefetch_related(
-                "pictures",
-                "related",
-                Prefetch("pictures", queryset=pictures_qs, to_attr="_ordered_pics"),
-                "themes",
-            )
-            .annotate(
-                last_accepted_picture_date=models.Max("pictures__date"),
-            )
+        # Only load what the serializer of the current action renders
+        plan = QueryPlan.from_serializer(
+            self.get_serializer_class(), computed=self.computed_fields
         )
+        return plan.apply(qs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Only filters on themes or pictures fields repeat viewpoints
+        if has_multivalued_joins(queryset):
+            queryset = queryset.distinct()
+        return queryset
 
     def get_serializer_class(self):
+        if self.action == "active":
+            return SimpleViewpointSerializer
         if self.action == "list":
             if self.request.user.is_anonymous:
                 return SimpleViewpointSerializer
             return SimpleAuthenticatedViewpointSerializer
         return ViewpointSerializerWithPicture
 
+    @cache_anonymous_response("viewpoints-list")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=False)
+    @cache_anonymous_response("viewpoints-filters")
     def filters(self, request, *args, **kwargs):
-        filter_values = {}
-        for key, field in settings.TROPP_SEARCHABLE_PROPERTIES.items():
-            data = None
-            transform = KeyTransform(field["json_key"], "properties")
-            queryset = (
-                Viewpoint.objects.annotate(**{key: transform})
-                .exclude(**{f"{key}__isnull": True})
-                .values_list(key, flat=True)
-            )
-            if field["type"] == "single":
-                # Dedupe and sort with SQL
-                data = queryset.order_by(key).distinct(key)
-            elif field["type"] == "many":
-                # Dedupe and sort programmatically
-                data = list(queryset)
-                if data:
-                    data = set(reduce(operator.concat, data))
-                    data = sorted(data, key=str.lower)
-            if data is not None:
-                filter_values[key] = data
-
-        filter_values["photographers"] = PhotographSerializer(
-            get_user_model().objects.filter(pictures__isnull=False).distinct(),
-            many=True,
-        ).data
-
-        # FIXME We may want to set all cities and themes as uniques directly in the model?
-        filter_values["cities"] = (
-            City.objects.exclude(label__isnull=True)
-            .exclude(label__exact="")
-            .distinct()
-            .order_by(
-                "label",
-            )
-            .values_list(
-                "label",
-                flat=True,
-            )
-        )
-        filter_values["themes"] = (
-            Theme.objects.exclude(label__isnull=True)
-            .exclude(
-                label__exact="",
-            )
-            .distinct()
-            .order_by(
-                "label",
-            )
-            .values_list(
-                "label",
-                flat=True,
-            )
+        """Filter values, with their number of viewpoints if `counts` is true"""
+        with_counts = request.query_params.get("counts") in ("1", "true")
+        photographers = get_user_model().objects.filter(
+            pk__in=Photographer.objects.values("user")
         )
+        return Response(self.get_facet_values(get_facets(), with_counts, photographers))
 
-        return Response(filter_values)
+    @action(detail=False)
+    @cache_anonymous_response("viewpoints-facets")
+    def facets(self, request, *args, **kwargs):
+        """Number of filtered viewpoints by filter value"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.get_facet_values(count_facets(queryset), True))
+
+    @staticmethod
+    def get_facet_values(facets, with_counts, photographers=None):
+        def get_values(facet):
+            if with_counts:
+                return [
+                    {"value": value, "count": count} for value, count in facets[facet]
+                ]
+            return [value for value, count in facets[facet]]
+
+        facet_values = {key: get_values(key) for key in get_property_facets()}
+
+        # Owners of the counted pictures, unless they are given
+        photographer_counts = dict(facets[PHOTOGRAPHERS])
+        if photographers is None:
+            photographers = get_user_model().objects.filter(pk__in=photographer_counts)
+        photographers = list(photographers)
+        facet_values["photographers"] = PhotographSerializer(
+            photographers, many=True
+        ).data
+        if with_counts:
+            for photographer, data in zip(photographers, facet_values["photographers"]):
+                data["count"] = photographer_counts.get(str(photographer.pk), 0)
+
+        facet_values["cities"] = get_values(CITIES)
+        facet_values["themes"] = get_values(THEMES)
+        return facet_values
 
     @method_decorator(cache_page(60 * 5))
     @action(
@@ -227,16 +282,11 @@ class ViewpointViewSet(viewsets.ModelViewSet):
         renderer_classes=[renderers.TemplateHTMLRenderer],
     )
     def preview(self, request, *args, **kwargs):
-        properties_set = settings.TROPP_VIEWPOINT_PROPERTIES_SET["pdf"]
         return Response(
-            {
-                "viewpoint": self.get_object(),
-                "properties_set": properties_set,
-            },
-            template_name="terra_opp/viewpoint_pdf.html",
+            get_sheet_context(self.get_object()),
+            template_name=SHEET_TEMPLATE,
         )
 
-    @method_decorator(cache_page(60 * 5))
     @action(
         detail=True,
         methods=[
@@ -245,41 +295,68 @@ class ViewpointViewSet(viewsets.ModelViewSet):
         renderer_classes=[PdfRenderer],
     )
     def pdf(self, request, *args, **kwargs):
-        properties_set = settings.TROPP_VIEWPOINT_PROPERTIES_SET["pdf"]
-        return Response(
-            {
-                "viewpoint": self.get_object(),
-                "properties_set": properties_set,
-            }
-        )
+        content = render_sheet(self.get_object(), request.build_absolute_uri("/"))
+        return HttpResponse(content, content_type=PdfRenderer.media_type)
 
     @action(detail=False, methods=["get"])
+    @cache_anonymous_response("viewpoints-active")
     def active(self, request, *args, **kwargs):
         qs = self.get_queryset().filter(active=True)
-        qs_filtered = self.filter_queryset(qs)
-        page = self.paginate_queryset(qs_filtered)
-
-        if page is not None:
-            serializer = SimpleViewpointSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        return self.get_list_response(self.filter_queryset(qs))
 
-        serializer = SimpleViewpointSerializer(qs_filtered, many=True)
-        return Response(serializer.data)
-
-
-class PictureViewSet(viewsets.ModelViewSet):
-    queryset = Picture.objects.all()
+    @action(
+        detail=False,
+        renderer_classes=[renderers.JSONRenderer, GeoJSONRenderer],
+        url_path="geojson",
+    )
+    def geojson(self, request, *args, **kwargs):
+        """Prebuilt FeatureCollection of public viewpoints"""
+        collection = get_public_collection()
+        accepts_gzip = re.search(
+            r"\bgzip\b", request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        # Strong validators must differ between encodings
+        etag = f'"{collection.etag}-gzip"' if accepts_gzip else f'"{collection.etag}"'
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            content = bytes(collection.content)
+            if not accepts_gzip:
+                content = gzip.decompress(content)
+            response = HttpResponse(content, content_type="application/geo+json")
+            if accepts_gzip:
+                response["Content-Encoding"] = "gzip"
+            response["X-Collection-Version"] = collection.version
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+class PictureViewSet(
+    QueryInstrumentationMixin,
+    ConditionalGetMixin,
+    StreamingListMixin,
+    CursorPaginationMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Picture.objects.select_related("owner")
     serializer_class = PictureSerializer
     permission_classes = [
         permissions.PicturePermission,
     ]
-    filter_backends = (SearchFilter, DjangoFilterBackend, OrderingFilter)
+    filter_backends = (FullTextSearchFilter, DjangoFilterBackend, RankedOrderingFilter)
     filterset_class = PictureFilterSet
     filter_fields = ["state", "active", "owner"]
-    search_fields = ("viewpoint__label", "identifier")
+    # Pictures are searched on their viewpoint document, without the identifiers
+    # of its pictures, or on their own identifier
+    search_vector_field = "viewpoint__search_vector"
+    search_vector_weights = "ABC"
+    search_contains_fields = ("identifier",)
     ordering_fields = ["state", "owner", "viewpoint", "identifier", "date"]
     ordering = ["-created_at"]
     pagination_class = RestPageNumberPagination
+    query_budgets = {"list": 3, "retrieve": 2}
 
     def perform_create(self, serializer):
         if self.request.user.has_terra_perm("can_manage_pictures"):
@@ -345,7 +422,9 @@ class PictureViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 
-class CampaignViewSet(viewsets.ModelViewSet):
+class CampaignViewSet(
+    QueryInstrumentationMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Campaign.objects.with_stats()
     permission_classes = [
         permissions.CampaignPermission,
@@ -363,6 +442,7 @@ class CampaignViewSet(viewsets.ModelViewSet):
     pagination_class = RestPageNumberPagination
     ordering_fields = ["label", "start_date", "assignee", "state"]
     ordering = ["-created_at"]
+    query_budgets = {"list": 3, "retrieve": 3}
 
     def get_queryset(self):
         user = self.request.user
@@ -392,36 +472,116 @@ class CampaignViewSet(viewsets.ModelViewSet):
 
         return RoCampaignSerializer
 
-    @method_decorator(cache_page(60 * 5))
     @action(
         detail=True,
         renderer_classes=[ZipRenderer],
     )
     def all_sheets(self, request, *args, **kwargs):
-        viewpoints = self.get_object().viewpoints.all()
-
-        pdfs = []
+        campaign = self.get_object()
+        sheets = render_sheets(
+            campaign.viewpoints.all(), request.build_absolute_uri("/")
+        )
+        response = StreamingHttpResponse(
+            stream_zip(
+                (f"viewpoint_{viewpoint.pk}.pdf", content)
+                for viewpoint, content in sheets
+            ),
+            content_type=ZipRenderer.media_type,
+        )
+        filename = f"campaign_{campaign.pk}_sheets.zip"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
 
-        for viewpoint in viewpoints:
-            template = loader.select_template(["terra_opp/viewpoint_pdf.html"])
-            html = template.render(
-                context={
-                    "viewpoint": viewpoint,
-                    "properties_set": settings.TROPP_VIEWPOINT_PROPERTIES_SET["pdf"],
-                }
-            )
+    @action(
+        detail=True,
+        renderer_classes=[PdfRenderer],
+    )
+    def booklet(self, request, *args, **kwargs):
+        """Sheets of all viewpoints of the campaign, in a single PDF"""
+        campaign = self.get_object()
+        content = render_booklet(campaign, request.build_absolute_uri("/"))
+        response = HttpResponse(content, content_type=PdfRenderer.media_type)
+        filename = f"campaign_{campaign.pk}_booklet.pdf"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class PdfJobViewSet(
+    QueryInstrumentationMixin,
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Viewpoint PDF sheets rendered in the background by the opp_worker command.
+    Jobs are known by their id only, as the sheets themselves.
+    """
+
+    queryset = PdfJob.objects.all()
+    serializer_class = PdfJobSerializer
+    permission_classes = [AllowAny]
+    query_budgets = {"create": 3, "retrieve": 1, "download": 1}
+
+    def get_throttles(self):
+        if self.action == "create":
+            return [PdfJobThrottle()]
+        return super().get_throttles()
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = enqueue_pdf_job(
+            serializer.validated_data["viewpoint"],
+            request.build_absolute_uri("/"),
+            owner=None if request.user.is_anonymous else request.user,
+        )
+        status_url = reverse("terra_opp:pdf-job-detail", args=[job.pk])
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": request.build_absolute_uri(status_url)},
+        )
 
-            pdf_bytes = write_pdf(request, html)
+    @action(detail=True)
+    def download(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.state != PdfJob.DONE or not job.file:
+            raise Http404
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=f"viewpoint_{job.viewpoint_id}.pdf",
+            content_type="application/pdf",
+        )
 
-            stream = io.BytesIO(pdf_bytes)
-            stream.name = f"viewpoint_{viewpoint.pk}.pdf"
 
-            pdfs.append(stream)
+class PhotographerViewSet(QueryInstrumentationMixin, viewsets.ReadOnlyModelViewSet):
+    """Owners of pictures, with their number of pictures and their dates"""
 
-        return Response(pdfs)
+    queryset = Photographer.objects.select_related("user")
+    permission_classes = [
+        permissions.PhotographerPermission,
+    ]
+    filter_backends = (
+        SearchFilter,
+        OrderingFilter,
+    )
+    serializer_class = PhotographerSerializer
+    search_fields = ("user__email",)
+    pagination_class = RestPageNumberPagination
+    ordering_fields = [
+        "user__email",
+        "pictures_count",
+        "first_picture_date",
+        "last_picture_date",
+    ]
+    ordering = ["user__email"]
+    query_budgets = {"list": 2, "retrieve": 1}
 
 
-class CityViewSet(viewsets.ModelViewSet):
+class CityViewSet(
+    QueryInstrumentationMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = City.objects.all()
     http_method_names = ["get", "post", "put", "delete", "options"]
     permission_classes = [
@@ -436,9 +596,12 @@ class CityViewSet(viewsets.ModelViewSet):
     pagination_class = RestPageNumberPagination
     ordering_fields = ["label"]
     ordering = ["label"]
+    query_budgets = {"list": 3, "retrieve": 2}
 
 
-class ThemeViewSet(viewsets.ModelViewSet):
+class ThemeViewSet(
+    QueryInstrumentationMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Theme.objects.all()
     http_method_names = ["get", "post", "put", "delete", "options"]
     permission_classes = [
@@ -455,3 +618,4 @@ class ThemeViewSet(viewsets.ModelViewSet):
     pagination_class = RestPageNumberPagination
     ordering_fields = ["label", "category"]
     ordering = ["label"]
+    query_budgets = {"list": 3, "retrieve": 2}